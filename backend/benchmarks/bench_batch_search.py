@@ -0,0 +1,79 @@
+"""Benchmark search throughput of /search/batch against one /search call per query.
+
+Indexes synthetic pages through the API, then runs the same number of
+distinct queries both ways. Each run uses its own queries so neither side
+benefits from the query embedding cache. Needs Ollama at OLLAMA_BASE_URL,
+or --fake-ollama to start the deterministic fake server (fake_ollama.py).
+Run from backend/:
+
+    python benchmarks/bench_batch_search.py --queries 200 --batch-size 50
+"""
+import argparse
+import json
+import os
+import tempfile
+import time
+
+WORDS = ("python asyncio faiss vector index embedding query cache latency memory "
+         "browser extension chrome page search ranking token chunk network").split()
+
+def _text(seed: int, words: int) -> str:
+    """Deterministic pseudo-random text."""
+    return " ".join(WORDS[(seed * 7 + i * (seed % 5 + 1)) % len(WORDS)] for i in range(words))
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--pages", type=int, default=200)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--batch-size", type=int, default=50)
+    parser.add_argument("--top-k", type=int, default=5)
+    parser.add_argument("--fake-ollama", action="store_true", help="Embed with benchmarks/fake_ollama.py")
+    args = parser.parse_args()
+
+    if args.fake_ollama:
+        from fake_ollama import FakeOllama
+        os.environ["OLLAMA_BASE_URL"] = FakeOllama(dimension=768).start().url
+
+    # Settings are read at import time
+    data_dir = tempfile.mkdtemp(prefix="bench_batch_search_")
+    os.environ["DATA_DIR"] = data_dir
+    os.environ["CACHE_DIR"] = os.path.join(data_dir, "cache")
+    os.environ.setdefault("LOG_LEVEL", "WARNING")
+    os.environ.setdefault("SEARCH_MODE", "vector")
+
+    from fastapi.testclient import TestClient
+    from smart_search.main import app
+
+    with TestClient(app) as client:
+        body = "\n".join(
+            json.dumps({"url": f"https://example.com/{i}", "title": f"Page {i}", "content": _text(i, 300)})
+            for i in range(args.pages)
+        )
+        client.post("/api/v1/index/bulk", content=body,
+                    headers={"Content-Type": "application/x-ndjson"})
+
+        single_queries = [f"{_text(i, 6)} single {i}" for i in range(args.queries)]
+        start = time.perf_counter()
+        for query in single_queries:
+            client.post("/api/v1/search", json={"query": query, "top_k": args.top_k}).raise_for_status()
+        single_seconds = time.perf_counter() - start
+
+        batch_queries = [f"{_text(i, 6)} batch {i}" for i in range(args.queries)]
+        start = time.perf_counter()
+        for i in range(0, len(batch_queries), args.batch_size):
+            client.post("/api/v1/search/batch", json={
+                "queries": batch_queries[i:i + args.batch_size], "top_k": args.top_k
+            }).raise_for_status()
+        batch_seconds = time.perf_counter() - start
+
+    print(json.dumps({
+        "pages": args.pages,
+        "queries": args.queries,
+        "batch_size": args.batch_size,
+        "single_qps": round(args.queries / single_seconds, 1),
+        "batch_qps": round(args.queries / batch_seconds, 1),
+        "speedup": round(single_seconds / batch_seconds, 2),
+    }, indent=2))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,81 @@
+"""Compare chunking strategies by chunk count, size and throughput.
+
+Chunks a synthetic article (headings, paragraphs of sentences, list
+lines) with each strategy. Fewer, fuller chunks mean fewer embeddings per
+page; "sentence_aligned" is the share of chunks that end on a sentence
+or line boundary instead of mid-word. Run from backend/:
+
+    python benchmarks/bench_chunking.py --size-kb 100 --chunk-size 1024
+"""
+import argparse
+import json
+import os
+import random
+import tempfile
+import time
+
+WORDS = ("search index vector browser page token memory query cache chunk stream latency "
+         "ranking embedding network model result offset window sentence paragraph").split()
+
+def _article(size: int) -> str:
+    """Synthetic page text in the shape of innerText."""
+    rng = random.Random(0)
+    blocks, length = [], 0
+    while length < size:
+        if rng.random() < 0.15:
+            block = " ".join(rng.choice(WORDS) for _ in range(rng.randint(2, 6))).title()
+        elif rng.random() < 0.15:
+            block = "\n".join(" ".join(rng.choice(WORDS) for _ in range(rng.randint(2, 5)))
+                              for _ in range(rng.randint(3, 6)))
+        else:
+            block = " ".join(
+                " ".join(rng.choice(WORDS) for _ in range(rng.randint(6, 25))).capitalize() + "."
+                for _ in range(rng.randint(2, 8))
+            )
+        blocks.append(block)
+        length += len(block) + 2
+    return "\n\n".join(blocks)
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--size-kb", type=int, default=100)
+    parser.add_argument("--chunk-size", type=int, default=1024)
+    parser.add_argument("--chunk-overlap", type=int, default=40)
+    parser.add_argument("--chunk-tokens", type=int, default=256)
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    # Settings are read at import time
+    data_dir = tempfile.mkdtemp(prefix="bench_chunking_")
+    os.environ["DATA_DIR"] = data_dir
+    os.environ["CACHE_DIR"] = os.path.join(data_dir, "cache")
+    os.environ["CHUNK_SIZE"] = str(args.chunk_size)
+    os.environ["CHUNK_OVERLAP"] = str(args.chunk_overlap)
+    os.environ["CHUNK_TOKENS"] = str(args.chunk_tokens)
+
+    from smart_search.perception.content_processor import ContentProcessor
+    from smart_search.perception.schemas import ChunkStrategy
+
+    content = _article(args.size_kb * 1024)
+    megabytes = len(content.encode()) / 2 ** 20
+    processor = ContentProcessor()
+    report = {"size_kb": args.size_kb, "chunk_size": args.chunk_size}
+    for strategy in ChunkStrategy:
+        processor.strategy = strategy
+        seconds = float("inf")
+        for _ in range(args.repeat):
+            start = time.perf_counter()
+            chunks, _ = processor.process("https://example.com", "Example", content)
+            seconds = min(seconds, time.perf_counter() - start)
+        aligned = sum(1 for c in chunks if content[c.metadata["char_end"] - 1] in ".!?"
+                      or content[c.metadata["char_end"]:c.metadata["char_end"] + 1] in ("\n", ""))
+        report[strategy.value] = {
+            "chunks": len(chunks),
+            "mean_chars": round(sum(len(c.content) for c in chunks) / max(len(chunks), 1)),
+            "sentence_aligned": round(aligned / max(len(chunks), 1), 2),
+            "mb_per_s": round(megabytes / seconds, 1),
+        }
+    print(json.dumps(report, indent=2))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,132 @@
+"""Benchmark ContentProcessor throughput and peak memory against the previous implementation.
+
+The previous processor ran seven full-text regex passes and built a
+Pydantic model per chunk. The streaming one cleans in a single pass and
+cuts chunks from a sliding window. Peak memory is measured with
+tracemalloc, both collecting every chunk and consuming them one at a
+time. Run from backend/:
+
+    python benchmarks/bench_content_processor.py --size-kb 500
+"""
+import argparse
+import json
+import os
+import random
+import re
+import tempfile
+import time
+import tracemalloc
+from datetime import datetime
+
+from pydantic import BaseModel, Field
+
+class LegacyChunk(BaseModel):
+    url: str
+    title: str
+    content: str
+    original_length: int
+    processed_length: int
+    extraction_quality: float
+    metadata: dict = Field(default_factory=dict)
+    timestamp: datetime = Field(default_factory=datetime.now)
+
+def legacy_process(url: str, title: str, content: str, chunk_size: int, overlap: int) -> list:
+    """ContentProcessor.process before streaming."""
+    original = content
+    content = re.sub(r'http\S+|www\S+', '', content)
+    content = re.sub(r'\S+@\S+', '', content)
+    content = re.sub(r'[!?]{2,}', '!', content)
+    content = re.sub(r'[\x00-\x1f\x7f-\x9f]', '', content)
+    content = re.sub(r'\n{2,}', '\n', content)
+    content = re.sub(r' {2,}', ' ', content)
+    normalized = content.replace('\t', ' ').strip()
+    chunks = []
+    start = 0
+    while start < len(normalized):
+        chunk_text = normalized[start:start + chunk_size]
+        score = min(len(chunk_text) / len(original), 1.0) * 0.7
+        if len(chunk_text.split()) > 10:
+            score += 0.15
+        if '.' in chunk_text:
+            score += 0.15
+        chunks.append(LegacyChunk(
+            url=url, title=title, content=chunk_text, original_length=len(original),
+            processed_length=len(chunk_text), extraction_quality=min(score, 1.0),
+            metadata={'chunk_index': len(chunks)}, timestamp=datetime.now()
+        ))
+        start += chunk_size - overlap
+    return chunks
+
+def _page(size: int) -> str:
+    """Synthetic page text with links, emails, punctuation runs and line breaks."""
+    rng = random.Random(0)
+    words = ("search index vector browser page token memory query cache chunk stream "
+             "latency ranking embedding network").split()
+    extras = ["https://example.com/a/b?x=1", "www.example.org", "someone@example.com",
+              "!!", "?!?", "\n", "\n\n", "\t", "  "]
+    parts, length = [], 0
+    while length < size:
+        part = rng.choice(extras) if rng.random() < 0.08 else rng.choice(words)
+        parts.append(part)
+        length += len(part) + 1
+    return " ".join(parts)[:size]
+
+def _measure(run, repeat: int) -> dict:
+    """Best wall time and tracemalloc peak of run()."""
+    seconds = min(_timed(run) for _ in range(repeat))
+    tracemalloc.start()
+    run()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return {"seconds": seconds, "peak_mb": peak / 2 ** 20}
+
+def _timed(run) -> float:
+    start = time.perf_counter()
+    run()
+    return time.perf_counter() - start
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--size-kb", type=int, default=500)
+    parser.add_argument("--chunk-size", type=int, default=512)
+    parser.add_argument("--chunk-overlap", type=int, default=40)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    # Settings are read at import time
+    data_dir = tempfile.mkdtemp(prefix="bench_content_processor_")
+    os.environ["DATA_DIR"] = data_dir
+    os.environ["CACHE_DIR"] = os.path.join(data_dir, "cache")
+    os.environ["CHUNK_STRATEGY"] = "fixed"
+
+    from smart_search.perception.content_processor import ContentProcessor
+
+    processor = ContentProcessor()
+    processor.chunk_size, processor.chunk_overlap = args.chunk_size, args.chunk_overlap
+    content = _page(args.size_kb * 1024)
+    megabytes = len(content.encode()) / 2 ** 20
+
+    legacy = legacy_process("u", "t", content, args.chunk_size, args.chunk_overlap)
+    streamed = processor.process("u", "t", content)[0]
+    assert [c.content for c in legacy] == [c.content for c in streamed], "chunk mismatch"
+
+    def consume() -> None:
+        for _ in processor.iter_chunks("u", "t", content):
+            pass
+
+    runs = {
+        "legacy": _measure(lambda: legacy_process("u", "t", content, args.chunk_size, args.chunk_overlap),
+                           args.repeat),
+        "streaming_list": _measure(lambda: processor.process("u", "t", content), args.repeat),
+        "streaming_iter": _measure(consume, args.repeat),
+    }
+    print(json.dumps({
+        "size_mb": round(megabytes, 2),
+        "chunks": len(streamed),
+        **{name: {"mb_per_s": round(megabytes / r["seconds"], 1), "peak_mb": round(r["peak_mb"], 2)}
+           for name, r in runs.items()},
+        "speedup": round(runs["legacy"]["seconds"] / runs["streaming_list"]["seconds"], 2),
+    }, indent=2))
+
+if __name__ == "__main__":
+    main()
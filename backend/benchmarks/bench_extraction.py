@@ -0,0 +1,112 @@
+"""Benchmark HTML extraction: BeautifulSoup against lxml, with and without main-content extraction.
+
+Runs each path over a corpus of HTML files (--corpus DIR), or over
+generated pages shaped like heavy news/blog pages: scripts and styles,
+navigation, sidebars, comment threads and a footer around one article.
+For generated pages article words and boilerplate words come from
+separate vocabularies, so "article_recall" and "boilerplate_share"
+measure how much of the article is kept and how much junk remains.
+"chunks" is what ContentProcessor would send to the embedder. Run from
+backend/:
+
+    python benchmarks/bench_extraction.py --pages 50
+"""
+import argparse
+import glob
+import json
+import os
+import random
+import statistics
+import tempfile
+import time
+
+ARTICLE = ("vector index embedding query latency recall chunk memory ranking cache "
+           "throughput search retrieval model offset").split()
+BOILERPLATE = ("home login subscribe share tweet copyright privacy terms cookie menu "
+               "advertisement related trending sponsored newsletter").split()
+
+def _words(rng: random.Random, vocabulary: list, count: int) -> str:
+    return " ".join(rng.choice(vocabulary) for _ in range(count))
+
+def _page(seed: int) -> str:
+    """One heavy page around an article of several paragraphs."""
+    rng = random.Random(seed)
+    script = "<script>var data = {" + ",".join(f'"k{i}": {i}' for i in range(400)) + "};</script>"
+    style = "<style>" + " ".join(f".c{i} {{ margin: {i}px; }}" for i in range(300)) + "</style>"
+    nav = "<nav><ul>" + "".join(f'<li><a href="/{i}">{_words(rng, BOILERPLATE, 2)}</a></li>'
+                                for i in range(40)) + "</ul></nav>"
+    paragraphs = "".join(
+        f"<p>{_words(rng, ARTICLE, 30)}, <a href='/x'>{_words(rng, ARTICLE, 2)}</a> {_words(rng, ARTICLE, 25)}.</p>"
+        for _ in range(rng.randint(8, 20))
+    )
+    article = f"<div class='post-content'><h1>{_words(rng, ARTICLE, 6)}</h1>{paragraphs}</div>"
+    sidebar = "<div class='sidebar'>" + "".join(
+        f"<div class='widget'><a href='/r{i}'>{_words(rng, BOILERPLATE, 6)}</a></div>" for i in range(30)
+    ) + "</div>"
+    comments = "<div id='comments'>" + "".join(
+        f"<div class='comment'><span>{_words(rng, BOILERPLATE, 3)}</span><p>{_words(rng, BOILERPLATE, 20)}</p></div>"
+        for _ in range(25)
+    ) + "</div>"
+    footer = f"<footer>{_words(rng, BOILERPLATE, 40)}</footer>"
+    wrappers = "".join("<div class='wrap'>" for _ in range(10)), "".join("</div>" for _ in range(10))
+    return (f"<!DOCTYPE html><html><head><title>Page {seed}</title>{style}{script}</head><body>{nav}"
+            f"{wrappers[0]}<main>{article}{sidebar}</main>{comments}{wrappers[1]}{footer}{script}</body></html>")
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--corpus", help="directory of .html files; generated pages if omitted")
+    parser.add_argument("--pages", type=int, default=50)
+    args = parser.parse_args()
+
+    # Settings are read at import time
+    data_dir = tempfile.mkdtemp(prefix="bench_extraction_")
+    os.environ["DATA_DIR"] = data_dir
+    os.environ["CACHE_DIR"] = os.path.join(data_dir, "cache")
+
+    from smart_search.perception.content_processor import ContentProcessor
+    from smart_search.perception.page_extractor import PageExtractor
+
+    if args.corpus:
+        pages = []
+        for path in sorted(glob.glob(os.path.join(args.corpus, "*.html"))):
+            with open(path, "r", encoding="utf-8", errors="replace") as f:
+                pages.append(f.read())
+    else:
+        pages = [_page(i) for i in range(args.pages)]
+    megabytes = sum(len(p.encode()) for p in pages) / 2 ** 20
+    processor = ContentProcessor()
+    article, boilerplate = set(ARTICLE), set(BOILERPLATE)
+
+    paths = {
+        "bs4": PageExtractor._extract_bs4,
+        "lxml": lambda html: PageExtractor._extract_lxml(html, main_content=False)[0],
+        "lxml_main": lambda html: PageExtractor._extract_lxml(html, main_content=True)[0],
+    }
+    report = {"pages": len(pages), "size_mb": round(megabytes, 2)}
+    for name, extract in paths.items():
+        times, texts = [], []
+        for html in pages:
+            start = time.perf_counter()
+            texts.append(extract(html))
+            times.append(time.perf_counter() - start)
+        words = [w for text in texts for w in text.split()]
+        result = {
+            "ms_per_page_p50": round(statistics.median(times) * 1000, 2),
+            "mb_per_s": round(megabytes / sum(times), 1),
+            "chunks": sum(len(processor.process("u", "t", text)[0]) for text in texts),
+        }
+        if not args.corpus:
+            kept = sum(1 for w in words if w.strip(",.") in article)
+            junk = sum(1 for w in words if w in boilerplate)
+            result["boilerplate_share"] = round(junk / max(kept + junk, 1), 2)
+            result["article_words"] = kept
+        report[name] = result
+    if not args.corpus:
+        # BeautifulSoup keeps every word, so it is the recall baseline
+        baseline = report["bs4"]["article_words"]
+        for name in paths:
+            report[name]["article_recall"] = round(report[name].pop("article_words") / max(baseline, 1), 2)
+    print(json.dumps(report, indent=2))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,81 @@
+"""Benchmark save latency as the corpus grows.
+
+Compares the incremental WAL append done by VectorStore.save() with a full
+checkpoint at each corpus size. Run from backend/:
+
+    python benchmarks/bench_persistence.py --max-chunks 100000
+"""
+import argparse
+import json
+import os
+import sys
+import tempfile
+import time
+from datetime import datetime
+
+import numpy as np
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--dimension", type=int, default=768)
+    parser.add_argument("--chunks-per-page", type=int, default=100)
+    parser.add_argument("--max-chunks", type=int, default=100000)
+    parser.add_argument("--report-every", type=int, default=10000)
+    args = parser.parse_args()
+
+    # Settings are read at import time
+    data_dir = tempfile.mkdtemp(prefix="bench_persistence_")
+    os.environ["DATA_DIR"] = data_dir
+    os.environ.setdefault("LOG_LEVEL", "WARNING")
+    os.environ.setdefault("INDEX_TYPE", "flat")
+    # Never checkpoint from save() so the two paths are measured separately
+    os.environ["WAL_CHECKPOINT_MB"] = str(1 << 20)
+
+    from smart_search.core.logging_config import setup_logging
+    from smart_search.memory.schemas import StoredPage
+    from smart_search.memory.vector_store import VectorStore
+    setup_logging()
+
+    rng = np.random.default_rng(0)
+    store = VectorStore(args.dimension)
+    results = []
+    page_num = 0
+    while store.index.ntotal < args.max_chunks:
+        url = f"https://example.com/page/{page_num}"
+        vectors = rng.standard_normal((args.chunks_per_page, args.dimension)).astype(np.float32)
+        vectors /= np.linalg.norm(vectors, axis=1, keepdims=True)
+        pages = [
+            StoredPage(
+                url=url,
+                title=f"Page {page_num}",
+                content=f"chunk {i} of page {page_num} " * 20,
+                timestamp=datetime.now(),
+                embedding_dimension=args.dimension,
+                metadata={"chunk_index": i},
+            )
+            for i in range(args.chunks_per_page)
+        ]
+        store.add_batch(vectors, pages)
+
+        start = time.perf_counter()
+        store.save()
+        save_ms = (time.perf_counter() - start) * 1000
+        page_num += 1
+
+        if store.index.ntotal % args.report_every < args.chunks_per_page:
+            start = time.perf_counter()
+            store.checkpoint()
+            checkpoint_ms = (time.perf_counter() - start) * 1000
+            results.append({
+                "chunks": store.index.ntotal,
+                "save_ms": round(save_ms, 2),
+                "checkpoint_ms": round(checkpoint_ms, 2),
+            })
+            print(json.dumps(results[-1]), file=sys.stderr)
+
+    store.close()
+    print(json.dumps({"dimension": args.dimension, "chunks_per_page": args.chunks_per_page,
+                      "data_dir": data_dir, "results": results}, indent=2))
+
+if __name__ == "__main__":
+    main()
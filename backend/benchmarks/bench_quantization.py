@@ -0,0 +1,110 @@
+"""Benchmark memory, recall and latency of quantized vector storage.
+
+Builds a store per VECTOR_STORAGE mode (full, sq8, pq) over the same
+clustered synthetic vectors. Then, for several re-rank factors, it measures:
+- memory held by vector codes
+- recall@k against exact search
+- single-query search latency
+
+Run from backend/:
+
+    python benchmarks/bench_quantization.py --vectors 50000 --dimension 768
+"""
+import argparse
+import json
+import os
+import sys
+import tempfile
+import time
+from datetime import datetime
+
+import numpy as np
+
+def _vectors(rng, count: int, dimension: int, clusters: int) -> np.ndarray:
+    """Unit vectors scattered around random cluster centers, like embeddings of related pages."""
+    centers = rng.standard_normal((clusters, dimension)).astype(np.float32)
+    noise = rng.standard_normal((count, dimension)).astype(np.float32)
+    vectors = centers[rng.integers(0, clusters, count)] + 0.6 * noise
+    return vectors / np.linalg.norm(vectors, axis=1, keepdims=True)
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--vectors", type=int, default=50000)
+    parser.add_argument("--dimension", type=int, default=768)
+    parser.add_argument("--clusters", type=int, default=200)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--k", type=int, default=10)
+    parser.add_argument("--index-type", default="flat")
+    parser.add_argument("--storage", nargs="+", default=["full", "sq8", "pq"])
+    parser.add_argument("--rerank-factors", type=int, nargs="+", default=[1, 2, 4, 8])
+    args = parser.parse_args()
+
+    # Settings are read at import time; each storage mode gets its own data dir below
+    root = tempfile.mkdtemp(prefix="bench_quantization_")
+    os.environ["DATA_DIR"] = root
+    os.environ["CACHE_DIR"] = os.path.join(root, "cache")
+    os.environ.setdefault("LOG_LEVEL", "WARNING")
+    os.environ["INDEX_TYPE"] = args.index_type
+    os.environ["LEXICAL_INDEX"] = "false"
+    os.environ["INDEX_TRAIN_MIN_VECTORS"] = str(min(10000, args.vectors))
+
+    from smart_search.core.config import get_settings
+    from smart_search.core.logging_config import setup_logging
+    from smart_search.memory.schemas import StoredPage
+    from smart_search.memory.vector_store import VectorStore
+
+    rng = np.random.default_rng(0)
+    vectors = _vectors(rng, args.vectors + args.queries, args.dimension, args.clusters)
+    vectors, queries = vectors[:args.vectors], vectors[args.vectors:]
+    expected = np.argsort(-(queries @ vectors.T), axis=1)[:, :args.k]
+
+    results = []
+    for storage in args.storage:
+        data_dir = os.path.join(root, storage)
+        os.environ["DATA_DIR"] = data_dir
+        os.environ["CACHE_DIR"] = os.path.join(data_dir, "cache")
+        os.environ["VECTOR_STORAGE"] = storage
+        get_settings.cache_clear()
+        setup_logging()
+
+        store = VectorStore(args.dimension)
+        start = time.perf_counter()
+        for offset in range(0, args.vectors, 1000):
+            batch = vectors[offset:offset + 1000]
+            pages = [
+                StoredPage(url=f"https://example.com/{offset + i}", title="", content="",
+                           timestamp=datetime.now(), embedding_dimension=args.dimension,
+                           metadata={"chunk_index": 0})
+                for i in range(len(batch))
+            ]
+            store.add_batch(batch, pages)
+        # Training and the switch to the quantized index run in the background
+        if store._compaction_thread is not None:
+            store._compaction_thread.join()
+        build_s = time.perf_counter() - start
+        stats = store.get_stats()
+
+        for factor in args.rerank_factors if stats["vector_storage"] != "full" else [0]:
+            store.settings.quantized_rerank_factor = factor
+            start = time.perf_counter()
+            found = [store.search_ids(query, args.k)[0] for query in queries]
+            latency_ms = (time.perf_counter() - start) * 1000 / len(queries)
+            hits = sum(len(set(e.tolist()) & set(f.tolist())) for e, f in zip(expected, found))
+            results.append({
+                "storage": stats["vector_storage"],
+                "index_type": stats["index_type"],
+                "rerank_factor": factor,
+                "vector_code_mb": round(stats["vector_code_bytes"] / 1e6, 2),
+                "vector_file_mb": round(stats["vector_file"].get("file_size", 0) / 1e6, 2),
+                "recall": round(hits / (len(queries) * args.k), 4),
+                "ms_per_query": round(latency_ms, 3),
+                "build_s": round(build_s, 2),
+            })
+            print(json.dumps(results[-1]), file=sys.stderr)
+        store.close()
+
+    print(json.dumps({"vectors": args.vectors, "dimension": args.dimension, "k": args.k,
+                      "data_dir": root, "results": results}, indent=2))
+
+if __name__ == "__main__":
+    main()
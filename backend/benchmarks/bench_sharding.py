@@ -0,0 +1,147 @@
+"""Benchmark search latency and memory against shard count and corpus size.
+
+Every configuration runs in its own process so resident memory is measured
+cleanly. For each corpus size it builds:
+- an unsharded store (SHARD_BY=none)
+- URL-hash sharded stores, one per shard count
+- a month-sharded store, reopened with SHARD_MAX_LOADED so that queries
+  restricted to recent months leave the cold shards unloaded
+
+and reports p50/p95 single-query latency, resident memory after the
+queries, and how many shards ended up loaded.
+
+Run from backend/:
+
+    python benchmarks/bench_sharding.py --vectors 20000 100000 --shards 1 2 4 8
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+import numpy as np
+
+# Months of pages spread over the corpus in time-sharded runs
+_MONTHS = 12
+
+def _rss_mb() -> float:
+    """Resident memory of this process."""
+    with open("/proc/self/statm") as f:
+        return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE") / 1e6
+
+def _vectors(rng, count: int, dimension: int) -> np.ndarray:
+    """Random unit vectors."""
+    vectors = rng.standard_normal((count, dimension)).astype(np.float32)
+    return vectors / np.linalg.norm(vectors, axis=1, keepdims=True)
+
+def run(config: dict) -> dict:
+    """Build one store, reopen it and time queries; runs in a child process."""
+    os.environ["DATA_DIR"] = config["data_dir"]
+    os.environ["CACHE_DIR"] = os.path.join(config["data_dir"], "cache")
+    os.environ.setdefault("LOG_LEVEL", "WARNING")
+    os.environ["LEXICAL_INDEX"] = "false"
+    os.environ["SHARD_BY"] = config["shard_by"]
+    os.environ["SHARD_COUNT"] = str(config["shards"])
+    os.environ["SHARD_SEARCH_THREADS"] = str(config["threads"])
+
+    from smart_search.core.config import get_settings
+    from smart_search.core.logging_config import setup_logging
+    from smart_search.memory.schemas import SearchFilter, StoredPage
+    from smart_search.memory.sharded_store import open_vector_store
+    setup_logging()
+
+    rng = np.random.default_rng(0)
+    count, dimension = config["vectors"], config["dimension"]
+    start_time = datetime(2025, 1, 1)
+    store = open_vector_store(dimension)
+    start = time.perf_counter()
+    for offset in range(0, count, 1000):
+        batch = _vectors(rng, min(1000, count - offset), dimension)
+        pages = [
+            StoredPage(url=f"https://site{(offset + i) % 997}.com/{(offset + i) // 10}", title="", content="",
+                       timestamp=start_time + timedelta(days=30 * (offset + i) * _MONTHS // count),
+                       embedding_dimension=dimension, metadata={"chunk_index": (offset + i) % 10})
+            for i in range(len(batch))
+        ]
+        store.add_batch(batch, pages)
+    store.save()
+    store.close()
+    build_s = time.perf_counter() - start
+
+    # Reopen so only what the queries touch is loaded
+    if config["max_loaded"]:
+        os.environ["SHARD_MAX_LOADED"] = str(config["max_loaded"])
+    get_settings.cache_clear()
+    store = open_vector_store(dimension)
+    allowed = None
+    if config["recent_days"]:
+        since = start_time + timedelta(days=30 * _MONTHS - config["recent_days"])
+        allowed = store.filter_mask(SearchFilter(since=since))
+    queries = _vectors(rng, config["queries"], dimension)
+    latencies = []
+    for query in queries:
+        start = time.perf_counter()
+        store.search_ids_batch(query[None, :], config["k"], allowed=allowed)
+        latencies.append((time.perf_counter() - start) * 1000)
+    stats = store.get_stats()
+    result = {
+        "vectors": count,
+        "shard_by": config["shard_by"],
+        "shards": len(stats.get("shards", {})) or 1,
+        "loaded_shards": stats.get("loaded_shards", 1),
+        "recent_days": config["recent_days"],
+        "p50_ms": round(float(np.percentile(latencies, 50)), 3),
+        "p95_ms": round(float(np.percentile(latencies, 95)), 3),
+        "rss_mb": round(_rss_mb(), 1),
+        "index_file_mb": round(stats["index_file_size"] / 1e6, 2),
+        "build_s": round(build_s, 2),
+    }
+    store.close()
+    return result
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--vectors", type=int, nargs="+", default=[20000, 100000])
+    parser.add_argument("--dimension", type=int, default=384)
+    parser.add_argument("--shards", type=int, nargs="+", default=[1, 2, 4, 8])
+    parser.add_argument("--threads", type=int, default=4)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--k", type=int, default=10)
+    parser.add_argument("--max-loaded", type=int, default=2, help="Loaded shard limit for the time-sharded run")
+    parser.add_argument("--recent-days", type=int, default=45, help="Time filter of the time-sharded queries")
+    parser.add_argument("--run", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.run:
+        print(json.dumps(run(json.loads(args.run))))
+        return
+
+    root = tempfile.mkdtemp(prefix="bench_sharding_")
+    configs = []
+    for count in args.vectors:
+        configs.append({"vectors": count, "shard_by": "none", "shards": 1, "max_loaded": 0, "recent_days": 0})
+        configs += [{"vectors": count, "shard_by": "url", "shards": shards, "max_loaded": 0, "recent_days": 0}
+                    for shards in args.shards]
+        configs.append({"vectors": count, "shard_by": "time", "shards": 1, "max_loaded": args.max_loaded,
+                        "recent_days": 0})
+        configs.append({"vectors": count, "shard_by": "time", "shards": 1, "max_loaded": args.max_loaded,
+                        "recent_days": args.recent_days})
+
+    results = []
+    for number, config in enumerate(configs):
+        config.update(dimension=args.dimension, threads=args.threads, queries=args.queries, k=args.k,
+                      data_dir=os.path.join(root, str(number)))
+        output = subprocess.run([sys.executable, __file__, "--run", json.dumps(config)],
+                                check=True, capture_output=True, text=True).stdout
+        results.append(json.loads(output.strip().splitlines()[-1]))
+        print(json.dumps(results[-1]), file=sys.stderr)
+
+    print(json.dumps({"dimension": args.dimension, "k": args.k, "threads": args.threads,
+                      "data_dir": root, "results": results}, indent=2))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,113 @@
+"""Benchmark VectorStore startup time and memory with and without mmap.
+
+Builds a store of synthetic chunks once, then opens it in fresh processes
+with INDEX_MMAP off (full read) and on (read-only memory map). RssAnon is
+private memory per worker; RssFile is page cache that workers share. Run
+from backend/:
+
+    python benchmarks/bench_startup.py --chunks 1000000
+"""
+import argparse
+import json
+import os
+import pickle
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime
+
+import numpy as np
+
+def _rss() -> dict:
+    """Resident memory split into private and file-backed pages, in MB."""
+    rss = {}
+    with open("/proc/self/status", "r", encoding="utf-8") as f:
+        for line in f:
+            if line.startswith(("RssAnon:", "RssFile:")):
+                name, value = line.split(":")
+                rss[name] = int(value.split()[0]) / 1024
+    return rss
+
+def build(data_dir: str, chunks: int, dimension: int, batch: int = 50000) -> None:
+    """Write a checkpointed store directly, skipping the write-ahead log."""
+    import faiss
+    from smart_search.memory.metadata_store import MetadataStore
+    from smart_search.memory.schemas import StoredPage
+
+    pages_dir = os.path.join(data_dir, "pages")
+    os.makedirs(pages_dir, exist_ok=True)
+    rng = np.random.default_rng(0)
+    index = faiss.IndexIDMap2(faiss.IndexFlatIP(dimension))
+    store = MetadataStore(os.path.join(pages_dir, "chunks.db"))
+    now = datetime.now()
+    for start in range(0, chunks, batch):
+        ids = np.arange(start, min(start + batch, chunks), dtype=np.int64)
+        vectors = rng.standard_normal((len(ids), dimension)).astype(np.float32)
+        vectors /= np.linalg.norm(vectors, axis=1, keepdims=True)
+        index.add_with_ids(vectors, ids)
+        store.put_many(ids.tolist(), [
+            StoredPage(url=f"https://example.com/page/{i // 100}", title=f"Page {i // 100}",
+                       content=f"chunk {i} " * 60, timestamp=now,
+                       embedding_dimension=dimension, metadata={"chunk_index": i % 100})
+            for i in ids.tolist()
+        ])
+    store.close()
+    faiss.write_index(index, os.path.join(pages_dir, "faiss_index.bin"))
+    with open(os.path.join(pages_dir, "metadata.pkl"), "wb") as f:
+        pickle.dump({"next_id": chunks, "tombstones": set()}, f)
+    with open(os.path.join(pages_dir, "index_state.json"), "w", encoding="utf-8") as f:
+        json.dump({"index_type": "flat", "trained_on": 0}, f)
+
+def load(dimension: int) -> None:
+    """Open the store in this process and print timings and memory."""
+    from smart_search.memory.vector_store import VectorStore
+
+    start = time.perf_counter()
+    store = VectorStore(dimension)
+    load_s = time.perf_counter() - start
+    after_load = _rss()
+    query = np.random.default_rng(1).standard_normal(dimension).astype(np.float32)
+    start = time.perf_counter()
+    store.search(query, 10)
+    search_ms = (time.perf_counter() - start) * 1000
+    print(json.dumps({
+        "mmap": store.settings.index_mmap,
+        "load_s": round(load_s, 3),
+        "first_search_ms": round(search_ms, 2),
+        "rss_after_load_mb": after_load,
+        "rss_after_search_mb": _rss(),
+    }))
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--chunks", type=int, default=1000000)
+    parser.add_argument("--dimension", type=int, default=768)
+    parser.add_argument("--data-dir", default=None, help="Reuse a store built earlier")
+    parser.add_argument("--load", action="store_true", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.load:
+        load(args.dimension)
+        return
+
+    data_dir = args.data_dir or tempfile.mkdtemp(prefix="bench_startup_")
+    env = dict(os.environ, DATA_DIR=data_dir, LOG_LEVEL=os.environ.get("LOG_LEVEL", "WARNING"))
+    if not os.path.exists(os.path.join(data_dir, "pages", "faiss_index.bin")):
+        start = time.perf_counter()
+        subprocess.run([sys.executable, "-c",
+                        f"import sys; sys.path.insert(0, {os.path.dirname(__file__)!r}); "
+                        f"import bench_startup; bench_startup.build({data_dir!r}, {args.chunks}, {args.dimension})"],
+                       env=env, check=True)
+        print(f"Built {args.chunks} chunks in {time.perf_counter() - start:.1f}s", file=sys.stderr)
+
+    results = []
+    for mmap in ("false", "true"):
+        out = subprocess.run([sys.executable, __file__, "--load", "--dimension", str(args.dimension)],
+                             env=dict(env, INDEX_MMAP=mmap), check=True, capture_output=True, text=True)
+        results.append(json.loads(out.stdout.strip().splitlines()[-1]))
+    print(json.dumps({"chunks": args.chunks, "dimension": args.dimension,
+                      "data_dir": data_dir, "results": results}, indent=2))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,79 @@
+"""Deterministic synthetic corpora for the benchmarks.
+
+Words come from a generated vocabulary and are drawn with a Zipf-like
+skew, so term frequencies look like natural text to BM25 and to the fake
+embedder. The same seed always yields the same pages, chunks and queries.
+"""
+import itertools
+from datetime import datetime, timedelta
+from typing import Iterator, List
+
+import numpy as np
+
+_SYLLABLES = ("ka", "lo", "mi", "ne", "ru", "ta", "vo", "si", "de", "po", "ga", "fe", "zu", "bi", "an",
+              "or", "el", "um", "ix", "en")
+# Characters per chunk ContentProcessor cuts at the default chunk size and overlap
+CHUNK_CHARS = 472
+
+def vocabulary(size: int = 8000) -> List[str]:
+    """size distinct pseudo-words of two to four syllables."""
+    words = []
+    for length in (2, 3, 4):
+        for combination in itertools.product(_SYLLABLES, repeat=length):
+            words.append("".join(combination))
+            if len(words) == size:
+                return words
+    return words
+
+class Corpus:
+    """Pages, chunk texts and queries drawn from one vocabulary."""
+
+    def __init__(self, seed: int = 0, vocabulary_size: int = 8000):
+        self.seed = seed
+        self.words = np.array(vocabulary(vocabulary_size))
+        weights = 1.0 / np.arange(1, len(self.words) + 1)
+        self._cumulative = np.cumsum(weights / weights.sum())
+
+    def _rng(self, *key: int) -> np.random.Generator:
+        return np.random.default_rng([self.seed, *key])
+
+    def text(self, key: int, words: int) -> str:
+        """Text of sentences built from words drawn for key."""
+        rng = self._rng(1, key)
+        positions = np.searchsorted(self._cumulative, rng.random(words))
+        drawn = self.words[np.minimum(positions, len(self.words) - 1)]
+        sentences = []
+        for start in range(0, words, 12):
+            sentence = " ".join(drawn[start:start + 12].tolist())
+            sentences.append(sentence[:1].upper() + sentence[1:] + ".")
+        return " ".join(sentences)
+
+    def chunk_text(self, key: int) -> str:
+        """Text about the length of one chunk."""
+        return self.text(key, CHUNK_CHARS // 6)
+
+    def pages(self, count: int, chunks_per_page: int = 10, start: int = 0) -> Iterator[dict]:
+        """Pages as url/title/content dicts, each cutting into about chunks_per_page chunks."""
+        for number in range(start, start + count):
+            paragraphs = [self.chunk_text(number * chunks_per_page + i) for i in range(chunks_per_page)]
+            yield {
+                "url": f"https://site{number % 97}.example.com/page/{number}",
+                "title": f"Page {number}: {self.text(2 * 10 ** 9 + number, 4).rstrip('.')}",
+                "content": "\n\n".join(paragraphs),
+            }
+
+    def queries(self, count: int, words: int = 4) -> List[str]:
+        """Distinct queries, so none is answered from the query embedding cache."""
+        return [f"{self.text(10 ** 9 + number, words).rstrip('.')} {number}" for number in range(count)]
+
+    def vectors(self, count: int, dimension: int, start: int = 0, clusters: int = 256) -> np.ndarray:
+        """Unit vectors scattered around random cluster centers, like embeddings of related pages."""
+        centers = self._rng(2).standard_normal((clusters, dimension)).astype(np.float32)
+        rng = self._rng(3, start)
+        vectors = centers[rng.integers(0, clusters, count)] + 0.6 * rng.standard_normal(
+            (count, dimension)).astype(np.float32)
+        return vectors / np.linalg.norm(vectors, axis=1, keepdims=True)
+
+    def timestamp(self, key: int) -> datetime:
+        """Visit time spread over the year before a fixed date."""
+        return datetime(2025, 1, 1) - timedelta(minutes=int(self._rng(4, key).integers(0, 525600)))
@@ -0,0 +1,180 @@
+"""Deterministic stand-in for the Ollama embedding API.
+
+A text embeds as the sum of hash-seeded vectors of its words, so the same
+text always gets the same vector and texts sharing words come out
+similar, which keeps search results meaningful. Serves /api/embed,
+/api/embeddings and /api/tags with a configurable dimension, latency and
+error rate. Run standalone from backend/:
+
+    python benchmarks/fake_ollama.py --port 11434 --dimension 768 --latency-ms 20
+
+or in-process with FakeOllama, as benchmarks/suite.py does.
+"""
+import argparse
+import hashlib
+import json
+import random
+import re
+import threading
+import time
+from functools import lru_cache
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import List, Optional
+
+import numpy as np
+
+_WORD_RE = re.compile(r"\w+")
+
+class FakeEmbedder:
+    """Hash-seeded bag-of-words embeddings."""
+
+    def __init__(self, dimension: int = 768):
+        self.dimension = dimension
+        self._word_vector = lru_cache(maxsize=200000)(self._seeded_vector)
+
+    def _seeded_vector(self, token: str) -> np.ndarray:
+        """Standard normal vector seeded by a hash of the token."""
+        seed = int.from_bytes(hashlib.blake2b(token.encode(), digest_size=8).digest(), "little")
+        return np.random.default_rng(seed).standard_normal(self.dimension).astype(np.float32)
+
+    def embed(self, text: str) -> List[float]:
+        """Embedding of one text."""
+        words = _WORD_RE.findall(text.lower())
+        if not words:
+            return self._word_vector(text).tolist()
+        return np.sum([self._word_vector(word) for word in words], axis=0).tolist()
+
+class _Handler(BaseHTTPRequestHandler):
+    """Ollama API subset; the server attribute is a _Server."""
+
+    protocol_version = "HTTP/1.1"
+    # Headers and body go out in separate writes; without this, delayed ACKs add ~40ms per request
+    disable_nagle_algorithm = True
+
+    def log_message(self, *args) -> None:
+        pass
+
+    def _send(self, status: int, body: dict) -> None:
+        data = json.dumps(body).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def do_GET(self) -> None:
+        if self.path == "/api/tags":
+            self._send(200, {"models": [{"name": f"{self.server.model}:latest"}]})
+        else:
+            self._send(404, {"error": "not found"})
+
+    def do_POST(self) -> None:
+        body = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))) or b"{}")
+        server = self.server
+        if self.path == "/api/embed" and server.batch_endpoint:
+            texts = body.get("input", [])
+            texts = [texts] if isinstance(texts, str) else texts
+        elif self.path == "/api/embeddings":
+            texts = [body.get("prompt", "")]
+        else:
+            self._send(404, {"error": "not found"})
+            return
+        server.wait(len(texts))
+        if server.fail():
+            self._send(503, {"error": "server busy"})
+            return
+        embeddings = [server.embedder.embed(text) for text in texts]
+        with server.lock:
+            server.requests += 1
+            server.texts += len(texts)
+        if self.path == "/api/embed":
+            self._send(200, {"model": server.model, "embeddings": embeddings})
+        else:
+            self._send(200, {"embedding": embeddings[0]})
+
+class _Server(ThreadingHTTPServer):
+    daemon_threads = True
+
+class FakeOllama:
+    """Fake Ollama server running on a background thread.
+
+    latency_ms is added to every request and per_text_ms to each text it
+    embeds; error_rate is the share of requests answered with 503, drawn
+    from a seeded generator.
+    """
+
+    def __init__(self, dimension: int = 768, host: str = "127.0.0.1", port: int = 0,
+                 latency_ms: float = 0.0, per_text_ms: float = 0.0, error_rate: float = 0.0,
+                 model: str = "nomic-embed-text", batch_endpoint: bool = True, seed: int = 0):
+        self.server = _Server((host, port), _Handler)
+        self.server.embedder = FakeEmbedder(dimension)
+        self.server.model = model
+        self.server.batch_endpoint = batch_endpoint
+        self.server.lock = threading.Lock()
+        self.server.requests = 0
+        self.server.texts = 0
+        rng = random.Random(seed)
+        rng_lock = threading.Lock()
+
+        def wait(texts: int) -> None:
+            delay = (latency_ms + per_text_ms * texts) / 1000
+            if delay > 0:
+                time.sleep(delay)
+
+        def fail() -> bool:
+            with rng_lock:
+                return error_rate > 0 and rng.random() < error_rate
+
+        self.server.wait = wait
+        self.server.fail = fail
+        self._thread: Optional[threading.Thread] = None
+
+    @property
+    def url(self) -> str:
+        """Base URL to use as OLLAMA_BASE_URL."""
+        host, port = self.server.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def stats(self) -> dict:
+        """Requests served and texts embedded."""
+        return {"requests": self.server.requests, "texts": self.server.texts}
+
+    def start(self) -> "FakeOllama":
+        """Serve on a daemon thread."""
+        self._thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self) -> None:
+        """Shut the server down."""
+        self.server.shutdown()
+        self.server.server_close()
+
+    def __enter__(self) -> "FakeOllama":
+        return self.start()
+
+    def __exit__(self, *exc) -> None:
+        self.stop()
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=11434)
+    parser.add_argument("--dimension", type=int, default=768)
+    parser.add_argument("--latency-ms", type=float, default=0.0, help="Added to every request")
+    parser.add_argument("--per-text-ms", type=float, default=0.0, help="Added per embedded text")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="Share of requests answered with 503")
+    parser.add_argument("--model", default="nomic-embed-text")
+    parser.add_argument("--no-batch", action="store_true", help="Answer /api/embed with 404, like old Ollama")
+    args = parser.parse_args()
+
+    server = FakeOllama(args.dimension, args.host, args.port, args.latency_ms, args.per_text_ms,
+                        args.error_rate, args.model, not args.no_batch)
+    print(f"Fake Ollama at {server.url} (dimension {args.dimension})", flush=True)
+    try:
+        server.server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,421 @@
+"""Reproducible benchmark suite, emitting JSON that can be compared between commits.
+
+Every scenario runs once per corpus size in a fresh process, with its own
+data directory and a deterministic fake Ollama server (fake_ollama.py)
+in place of a live one:
+
+- content_processor: chunking throughput of ContentProcessor
+- vector_store: add throughput, WAL save and checkpoint time, search
+  p50/p99, startup time and RSS of VectorStore
+- executor: bulk and single-page index throughput, search p50/p99,
+  per-stage timings from core.metrics, startup time and RSS of
+  AgentExecutor
+- api: the same through the FastAPI endpoints, plus /stats and /metrics
+
+Sizes are in chunks. Metrics ending in _per_s are better higher; those
+ending in _ms, _s or _mb are better lower. Run from backend/:
+
+    python benchmarks/suite.py --output base.json
+    python benchmarks/suite.py --scenarios vector_store --sizes 1000000 --env INDEX_TYPE=hnsw
+    python benchmarks/suite.py --compare base.json head.json --threshold 0.15
+"""
+import argparse
+import asyncio
+import json
+import os
+import platform
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime, timezone
+from typing import Dict, List, Optional
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+from corpus import Corpus
+from fake_ollama import FakeOllama
+
+SCENARIOS = ("content_processor", "vector_store", "executor", "api")
+# Corpus sizes per scenario when --sizes is not given
+DEFAULT_SIZES = {
+    "content_processor": [1000, 10000, 100000],
+    "vector_store": [1000, 10000, 100000],
+    "executor": [1000, 10000],
+    "api": [1000, 10000],
+}
+CHUNKS_PER_PAGE = 10
+# Pages per request to /index/bulk
+BULK_PAGES = 200
+
+def _latency(samples_ms: List[float], prefix: str) -> dict:
+    """p50, p99 and mean of latency samples."""
+    if not samples_ms:
+        return {}
+    return {
+        f"{prefix}_p50_ms": round(float(np.percentile(samples_ms, 50)), 3),
+        f"{prefix}_p99_ms": round(float(np.percentile(samples_ms, 99)), 3),
+        f"{prefix}_mean_ms": round(float(np.mean(samples_ms)), 3),
+    }
+
+def _memory() -> dict:
+    """Current and peak resident memory."""
+    from smart_search.core.metrics import resident_memory_bytes
+    rss = resident_memory_bytes()
+    return {
+        "rss_mb": round(rss / 1e6, 1) if rss is not None else None,
+        # ru_maxrss is in KB on Linux
+        "peak_rss_mb": round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1e3, 1),
+    }
+
+def _stage_means() -> dict:
+    """Mean time per pipeline stage recorded by core.metrics."""
+    from smart_search.core import metrics
+    means = {}
+    for (pipeline, stage), (count, total) in sorted(metrics.STAGE_SECONDS.totals().items()):
+        if count:
+            means[f"{pipeline}.{stage}_ms"] = round(total / count * 1000, 3)
+    return means
+
+def content_processor(chunks: int, config: dict) -> dict:
+    """Chunk synthetic pages with the configured strategy."""
+    from smart_search.perception.content_processor import ContentProcessor
+
+    corpus = Corpus(config["seed"])
+    processor = ContentProcessor()
+    produced = characters = 0
+    seconds = 0.0
+    for page in corpus.pages(max(1, chunks // CHUNKS_PER_PAGE), CHUNKS_PER_PAGE):
+        start = time.perf_counter()
+        produced += sum(1 for _ in processor.iter_chunks(page["url"], page["title"], page["content"]))
+        seconds += time.perf_counter() - start
+        characters += len(page["content"])
+    return {
+        "chunks_out": produced,
+        "chunks_per_s": round(produced / seconds, 1),
+        "mb_per_s": round(characters / 1e6 / seconds, 2),
+        **_memory(),
+    }
+
+def vector_store(chunks: int, config: dict) -> dict:
+    """Add, save, checkpoint, search and reopen a VectorStore."""
+    from smart_search.memory.schemas import StoredPage
+    from smart_search.memory.vector_store import VectorStore
+
+    corpus = Corpus(config["seed"])
+    dimension = config["dimension"]
+    store = VectorStore(dimension)
+    add_seconds = 0.0
+    save_ms = []
+    for start in range(0, chunks, 1000):
+        count = min(1000, chunks - start)
+        vectors = corpus.vectors(count, dimension, start)
+        pages = [
+            StoredPage(url=f"https://site{i // CHUNKS_PER_PAGE % 97}.example.com/page/{i // CHUNKS_PER_PAGE}",
+                       title=f"Page {i // CHUNKS_PER_PAGE}", content=corpus.chunk_text(i),
+                       timestamp=corpus.timestamp(i), embedding_dimension=dimension,
+                       metadata={"chunk_index": i % CHUNKS_PER_PAGE})
+            for i in range(start, start + count)
+        ]
+        begin = time.perf_counter()
+        store.add_batch(vectors, pages)
+        add_seconds += time.perf_counter() - begin
+        begin = time.perf_counter()
+        store.save()
+        save_ms.append((time.perf_counter() - begin) * 1000)
+    # Index training or compaction may still be running in the background
+    if store._compaction_thread is not None:
+        store._compaction_thread.join()
+    begin = time.perf_counter()
+    store.checkpoint()
+    checkpoint_s = time.perf_counter() - begin
+
+    queries = corpus.vectors(config["queries"], dimension, start=10 ** 9)
+    search_ms = []
+    for query in queries:
+        begin = time.perf_counter()
+        store.search(query, config["top_k"])
+        search_ms.append((time.perf_counter() - begin) * 1000)
+    store.close()
+
+    begin = time.perf_counter()
+    store = VectorStore(dimension)
+    startup_s = time.perf_counter() - begin
+    begin = time.perf_counter()
+    store.search(queries[0], config["top_k"])
+    first_search_ms = (time.perf_counter() - begin) * 1000
+    result = {
+        "add_per_s": round(chunks / add_seconds, 1),
+        **_latency(save_ms, "save"),
+        "checkpoint_s": round(checkpoint_s, 3),
+        **_latency(search_ms, "search"),
+        "startup_s": round(startup_s, 3),
+        "first_search_ms": round(first_search_ms, 3),
+        "index_file_mb": round(store.get_stats()["index_file_size"] / 1e6, 2),
+        **_memory(),
+    }
+    store.close()
+    return result
+
+async def _executor(chunks: int, config: dict) -> dict:
+    from smart_search.agent.executor import AgentExecutor
+
+    corpus = Corpus(config["seed"])
+    pages = max(1, chunks // CHUNKS_PER_PAGE)
+    # A few pages are indexed one at a time for per-request latency, the rest in bulk
+    singles = min(50, max(1, pages // 10))
+    executor = AgentExecutor()
+
+    async def items():
+        for page in corpus.pages(pages - singles, CHUNKS_PER_PAGE):
+            yield page
+
+    begin = time.perf_counter()
+    bulk_chunks = 0
+    async for result in executor.handle_bulk_index_request(items()):
+        if not result["success"]:
+            raise RuntimeError(result["message"])
+        bulk_chunks += result.get("total_chunks", 0)
+    bulk_s = time.perf_counter() - begin
+
+    index_ms = []
+    for page in corpus.pages(singles, CHUNKS_PER_PAGE, start=pages - singles):
+        begin = time.perf_counter()
+        success, message, _ = await executor.handle_index_request(page["url"], page["title"], page["content"])
+        index_ms.append((time.perf_counter() - begin) * 1000)
+        if not success:
+            raise RuntimeError(message)
+
+    search_ms = []
+    for query in corpus.queries(config["queries"]):
+        begin = time.perf_counter()
+        success, message, _, _ = await executor.handle_search_request(query, config["top_k"])
+        search_ms.append((time.perf_counter() - begin) * 1000)
+        if not success:
+            raise RuntimeError(message)
+    stages = _stage_means()
+    stored = executor.vector_store.live_count
+    await executor.close()
+
+    begin = time.perf_counter()
+    executor = AgentExecutor()
+    startup_s = time.perf_counter() - begin
+    result = {
+        "chunks_stored": stored,
+        "bulk_pages_per_s": round((pages - singles) / bulk_s, 1) if pages > singles else None,
+        "bulk_chunks_per_s": round(bulk_chunks / bulk_s, 1) if bulk_chunks else None,
+        **_latency(index_ms, "index"),
+        **_latency(search_ms, "search"),
+        "startup_s": round(startup_s, 3),
+        "stages": stages,
+        **_memory(),
+    }
+    await executor.close()
+    return result
+
+def executor(chunks: int, config: dict) -> dict:
+    """Index and search through AgentExecutor."""
+    return asyncio.run(_executor(chunks, config))
+
+def api(chunks: int, config: dict) -> dict:
+    """Index and search through the FastAPI endpoints."""
+    begin = time.perf_counter()
+    from fastapi.testclient import TestClient
+    from smart_search.main import app
+
+    corpus = Corpus(config["seed"])
+    pages = max(1, chunks // CHUNKS_PER_PAGE)
+    with TestClient(app) as client:
+        startup_s = time.perf_counter() - begin
+        begin = time.perf_counter()
+        for start in range(0, pages, BULK_PAGES):
+            body = "\n".join(json.dumps(page) for page in corpus.pages(min(BULK_PAGES, pages - start),
+                                                                       CHUNKS_PER_PAGE, start))
+            response = client.post("/api/v1/index/bulk", content=body,
+                                   headers={"Content-Type": "application/x-ndjson"})
+            response.raise_for_status()
+        bulk_s = time.perf_counter() - begin
+
+        queries = corpus.queries(config["queries"])
+        search_ms = []
+        for query in queries:
+            begin = time.perf_counter()
+            client.post("/api/v1/search", json={"query": query, "top_k": config["top_k"]}).raise_for_status()
+            search_ms.append((time.perf_counter() - begin) * 1000)
+        batch_ms = []
+        for start in range(0, len(queries), 10):
+            batch = [f"{query} batch" for query in queries[start:start + 10]]
+            begin = time.perf_counter()
+            response = client.post("/api/v1/search/batch", json={"queries": batch, "top_k": config["top_k"]})
+            response.raise_for_status()
+            batch_ms.append((time.perf_counter() - begin) * 1000)
+        timings = {}
+        for name, path in (("stats", "/api/v1/stats"), ("metrics", "/metrics")):
+            begin = time.perf_counter()
+            client.get(path).raise_for_status()
+            timings[f"{name}_ms"] = round((time.perf_counter() - begin) * 1000, 3)
+        total_pages = client.get("/api/v1/stats").json()["total_pages"]
+    return {
+        "startup_s": round(startup_s, 3),
+        "chunks_stored": total_pages,
+        "bulk_pages_per_s": round(pages / bulk_s, 1),
+        "bulk_chunks_per_s": round(total_pages / bulk_s, 1),
+        **_latency(search_ms, "search"),
+        **_latency(batch_ms, "batch_search_10"),
+        **timings,
+        **_memory(),
+    }
+
+def _run_child(config: dict) -> dict:
+    """Run one scenario in this process."""
+    os.environ.setdefault("LOG_LEVEL", "WARNING")
+    from smart_search.core.logging_config import setup_logging
+    setup_logging()
+    result = globals()[config["scenario"]](config["chunks"], config)
+    return {"scenario": config["scenario"], "chunks": config["chunks"], **result}
+
+def _commit() -> Optional[str]:
+    """HEAD commit, marked dirty when the tree has changes."""
+    here = os.path.dirname(os.path.abspath(__file__))
+    try:
+        commit = subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=here, check=True,
+                                capture_output=True, text=True).stdout.strip()
+        dirty = subprocess.run(["git", "status", "--porcelain", "--untracked-files=no"], cwd=here,
+                               check=True, capture_output=True, text=True).stdout.strip()
+        return commit + ("-dirty" if dirty else "")
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+def _flatten(result: dict, prefix: str = "") -> Dict[str, float]:
+    """Numeric metrics with nested dicts flattened to dotted names."""
+    flat = {}
+    for name, value in result.items():
+        if isinstance(value, dict):
+            flat.update(_flatten(value, f"{prefix}{name}."))
+        elif isinstance(value, (int, float)) and not isinstance(value, bool):
+            flat[prefix + name] = value
+    return flat
+
+def _direction(metric: str) -> int:
+    """1 if higher is better, -1 if lower is better, 0 if informational."""
+    if metric.endswith("_per_s"):
+        return 1
+    if metric.endswith(("_ms", "_s", "_mb")):
+        return -1
+    return 0
+
+def compare(baseline: dict, current: dict, threshold: float) -> List[dict]:
+    """Changes of every shared metric; regressions are worse by more than threshold."""
+    before = {(r["scenario"], r["chunks"]): _flatten(r) for r in baseline["results"]}
+    rows = []
+    for result in current["results"]:
+        old = before.get((result["scenario"], result["chunks"]))
+        if old is None:
+            continue
+        for metric, value in _flatten(result).items():
+            direction = _direction(metric)
+            if not direction or not old.get(metric):
+                continue
+            change = (value - old[metric]) / old[metric]
+            rows.append({
+                "scenario": result["scenario"],
+                "chunks": result["chunks"],
+                "metric": metric,
+                "baseline": old[metric],
+                "current": value,
+                "change": round(change, 4),
+                "regression": change * direction < -threshold,
+            })
+    return rows
+
+def _print_comparison(rows: List[dict], baseline: dict, current: dict, file=sys.stdout) -> int:
+    """Print a comparison table; returns the number of regressions."""
+    print(f"{baseline.get('commit')} -> {current.get('commit')}", file=file)
+    for row in rows:
+        flag = "REGRESSION" if row["regression"] else ""
+        print(f"{row['scenario']:<18} {row['chunks']:>8} {row['metric']:<36} "
+              f"{row['baseline']:>12} {row['current']:>12} {row['change']:>+8.1%} {flag}", file=file)
+    regressions = sum(row["regression"] for row in rows)
+    print(f"{regressions} regressions in {len(rows)} metrics", file=file)
+    return regressions
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--scenarios", nargs="+", choices=SCENARIOS, default=list(SCENARIOS))
+    parser.add_argument("--sizes", type=int, nargs="+", help="Corpus sizes in chunks for every scenario")
+    parser.add_argument("--dimension", type=int, default=384)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--top-k", type=int, default=5)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--ollama-latency-ms", type=float, default=0.0)
+    parser.add_argument("--ollama-per-text-ms", type=float, default=0.0)
+    parser.add_argument("--env", nargs="+", default=[], metavar="KEY=VALUE",
+                        help="Settings for the benchmarked processes, e.g. INDEX_TYPE=hnsw")
+    parser.add_argument("--output", help="Write results here instead of stdout")
+    parser.add_argument("--baseline", help="Compare the results with an earlier run")
+    parser.add_argument("--compare", nargs=2, metavar=("BASELINE", "CURRENT"),
+                        help="Compare two result files without running anything")
+    parser.add_argument("--threshold", type=float, default=0.1,
+                        help="Relative change counted as a regression")
+    parser.add_argument("--child", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        print(json.dumps(_run_child(json.loads(args.child))))
+        return
+    if args.compare:
+        with open(args.compare[0], "r", encoding="utf-8") as f:
+            baseline = json.load(f)
+        with open(args.compare[1], "r", encoding="utf-8") as f:
+            current = json.load(f)
+        sys.exit(1 if _print_comparison(compare(baseline, current, args.threshold), baseline, current) else 0)
+
+    root = tempfile.mkdtemp(prefix="bench_suite_")
+    extra_env = dict(item.split("=", 1) for item in args.env)
+    results = []
+    with FakeOllama(args.dimension, latency_ms=args.ollama_latency_ms,
+                    per_text_ms=args.ollama_per_text_ms) as ollama:
+        for scenario in args.scenarios:
+            for chunks in args.sizes or DEFAULT_SIZES[scenario]:
+                data_dir = os.path.join(root, f"{scenario}-{chunks}")
+                env = dict(os.environ, DATA_DIR=data_dir, CACHE_DIR=os.path.join(data_dir, "cache"),
+                           OLLAMA_BASE_URL=ollama.url, LOG_LEVEL=os.environ.get("LOG_LEVEL", "WARNING"),
+                           **extra_env)
+                config = {"scenario": scenario, "chunks": chunks, "dimension": args.dimension,
+                          "queries": args.queries, "top_k": args.top_k, "seed": args.seed}
+                begin = time.perf_counter()
+                command = [sys.executable, os.path.abspath(__file__), "--child", json.dumps(config)]
+                output = subprocess.run(command, env=env, check=True, capture_output=True, text=True).stdout
+                result = json.loads(output.strip().splitlines()[-1])
+                result["wall_s"] = round(time.perf_counter() - begin, 2)
+                results.append(result)
+                print(json.dumps(result), file=sys.stderr)
+
+    report = {
+        "commit": _commit(),
+        "timestamp": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+        "machine": {"python": platform.python_version(), "platform": platform.platform(),
+                    "cpus": os.cpu_count()},
+        "config": {"dimension": args.dimension, "queries": args.queries, "top_k": args.top_k,
+                   "seed": args.seed, "ollama_latency_ms": args.ollama_latency_ms,
+                   "ollama_per_text_ms": args.ollama_per_text_ms, "env": extra_env},
+        "data_dir": root,
+        "results": results,
+    }
+    text = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            f.write(text + "\n")
+    else:
+        print(text)
+    if args.baseline:
+        with open(args.baseline, "r", encoding="utf-8") as f:
+            baseline = json.load(f)
+        regressions = _print_comparison(compare(baseline, report, args.threshold), baseline, report,
+                                        sys.stdout if args.output else sys.stderr)
+        sys.exit(1 if regressions else 0)
+
+if __name__ == "__main__":
+    main()
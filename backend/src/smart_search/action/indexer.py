@@ -23,7 +23,8 @@ class Indexer:
                 metadata=action.metadata
             )
             
-            count = vector_store.add(action.url, embedding, page)
+            vector_store.add(embedding, page)
+            count = vector_store.live_count
             
             # if count % 10 == 0:
             vector_store.save()
@@ -1,7 +1,12 @@
 """Main agent."""
+from typing import List, Optional, Tuple
 from loguru import logger
+from smart_search.core import metrics
 from smart_search.agent.executor import AgentExecutor
-from smart_search.agent.schemas import AgentRequest, AgentResponse
+from smart_search.agent.index_queue import IndexQueue
+from smart_search.agent.schemas import AgentRequest, AgentResponse, IndexJob
+from smart_search.memory.schemas import SearchFilter
+from smart_search.utils.helpers import content_fingerprint
 
 class SmartSearchAgent:
     """Main agent - Singleton."""
@@ -20,6 +25,8 @@ class SmartSearchAgent:
         
         logger.info("Initializing SmartSearchAgent...")
         self.executor = AgentExecutor()
+        self.index_queue = IndexQueue(self.executor)
+        metrics.REGISTRY.add_collector("index_queue", self._collect_metrics)
         self._initialized = True
     
     async def execute(self, request: AgentRequest) -> AgentResponse:
@@ -54,11 +61,45 @@ class SmartSearchAgent:
             return AgentResponse(success=False, action="search", message="Missing query")
         
         success, message, data, results = await self.executor.handle_search_request(
-            request.query, request.top_k
+            request.query, request.top_k, request.mode, request.filters
         )
         
         return AgentResponse(success=success, action="search", message=message, data=data, results=results)
     
-    def get_status(self) -> dict:
+    async def search_batch(self, queries: List[str], top_k: int = 5, mode: Optional[str] = None,
+                           filters: Optional[SearchFilter] = None) -> Tuple[bool, str, dict, List[list]]:
+        """Run several searches together."""
+        return await self.executor.handle_batch_search_request(queries, top_k, mode, filters)
+    
+    def submit_index(self, page_url: str, page_title: str, page_content: str,
+                     profile: Optional[str] = None) -> Optional[IndexJob]:
+        """Queue a page for background indexing; None if it is already indexed unchanged.
+
+        profile is the reason to profile the job (see core.profiling), if any.
+        """
+        page_url = self.executor.canonical_url(page_url)
+        fingerprint = content_fingerprint(page_title, page_content)
+        if not self.index_queue.has_pending(page_url) and self.executor.is_unchanged(page_url, fingerprint):
+            return None
+        return self.index_queue.submit(page_url, page_title, page_content, profile)
+    
+    def get_index_job(self, job_id: str) -> Optional[IndexJob]:
+        """Get index job."""
+        return self.index_queue.get(job_id)
+    
+    async def get_status(self) -> dict:
         """Get status."""
-        return self.executor.get_status()
+        status = await self.executor.get_status()
+        status["index_queue"] = self.index_queue.get_stats()
+        return status
+    
+    def _collect_metrics(self) -> None:
+        """Refresh queue depth gauges before a metrics scrape."""
+        stats = self.index_queue.get_stats()
+        metrics.INDEX_QUEUE.labels(state="queued").set(stats["queued"])
+        metrics.INDEX_QUEUE.labels(state="running").set(stats["running"])
+    
+    async def close(self) -> None:
+        """Shutdown."""
+        await self.index_queue.close()
+        await self.executor.close()
@@ -1,16 +1,25 @@
 """Agent execution logic."""
+import asyncio
+import hashlib
+import os
 import time
-from typing import Tuple
+from typing import AsyncIterator, Callable, Dict, Iterable, List, Optional, Tuple
+import numpy as np
 from loguru import logger
 
+from smart_search.agent.url_locks import UrlLocks
+from smart_search.core import metrics
+from smart_search.core.config import get_settings
 from smart_search.perception.content_processor import ContentProcessor
+from smart_search.perception.dedup import Deduplicator
 from smart_search.embeddings.embedding_generator import EmbeddingGenerator
-from smart_search.memory.vector_store import VectorStore
-from smart_search.memory.metadata_store import MetadataStore
+from smart_search.memory.sharded_store import open_vector_store
 from smart_search.memory.cache import MemoryCache
 from smart_search.decision.searcher import Searcher
 from smart_search.decision.ranker import Ranker
-from smart_search.memory.schemas import StoredPage
+from smart_search.decision.schemas import SearchMode
+from smart_search.memory.schemas import StoredPage, SearchFilter
+from smart_search.utils.helpers import canonicalize_url, content_fingerprint, generate_hash
 
 class AgentExecutor:
     """Agent execution."""
@@ -18,145 +27,486 @@ class AgentExecutor:
     def __init__(self):
         logger.info("Initializing AgentExecutor...")
         
+        self.settings = get_settings()
         self.embedding_gen = EmbeddingGenerator()
         self.content_processor = ContentProcessor()
-        self.vector_store = VectorStore(self.embedding_gen.get_dimension())
-        self.metadata_store = MetadataStore()
+        self.vector_store = open_vector_store(self.embedding_gen.get_dimension())
         self.cache = MemoryCache()
+        self.deduplicator = Deduplicator(self.vector_store)
+        # Held by every writer of a page from planning its update until it is stored
+        self.url_locks = UrlLocks()
+        # Query embeddings are skipped until this time after Ollama fails or times out
+        self._embedding_retry_at = 0.0
+        metrics.REGISTRY.add_collector("executor", self._collect_metrics)
         
         logger.info("AgentExecutor initialized")
     
-    async def handle_index_request(self, page_url: str, page_title: str, page_content: str) -> Tuple[bool, str, dict]:
-        """Handle indexing with chunking and persistence."""
-        import hashlib, pickle, os
+    async def handle_index_request(self, page_url: str, page_title: str, page_content: str,
+                                   progress: Optional[Callable[[str], None]] = None) -> Tuple[bool, str, dict]:
+        """Handle indexing with chunking and persistence; progress is called with each stage.
+
+        Unchanged pages are skipped, and only chunks whose text changed are embedded.
+        """
+        progress = progress or (lambda stage: None)
+        start_time = time.time()
         try:
-            start_time = time.time()
-            logger.info(f"Indexing: {page_url}")
-            chunks, proc_time = self.content_processor.process(page_url, page_title, page_content)
-            total_embeddings = 0
-            chunk_metadata_list = []
-            for chunk in chunks:
-                try:
-                    embedding = self.embedding_gen.generate(chunk.content)
-                    page = StoredPage(
-                        url=chunk.url,
-                        title=chunk.title,
-                        content=chunk.content,
-                        timestamp=chunk.timestamp,
-                        embedding_dimension=self.embedding_gen.get_dimension(),
-                        metadata=chunk.metadata
+            page_url = self.canonical_url(page_url)
+            # Planned rows must still be there when the update is applied after embedding
+            async with self.url_locks.hold([page_url]):
+                with metrics.timer("index", "fingerprint"):
+                    fingerprint = content_fingerprint(page_title, page_content)
+                    unchanged = self.is_unchanged(page_url, fingerprint)
+                if unchanged:
+                    logger.info(f"Unchanged: {page_url}")
+                    metrics.observe_request("index", True, time.time() - start_time)
+                    return True, f"Unchanged: {page_title}", {"url": page_url, "status": "unchanged"}
+                logger.info(f"Indexing: {page_url}")
+                progress("chunking")
+                proc_start = time.time()
+                with metrics.timer("index", "chunking"):
+                    chunks = self.content_processor.iter_chunks(page_url, page_title, page_content)
+                    plan = self._plan_update(page_url, page_title, chunks)
+                proc_time = (time.time() - proc_start) * 1000
+                progress("embedding")
+                with metrics.timer("index", "embedding"):
+                    embeddings = await self.embedding_gen.generate_batch(
+                        [chunk.content for chunk in plan["embed"]]
                     )
-                    self.vector_store.add(f"{chunk.url}#chunk{chunk.metadata['chunk_index']}", embedding, page)
-                    chunk_metadata_list.append({
-                        "url": chunk.url,
-                        "title": chunk.title,
-                        "chunk_index": chunk.metadata['chunk_index'],
-                        "content": chunk.content,
-                        "timestamp": str(chunk.timestamp),
-                        "metadata": chunk.metadata
-                    })
-                    total_embeddings += 1
-                except Exception as e:
-                    logger.error(f"Embedding failed for chunk {chunk.metadata.get('chunk_index')}: {e}")
-            self.vector_store.save()
-            # Save full page content as HTML/text
-            html_dir = os.path.join(self.vector_store.pages_dir, "../pages_html")
-            os.makedirs(html_dir, exist_ok=True)
-            url_hash = hashlib.sha256(page_url.encode()).hexdigest()
-            html_path = os.path.join(html_dir, f"{url_hash}.txt")
-            # Save the full page content (not truncated)
-            with open(html_path, "w", encoding="utf-8") as f:
-                f.write(page_content if isinstance(page_content, str) else str(page_content))
-            # Save all chunk metadata as JSON (append, don't overwrite)
-            import json
-            meta_path = os.path.join(self.vector_store.pages_dir, "chunk_metadata.json")
-            existing_metadata = []
-            if os.path.exists(meta_path):
-                try:
-                    with open(meta_path, "r", encoding="utf-8") as f:
-                        existing_metadata = json.load(f)
-                except Exception:
-                    existing_metadata = []
-            # Remove any existing entries for this url to avoid duplicates
-            url_set = set([chunk["url"] for chunk in chunk_metadata_list])
-            filtered_metadata = [m for m in existing_metadata if m["url"] not in url_set]
-            filtered_metadata.extend(chunk_metadata_list)
-            with open(meta_path, "w", encoding="utf-8") as f:
-                json.dump(filtered_metadata, f, ensure_ascii=False, indent=2, default=str)
-            total_time = time.time() - start_time
-            return True, f"Indexed: {page_title}", {
-                "total_chunks": len(chunks),
-                "total_embeddings": total_embeddings,
-                "processing_time_ms": proc_time,
-                "total_time_ms": total_time * 1000,
-                "html_path": html_path,
-                "chunk_metadata_path": meta_path
-            }
+                progress("storing")
+                self._apply_updates([plan], embeddings)
+                with metrics.timer("index", "metadata"):
+                    self._record_fingerprint(page_url, fingerprint, plan)
+                with metrics.timer("index", "page_content"):
+                    html_path = self._save_page_content(page_url, page_content)
+                total_time = time.time() - start_time
+                metrics.observe_request("index", True, total_time)
+                return True, f"Indexed: {page_title}", {
+                    "url": page_url,
+                    **self._plan_stats(plan),
+                    "duplicates": plan["duplicates"],
+                    "processing_time_ms": proc_time,
+                    "total_time_ms": total_time * 1000,
+                    "html_path": html_path
+                }
         except Exception as e:
             logger.error(f"Indexing failed: {e}")
+            metrics.observe_request("index", False, time.time() - start_time)
             return False, f"Error: {str(e)}", {}
     
-    async def handle_search_request(self, query: str, top_k: int = 5) -> Tuple[bool, str, dict, list]:
-        """Handle search and return chunk-level results."""
-        import pickle, os
+    def is_unchanged(self, page_url: str, fingerprint: str) -> bool:
+        """Whether a page was last indexed with this content fingerprint."""
+        return self.vector_store.metadata_store.get_fingerprint(page_url) == fingerprint
+    
+    def _record_fingerprint(self, page_url: str, fingerprint: str, plan: dict) -> None:
+        """Fingerprint a stored page so unchanged revisits are skipped.
+
+        A page that lost chunks to near-duplicates of other pages is left
+        unfingerprinted: if those pages are deleted or change, its next visit
+        must store the chunks they no longer cover.
+        """
+        if self.deduplicator.from_other_pages(page_url, plan["duplicates"]):
+            self.vector_store.metadata_store.delete_fingerprint(page_url)
+        else:
+            self.vector_store.metadata_store.set_fingerprint(page_url, fingerprint)
+    
+    def _plan_update(self, page_url: str, page_title: str, chunks: Iterable, batch=None) -> dict:
+        """Compare a page's new chunks, consumed as they are cut, with its stored ones.
+
+        Chunks whose index, text, title and offset are unchanged keep their rows.
+        Changed chunks that are near-duplicates of other pages are dropped;
+        the rest are stored, re-using the vector of any stored chunk of the
+        page with the same text and embedding only the others.
+        """
+        current, by_hash = {}, {}
+        for vector_id, chunk_index, content_hash, title, char_start in \
+                self.vector_store.metadata_store.chunk_hashes(page_url):
+            current[chunk_index] = (vector_id, content_hash, title, char_start)
+            if content_hash:
+                by_hash[content_hash] = vector_id
+        keep, changed = [], []
+        total = 0
+        for chunk in chunks:
+            total += 1
+            content_hash = chunk.metadata["content_hash"] = generate_hash(chunk.content)
+            row = current.get(chunk.metadata["chunk_index"])
+            if row is not None and row[1:] == (content_hash, page_title, chunk.metadata.get("char_start")):
+                keep.append(row[0])
+            else:
+                changed.append(chunk)
+        changed, duplicates = self.deduplicator.filter(page_url, changed, batch)
+        reuse_ids = [by_hash.get(chunk.metadata["content_hash"]) for chunk in changed]
+        kept = set(keep)
+        return {
+            "total_chunks": total,
+            "keep": keep,
+            "drop": [row[0] for row in current.values() if row[0] not in kept],
+            "store": changed,
+            "reuse_ids": reuse_ids,
+            "embed": [chunk for chunk, vector_id in zip(changed, reuse_ids) if vector_id is None],
+            "duplicates": duplicates
+        }
+    
+    def _apply_updates(self, plans: List[dict], embeddings: np.ndarray) -> None:
+        """Store planned chunks with new embeddings, in plan order, and re-used vectors."""
+        reuse_ids = [vector_id for plan in plans for vector_id in plan["reuse_ids"] if vector_id is not None]
+        with metrics.timer("index", "faiss_add"):
+            # Read re-used vectors before their old rows are deleted
+            reused = iter(self.vector_store.get_vectors(np.array(reuse_ids)) if reuse_ids else [])
+            fresh = iter(embeddings)
+            vectors, pages = [], []
+            for plan in plans:
+                vectors.extend(next(fresh) if vector_id is None else next(reused)
+                               for vector_id in plan["reuse_ids"])
+                pages.extend(self._to_stored_pages(plan["store"]))
+            for plan in plans:
+                self.vector_store.delete_ids(plan["drop"])
+            if pages:
+                self.vector_store.add_batch(np.vstack(vectors), pages)
+        with metrics.timer("index", "save"):
+            self.vector_store.save()
+        with metrics.timer("index", "embedding_cache_save"):
+            self.embedding_gen.save_cache()
+    
+    def _plan_stats(self, plan: dict) -> dict:
+        """Chunk counts of an index plan."""
+        return {
+            "total_chunks": plan["total_chunks"],
+            "total_embeddings": len(plan["embed"]),
+            "unchanged_chunks": len(plan["keep"]),
+            "reused_embeddings": len(plan["store"]) - len(plan["embed"]),
+            "duplicate_chunks": len(plan["duplicates"]),
+            "embeddings_saved_pct": self._saved_pct(plan["total_chunks"] - len(plan["embed"]), plan["total_chunks"])
+        }
+    
+    def canonical_url(self, url: str) -> str:
+        """URL under which a page is stored."""
+        return canonicalize_url(url) if self.settings.canonicalize_urls else url
+    
+    @staticmethod
+    def _saved_pct(skipped: int, total: int) -> float:
+        """Share of chunks that were not embedded."""
+        return 100.0 * skipped / total if total else 0.0
+    
+    def _to_stored_pages(self, chunks: list) -> List[StoredPage]:
+        """Stored pages for processed chunks."""
+        return [
+            StoredPage(
+                url=chunk.url,
+                title=chunk.title,
+                content=chunk.content,
+                timestamp=chunk.timestamp,
+                embedding_dimension=self.embedding_gen.get_dimension(),
+                metadata=chunk.metadata
+            )
+            for chunk in chunks
+        ]
+    
+    def _save_page_content(self, page_url: str, page_content: str) -> str:
+        """Save full page content as HTML/text."""
+        html_dir = os.path.join(self.vector_store.pages_dir, "../pages_html")
+        os.makedirs(html_dir, exist_ok=True)
+        url_hash = hashlib.sha256(page_url.encode()).hexdigest()
+        html_path = os.path.join(html_dir, f"{url_hash}.txt")
+        # Save the full page content (not truncated)
+        with open(html_path, "w", encoding="utf-8") as f:
+            f.write(page_content if isinstance(page_content, str) else str(page_content))
+        return html_path
+    
+    async def handle_bulk_index_request(self, items: AsyncIterator[dict]) -> AsyncIterator[dict]:
+        """Index many pages, embedding across pages and yielding one result per page.
+
+        Items carry url/title/content, or an "error" for input that failed to parse.
+        Pages are processed in groups of bulk_index_group_size; each group is
+        embedded in shared batches, added in one index call and saved once.
+        """
+        group: List[Tuple[int, dict]] = []
+        position = 0
+        async for item in items:
+            group.append((position, item))
+            position += 1
+            if len(group) >= self.settings.bulk_index_group_size:
+                for result in await self._index_group(group):
+                    yield result
+                group = []
+        if group:
+            for result in await self._index_group(group):
+                yield result
+    
+    async def _index_group(self, group: List[Tuple[int, dict]]) -> List[dict]:
+        """Index one group of bulk items."""
+        start_time = time.time()
+        results: Dict[int, dict] = {}
+        latest: Dict[str, int] = {}
+        for position, item in group:
+            url = item.get("url")
+            if url:
+                url = item["url"] = self.canonical_url(url)
+            if "error" in item or not all([url, item.get("title"), item.get("content")]):
+                results[position] = {"index": position, "url": url, "success": False,
+                                     "message": item.get("error", "Missing fields")}
+                continue
+            # A later copy of the same page in this group wins
+            if url in latest:
+                results[latest[url]] = {"index": latest[url], "url": url, "success": True,
+                                        "message": f"Superseded by entry {position}"}
+            latest[url] = position
+        
+        items = dict(group)
+        # Shared with single-page indexing, so no page is planned and stored by two writers at once
+        async with self.url_locks.hold(latest):
+            prepared = []
+            batch = self.deduplicator.batch()
+            for url, position in latest.items():
+                item = items[position]
+                try:
+                    fingerprint = content_fingerprint(item["title"], item["content"])
+                    if self.is_unchanged(url, fingerprint):
+                        results[position] = {"index": position, "url": url, "success": True,
+                                             "message": f"Unchanged: {item['title']}",
+                                             "status": "unchanged"}
+                        continue
+                    with metrics.timer("index", "chunking"):
+                        chunks = self.content_processor.iter_chunks(url, item["title"], item["content"])
+                        plan = self._plan_update(url, item["title"], chunks, batch)
+                    prepared.append((position, item, fingerprint, plan))
+                except Exception as e:
+                    logger.error(f"Bulk chunking failed for {url}: {e}")
+                    results[position] = {"index": position, "url": url, "success": False,
+                                         "message": f"Error: {str(e)}"}
+        
+            stored = True
+            try:
+                texts = [chunk.content for _, _, _, plan in prepared for chunk in plan["embed"]]
+                with metrics.timer("index", "embedding"):
+                    embeddings = await self.embedding_gen.generate_batch(texts)
+                self._apply_updates([plan for _, _, _, plan in prepared], embeddings)
+            except Exception as e:
+                logger.error(f"Bulk indexing failed: {e}")
+                for position, item, _, _ in prepared:
+                    results[position] = {"index": position, "url": item["url"], "success": False,
+                                         "message": f"Error: {str(e)}"}
+                prepared = []
+                stored = False
+        
+            total_chunks = embedded = 0
+            for position, item, fingerprint, plan in prepared:
+                with metrics.timer("index", "metadata"):
+                    self._record_fingerprint(item["url"], fingerprint, plan)
+                with metrics.timer("index", "page_content"):
+                    self._save_page_content(item["url"], item["content"])
+                results[position] = {"index": position, "url": item["url"], "success": True,
+                                     "message": f"Indexed: {item['title']}", **self._plan_stats(plan)}
+                total_chunks += plan["total_chunks"]
+                embedded += len(plan["embed"])
+        metrics.observe_request("bulk_index", stored, time.time() - start_time)
+        logger.info(f"Bulk indexed {len(prepared)}/{len(group)} pages "
+                    f"in {(time.time() - start_time) * 1000:.0f}ms, skipped "
+                    f"{self._saved_pct(total_chunks - embedded, total_chunks):.1f}% of embeddings")
+        return [results[position] for position, _ in group]
+    
+    async def _retrieve(self, queries: List[str], top_k: int, mode: SearchMode,
+                        allowed: Optional[np.ndarray] = None) -> Tuple[List[Tuple[np.ndarray, np.ndarray]], SearchMode]:
+        """Candidate ids and scores for each query, and the mode actually used.
+
+        Queries are embedded in one batch and searched with one index call,
+        restricted to the ids in the allowed filter mask when given.
+        Falls back to lexical search when they cannot be embedded in time.
+        """
+        lexical_available = self.vector_store.lexical is not None
+        if lexical_available and time.time() < self._embedding_retry_at:
+            mode = SearchMode.LEXICAL
+        if mode == SearchMode.LEXICAL and lexical_available:
+            rankings = []
+            for query in queries:
+                with metrics.timer("search", "lexical"):
+                    ids, scores = self.vector_store.lexical_search_ids(query, top_k, allowed)
+                # BM25 is unbounded; scale so the best hit scores 1
+                rankings.append((ids, scores / scores[0] if len(scores) else scores))
+            return rankings, SearchMode.LEXICAL
+        
+        depth = top_k * self.settings.hybrid_candidates_factor if mode == SearchMode.HYBRID else top_k
+        try:
+            with metrics.timer("search", "embed_query"):
+                query_embeddings = await asyncio.wait_for(
+                    self.embedding_gen.generate_queries(queries), self.settings.query_embedding_timeout
+                )
+        except Exception as e:
+            if not lexical_available:
+                raise
+            self._embedding_retry_at = time.time() + self.settings.query_embedding_cooldown
+            logger.warning(f"Query embedding unavailable ({e!r}), using lexical search for "
+                           f"{self.settings.query_embedding_cooldown:.0f}s")
+            return await self._retrieve(queries, top_k, SearchMode.LEXICAL, allowed)
+        
+        with metrics.timer("search", "faiss_search"):
+            dense = self.vector_store.search_ids_batch(query_embeddings, depth, allowed=allowed)
+        if mode != SearchMode.HYBRID or not lexical_available:
+            return dense, SearchMode.VECTOR
+        rankings = []
+        for query, (dense_ids, _) in zip(queries, dense):
+            with metrics.timer("search", "lexical"):
+                lexical_ids, _ = self.vector_store.lexical_search_ids(query, depth, allowed)
+            rankings.append(Ranker.reciprocal_rank_fusion([dense_ids, lexical_ids], top_k, self.settings.rrf_k))
+        return rankings, SearchMode.HYBRID
+    
+    def _rank(self, query: str, ids: np.ndarray, results: list, top_k: int, mode: SearchMode) -> list:
+        """Re-rank candidates: recency blend, score threshold, page grouping and MMR diversity.
+
+        The score threshold applies to vector search only; RRF and scaled
+        BM25 scores are not cosine similarities.
+        """
+        if not results:
+            return []
+        decision = Searcher.make_search_decision(query, top_k)
+        relevance = np.array([res.score for res in results], dtype=np.float32)
+        recency = Ranker.recency_scores(Ranker.timestamps(results))
+        scores = Ranker.final_scores(relevance, recency, self.settings.ranking_strategy)
+        keep = np.arange(len(results))
+        if mode == SearchMode.VECTOR:
+            keep = np.flatnonzero(relevance >= decision["min_score_threshold"])
+        if self.settings.page_aggregation in ("max", "sum"):
+            best, scores = Ranker.aggregate_by_page(
+                [results[i].url for i in keep], scores[keep], self.settings.page_aggregation
+            )
+            keep = keep[best]
+        else:
+            order = np.argsort(-scores[keep], kind="stable")
+            keep, scores = keep[order], scores[keep][order]
+        
+        picks = np.arange(min(top_k, len(keep)))
+        if decision["apply_diversity"] and len(keep) > top_k:
+            try:
+                vectors = self.vector_store.get_vectors(ids[keep])
+                picks = Ranker.mmr(vectors, scores, top_k, self.settings.mmr_lambda)
+            except Exception as e:
+                logger.warning(f"Skipping MMR: {e}")
+        return [results[keep[i]].model_copy(update={"score": float(scores[i])}) for i in picks.tolist()]
+    
+    @staticmethod
+    def _result_dicts(results: list) -> List[dict]:
+        """Chunk-level result dicts with snippets."""
+        # Always include 'content' for Pydantic validation
+        return [
+            {
+                "url": res.url,
+                "title": res.title,
+                "chunk_index": res.chunk_index,
+                "char_start": res.char_start,
+                "char_end": res.char_end,
+                "score": res.score,
+                "snippet": res.content[:200],
+                "content": res.content,
+                "timestamp": str(res.timestamp)
+            }
+            for res in results
+        ]
+    
+    async def handle_search_request(self, query: str, top_k: int = 5, mode: Optional[str] = None,
+                                    filters: Optional[SearchFilter] = None) -> Tuple[bool, str, dict, list]:
+        """Handle search and return chunk-level results, optionally filtered by domain, URL prefix and time."""
+        start_time = time.time()
         try:
-            start_time = time.time()
             logger.info(f"Searching: {query}")
             if not Searcher.validate_query(query):
                 return False, "Invalid query", {}, []
-            query_embedding = self.embedding_gen.generate(query)
-            results = self.vector_store.search(query_embedding, top_k)
+            try:
+                search_mode = SearchMode(mode or self.settings.search_mode)
+            except ValueError:
+                return False, f"Unknown search mode: {mode}", {}, []
+            candidates = top_k * self.settings.rerank_candidates_factor
+            with metrics.timer("search", "filter"):
+                allowed = self.vector_store.filter_mask(filters)
+            rankings, used_mode = await self._retrieve([query], candidates, search_mode, allowed)
+            with metrics.timer("search", "metadata"):
+                ids, results = self.vector_store.fetch_many(rankings)[0]
+            with metrics.timer("search", "rank"):
+                results = self._rank(query, ids, results, top_k, used_mode)
             if not results:
-                return True, "No results found", {"total_results": 0}, []
-            # Load chunk metadata for snippet/highlighting (from JSON)
-            import json
-            meta_path = os.path.join(self.vector_store.pages_dir, "chunk_metadata.json")
-            chunk_metadata = []
-            if os.path.exists(meta_path):
-                with open(meta_path, "r", encoding="utf-8") as f:
-                    chunk_metadata = json.load(f)
-            # Build chunk-level results with snippet
-            chunk_results = []
-            for res in results:
-                # Find the chunk index from the url (format: url#chunkN)
-                chunk_index = None
-                if "#chunk" in res.url:
-                    try:
-                        chunk_index = int(res.url.split("#chunk")[-1])
-                    except Exception:
-                        chunk_index = None
-                # Find the matching chunk metadata
-                meta = next((m for m in chunk_metadata if m["url"] in res.url and m["chunk_index"] == chunk_index), None)
-                snippet = meta["content"][:200] if meta else res.content[:200]
-                # Always include 'content' for Pydantic validation
-                chunk_results.append({
-                    "url": res.url.split("#chunk")[0],
-                    "title": res.title,
-                    "chunk_index": chunk_index,
-                    "score": res.score,
-                    "snippet": snippet,
-                    "content": meta["content"] if meta and "content" in meta else res.content,
-                    "timestamp": str(res.timestamp)
-                })
+                metrics.observe_request("search", True, time.time() - start_time)
+                return True, "No results found", {"total_results": 0, "mode": used_mode.value}, []
+            with metrics.timer("search", "snippets"):
+                chunk_results = self._result_dicts(results)
             search_time = time.time() - start_time
+            metrics.observe_request("search", True, search_time)
             return True, f"Found {len(chunk_results)} results", {
                 "total_results": len(chunk_results),
-                "search_time_ms": search_time * 1000
+                "search_time_ms": search_time * 1000,
+                "mode": used_mode.value
             }, chunk_results
         except Exception as e:
             logger.error(f"Search failed: {e}")
+            metrics.observe_request("search", False, time.time() - start_time)
+            return False, f"Error: {str(e)}", {}, []
+    
+    async def handle_batch_search_request(self, queries: List[str], top_k: int = 5, mode: Optional[str] = None,
+                                          filters: Optional[SearchFilter] = None) -> Tuple[bool, str, dict, List[list]]:
+        """Handle several searches with one embedding call, one index search and one metadata lookup."""
+        start_time = time.time()
+        try:
+            logger.info(f"Batch searching {len(queries)} queries")
+            invalid = [query for query in queries if not Searcher.validate_query(query)]
+            if invalid:
+                return False, f"Invalid query: {invalid[0]!r}", {}, []
+            try:
+                search_mode = SearchMode(mode or self.settings.search_mode)
+            except ValueError:
+                return False, f"Unknown search mode: {mode}", {}, []
+            candidates = top_k * self.settings.rerank_candidates_factor
+            with metrics.timer("search", "filter"):
+                allowed = self.vector_store.filter_mask(filters)
+            rankings, used_mode = await self._retrieve(queries, candidates, search_mode, allowed)
+            with metrics.timer("search", "metadata"):
+                fetched = self.vector_store.fetch_many(rankings)
+            results = []
+            for query, (ids, hits) in zip(queries, fetched):
+                with metrics.timer("search", "rank"):
+                    ranked = self._rank(query, ids, hits, top_k, used_mode)
+                with metrics.timer("search", "snippets"):
+                    results.append(self._result_dicts(ranked))
+            search_time = time.time() - start_time
+            metrics.observe_request("batch_search", True, search_time)
+            return True, f"Searched {len(queries)} queries", {
+                "total_queries": len(queries),
+                "search_time_ms": search_time * 1000,
+                "mode": used_mode.value
+            }, results
+        except Exception as e:
+            logger.error(f"Batch search failed: {e}")
+            metrics.observe_request("batch_search", False, time.time() - start_time)
             return False, f"Error: {str(e)}", {}, []
     
-    def get_status(self) -> dict:
+    async def get_status(self) -> dict:
         """Get status."""
-        from ..embeddings.ollama_client import OllamaClient
-        client = OllamaClient()
-        health = client.check_health()
+        health = await self.embedding_gen.client.check_health()
         
         return {
             "running": True,
-            "total_pages": len(self.vector_store.metadata),
+            "total_pages": self.vector_store.live_count,
             "embedding_dimension": self.embedding_gen.get_dimension(),
             "ollama_health": health,
-            "cache_size": len(self.cache.cache)
+            "cache_size": len(self.cache.cache),
+            "embedding_cache": self.embedding_gen.get_cache_stats(),
+            "query_cache": self.embedding_gen.get_query_cache_stats(),
+            "dedup": self.deduplicator.get_stats()
         }
+    
+    def _collect_metrics(self) -> None:
+        """Refresh index gauges and cache counters before a metrics scrape."""
+        metrics.VECTORS.set(self.vector_store.live_count)
+        metrics.INDEX_FILE_BYTES.set(self.vector_store.get_stats()["index_file_size"])
+        for cache, stats in (("chunk", self.embedding_gen.get_cache_stats()),
+                             ("query", self.embedding_gen.get_query_cache_stats())):
+            for result in ("hits", "misses", "coalesced"):
+                if result in stats:
+                    metrics.EMBEDDING_CACHE.labels(cache=cache, result=result).set(stats[result])
+    
+    def clear(self) -> None:
+        """Clear index, metadata and caches."""
+        self.vector_store.clear()
+        self.cache.clear()
+        self.embedding_gen.query_cache.clear()
+    
+    async def close(self) -> None:
+        """Release resources."""
+        self.vector_store.close()
+        await self.embedding_gen.close()
@@ -0,0 +1,172 @@
+"""Background indexing queue."""
+import asyncio
+import math
+import uuid
+from collections import OrderedDict
+from contextlib import nullcontext
+from datetime import datetime
+from typing import Dict, List, Optional, Tuple
+from loguru import logger
+from smart_search.core import profiling
+from smart_search.core.config import get_settings
+from smart_search.agent.schemas import IndexJob
+from smart_search.agent.url_locks import UrlLocks
+from smart_search.utils.exceptions import QueueFullException
+
+class IndexQueue:
+    """Bounded queue of index jobs processed by asyncio workers.
+
+    Resubmitting a URL whose job has not started yet replaces that job's
+    content instead of queueing the page twice.
+    """
+
+    def __init__(self, executor):
+        self.settings = get_settings()
+        self.executor = executor
+        self.jobs: "OrderedDict[str, IndexJob]" = OrderedDict()
+        self._queue: Optional[asyncio.Queue] = None
+        self._workers: List[asyncio.Task] = []
+        # Content of jobs that have not started, by job id
+        self._payloads: Dict[str, Tuple[str, str]] = {}
+        # Queued (not yet running) job per URL, for coalescing
+        self._queued_by_url: Dict[str, str] = {}
+        # Serializes jobs for the same URL so an older version cannot land last
+        self._url_locks = UrlLocks()
+        self._running = 0
+        # Moving average of job duration, used for Retry-After
+        self._avg_job_seconds = 1.0
+
+    def _start(self) -> None:
+        """Start workers on the running event loop."""
+        if self._workers and not all(worker.done() for worker in self._workers):
+            return
+        self._queue = asyncio.Queue(maxsize=self.settings.index_queue_size)
+        self._workers = [
+            asyncio.create_task(self._worker(i)) for i in range(self.settings.index_workers)
+        ]
+        logger.info(f"Started {len(self._workers)} index workers "
+                    f"(queue size {self.settings.index_queue_size})")
+
+    def retry_after(self) -> int:
+        """Seconds until the queue is expected to have room."""
+        backlog = self._queue.qsize() if self._queue else 0
+        return max(1, math.ceil(backlog * self._avg_job_seconds / max(1, len(self._workers))))
+
+    def submit(self, url: str, title: str, content: str, profile: Optional[str] = None) -> IndexJob:
+        """Queue a page and return its job; raises QueueFullException when full.
+
+        profile is the reason to profile the job (see core.profiling), if any.
+        """
+        self._start()
+        job_id = self._queued_by_url.get(url)
+        if job_id is not None:
+            job = self.jobs[job_id]
+            job.title = title
+            job.coalesced += 1
+            job.profile = job.profile or profile
+            self._payloads[job_id] = (title, content)
+            logger.debug(f"Coalesced index request for {url} into job {job_id}")
+            return job
+
+        job = IndexJob(job_id=uuid.uuid4().hex, url=url, title=title, profile=profile)
+        try:
+            self._queue.put_nowait(job.job_id)
+        except asyncio.QueueFull:
+            raise QueueFullException("Indexing queue is full", self.retry_after())
+        self.jobs[job.job_id] = job
+        self._payloads[job.job_id] = (title, content)
+        self._queued_by_url[url] = job.job_id
+        self._trim_history()
+        return job
+
+    def has_pending(self, url: str) -> bool:
+        """Whether a job for the URL is queued or running."""
+        return url in self._queued_by_url or url in self._url_locks
+
+    def get(self, job_id: str) -> Optional[IndexJob]:
+        """Look up a job."""
+        return self.jobs.get(job_id)
+
+    def _trim_history(self) -> None:
+        """Forget the oldest finished jobs beyond the history limit."""
+        excess = len(self.jobs) - self.settings.index_job_history
+        if excess <= 0:
+            return
+        for job_id in [j for j, job in self.jobs.items() if job.finished_at is not None][:excess]:
+            del self.jobs[job_id]
+
+    async def _worker(self, worker_id: int) -> None:
+        """Process jobs until cancelled."""
+        while True:
+            job_id = await self._queue.get()
+            try:
+                await self._run(self.jobs[job_id])
+            except Exception as e:
+                logger.error(f"Index worker {worker_id} error: {e}")
+            finally:
+                self._queue.task_done()
+
+    async def _run(self, job: IndexJob) -> None:
+        """Index one page and record the outcome on its job."""
+        async with self._url_locks.hold([job.url]):
+            await self._run_locked(job)
+        elapsed = (job.finished_at - job.started_at).total_seconds()
+        self._avg_job_seconds = 0.8 * self._avg_job_seconds + 0.2 * elapsed
+        logger.info(f"Index job {job.job_id} {job.status} in {elapsed:.2f}s: {job.url}")
+
+    async def _run_locked(self, job: IndexJob) -> None:
+        """Run a job while no other job for its URL is running."""
+        # Later submissions for this URL now start a new job
+        if self._queued_by_url.get(job.url) == job.job_id:
+            del self._queued_by_url[job.url]
+        title, content = self._payloads.pop(job.job_id)
+        job.status = "running"
+        job.started_at = datetime.now()
+        self._running += 1
+
+        def progress(stage: str) -> None:
+            job.stage = stage
+
+        profile = profiling.RequestProfile("index", job.url, job.profile) if job.profile else nullcontext()
+        try:
+            with profile:
+                success, message, data = await self.executor.handle_index_request(
+                    job.url, title, content, progress=progress
+                )
+                job.status = "done" if success else "failed"
+                job.message = message
+                job.data = data
+        except Exception as e:
+            # A failure after indexing finished, e.g. writing the profile, keeps the outcome
+            if job.status == "running":
+                job.status = "failed"
+                job.message = f"Indexing error: {e}"
+            raise
+        finally:
+            self._running -= 1
+            if job.profile:
+                job.profile_id = profile.profile_id
+            job.finished_at = datetime.now()
+
+    def get_stats(self) -> dict:
+        """Queue depth and worker stats."""
+        return {
+            "queued": self._queue.qsize() if self._queue else 0,
+            "running": self._running,
+            "workers": len(self._workers),
+            "capacity": self.settings.index_queue_size,
+            "avg_job_seconds": self._avg_job_seconds,
+        }
+
+    async def close(self) -> None:
+        """Let queued jobs finish, up to the shutdown timeout, then stop workers."""
+        if not self._workers:
+            return
+        try:
+            await asyncio.wait_for(self._queue.join(), self.settings.index_shutdown_timeout)
+        except asyncio.TimeoutError:
+            logger.warning(f"Dropping {self._queue.qsize()} queued index jobs on shutdown")
+        for worker in self._workers:
+            worker.cancel()
+        await asyncio.gather(*self._workers, return_exceptions=True)
+        self._workers = []
@@ -2,7 +2,7 @@
 from typing import List, Optional
 from datetime import datetime
 from pydantic import BaseModel, Field
-from smart_search.memory.schemas import SearchResult
+from smart_search.memory.schemas import SearchResult, SearchFilter
 
 class AgentRequest(BaseModel):
     action: str
@@ -11,6 +11,24 @@ class AgentRequest(BaseModel):
     page_title: Optional[str] = None
     page_content: Optional[str] = None
     top_k: int = Field(5, ge=1, le=20)
+    mode: Optional[str] = None
+    filters: Optional[SearchFilter] = None
+
+class IndexJob(BaseModel):
+    job_id: str
+    url: str
+    title: str
+    status: str = "queued"
+    stage: Optional[str] = None
+    message: str = ""
+    coalesced: int = 0
+    data: Optional[dict] = None
+    # Why the job is profiled (header or sampled), and the report once written
+    profile: Optional[str] = None
+    profile_id: Optional[str] = None
+    submitted_at: datetime = Field(default_factory=datetime.now)
+    started_at: Optional[datetime] = None
+    finished_at: Optional[datetime] = None
 
 class AgentResponse(BaseModel):
     success: bool
@@ -0,0 +1,37 @@
+"""Per-URL locks."""
+import asyncio
+from contextlib import asynccontextmanager
+from typing import AsyncIterator, Dict, Iterable
+
+class UrlLocks:
+    """asyncio locks keyed by URL, forgotten once no task holds or waits for them."""
+
+    def __init__(self):
+        self._locks: Dict[str, asyncio.Lock] = {}
+        self._users: Dict[str, int] = {}
+
+    def __contains__(self, url: str) -> bool:
+        """Whether a task holds or waits for the URL's lock."""
+        return url in self._locks
+
+    @asynccontextmanager
+    async def hold(self, urls: Iterable[str]) -> AsyncIterator[None]:
+        """Hold the locks of several URLs, taken in sorted order so holders cannot deadlock."""
+        urls = sorted(set(urls))
+        for url in urls:
+            self._locks.setdefault(url, asyncio.Lock())
+            self._users[url] = self._users.get(url, 0) + 1
+        acquired = []
+        try:
+            for url in urls:
+                await self._locks[url].acquire()
+                acquired.append(url)
+            yield
+        finally:
+            for url in acquired:
+                self._locks[url].release()
+            for url in urls:
+                self._users[url] -= 1
+                if not self._users[url]:
+                    del self._users[url]
+                    del self._locks[url]
@@ -1,68 +1,204 @@
 """API endpoints."""
+import json
 import time
-from fastapi import APIRouter, HTTPException
+from contextlib import nullcontext
+from typing import AsyncIterator, Optional
+from fastapi import APIRouter, Header, HTTPException, Query, Request, Response
+from fastapi.responses import FileResponse, StreamingResponse
+from starlette.concurrency import run_in_threadpool
 from loguru import logger
-from smart_search.api.v1.schemas import IndexPageRequest, SearchRequest, SearchResponse, IndexResponse, HealthResponse, StatsResponse
+from pydantic import ValidationError
+from smart_search.api.v1.schemas import (IndexPageRequest, SearchRequest, SearchResponse, BatchSearchRequest,
+                                         BatchSearchResponse, BatchQueryResult, IndexResponse, HealthResponse,
+                                         StatsResponse)
 from smart_search.agent.agent import SmartSearchAgent
-from smart_search.agent.schemas import AgentRequest
+from smart_search.agent.schemas import AgentRequest, IndexJob
+from smart_search.core import profiling
 from smart_search.core.config import get_settings
+from smart_search.perception.page_extractor import PageExtractor
+from smart_search.utils.exceptions import QueueFullException
 
 router = APIRouter(prefix="/api/v1", tags=["search"])
 agent = SmartSearchAgent()
 settings = get_settings()
 
-@router.post("/index", response_model=IndexResponse)
-async def index_page(request: IndexPageRequest) -> IndexResponse:
-    """Index page."""
+@router.post("/index", response_model=IndexResponse, status_code=202)
+async def index_page(request: IndexPageRequest, x_profile: Optional[str] = Header(None)) -> IndexResponse:
+    """Queue page for indexing; with X-Profile: 1 the indexing job is profiled."""
     try:
         logger.info(f"Indexing: {request.url}")
         
-        agent_req = AgentRequest(
-            action="index",
-            page_url=request.url,
-            page_title=request.title,
-            page_content=request.content
-        )
+        title, content = request.title, request.content
+        if not content and request.html:
+            page = await run_in_threadpool(PageExtractor.extract_from_html, request.html, request.url, title)
+            title, content = page.title, page.content
+        if not all([request.url, title, content]):
+            raise HTTPException(status_code=400, detail="Missing fields")
         
-        response = await agent.execute(agent_req)
-        
-        if not response.success:
-            raise HTTPException(status_code=400, detail=response.message)
+        job = agent.submit_index(request.url, title, content, profiling.trigger(x_profile))
+        if job is None:
+            return IndexResponse(
+                success=True,
+                message=f"Unchanged: {title}",
+                total_pages=agent.executor.vector_store.live_count,
+                status="unchanged"
+            )
         
         return IndexResponse(
             success=True,
-            message=response.message,
-            total_pages=response.data.get("total_pages", 0) if response.data else 0
+            message=f"Queued: {title}",
+            total_pages=agent.executor.vector_store.live_count,
+            job_id=job.job_id,
+            status=job.status
         )
+    except QueueFullException as e:
+        raise HTTPException(status_code=429, detail=str(e), headers={"Retry-After": str(e.retry_after)})
     except HTTPException:
         raise
     except Exception as e:
         logger.error(f"Error: {e}")
         raise HTTPException(status_code=500, detail=str(e))
 
+async def _bulk_items(pages: Optional[list], body: bytes) -> AsyncIterator[dict]:
+    """Pages from a parsed JSON array, or from an NDJSON body with one page per line if pages is None."""
+    async def parse(raw) -> dict:
+        try:
+            page = IndexPageRequest.model_validate(raw)
+            if not page.content and page.html:
+                extracted = await run_in_threadpool(
+                    PageExtractor.extract_from_html, page.html, page.url, page.title
+                )
+                return {"url": page.url, "title": extracted.title, "content": extracted.content}
+            return {"url": page.url, "title": page.title, "content": page.content}
+        except ValidationError as e:
+            return {"url": raw.get("url") if isinstance(raw, dict) else None,
+                    "error": f"Invalid page: {e.errors()[0]['msg']}"}
+    
+    if pages is not None:
+        for raw in pages:
+            yield await parse(raw)
+        return
+    
+    for line in body.splitlines():
+        if not line.strip():
+            continue
+        try:
+            raw = json.loads(line)
+        except json.JSONDecodeError as e:
+            yield {"url": None, "error": f"Invalid JSON: {e}"}
+            continue
+        yield await parse(raw)
+
+@router.post("/index/bulk")
+async def bulk_index(request: Request) -> StreamingResponse:
+    """Index many pages; accepts a JSON array or NDJSON and streams NDJSON results."""
+    # The body must be read before streaming starts; NDJSON lines are parsed lazily from it
+    body = await request.body()
+    pages = None
+    if "ndjson" not in request.headers.get("content-type", ""):
+        try:
+            pages = json.loads(body)
+            if not isinstance(pages, list):
+                raise ValueError("expected a JSON array of pages")
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=f"Invalid body: {e}")
+    
+    async def results() -> AsyncIterator[str]:
+        start_time = time.time()
+        indexed = failed = unchanged = chunks = embedded = duplicates = 0
+        try:
+            async for result in agent.executor.handle_bulk_index_request(_bulk_items(pages, body)):
+                if result.get("status") == "unchanged":
+                    unchanged += 1
+                elif result["success"]:
+                    indexed += 1
+                    chunks += result.get("total_chunks", 0)
+                    embedded += result.get("total_embeddings", 0)
+                    duplicates += result.get("duplicate_chunks", 0)
+                else:
+                    failed += 1
+                yield json.dumps(result) + "\n"
+        except Exception as e:
+            logger.error(f"Bulk index error: {e}")
+            yield json.dumps({"success": False, "message": f"Error: {str(e)}"}) + "\n"
+        yield json.dumps({
+            "done": True,
+            "indexed": indexed,
+            "failed": failed,
+            "unchanged": unchanged,
+            "duplicate_chunks": duplicates,
+            "embeddings_saved_pct": 100.0 * (chunks - embedded) / chunks if chunks else 0.0,
+            "total_pages": agent.executor.vector_store.live_count,
+            "total_time_ms": (time.time() - start_time) * 1000
+        }) + "\n"
+    
+    return StreamingResponse(results(), media_type="application/x-ndjson")
+
+@router.get("/index/jobs/{job_id}", response_model=IndexJob)
+async def get_index_job(job_id: str) -> IndexJob:
+    """Index job status."""
+    job = agent.get_index_job(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return job
+
 @router.post("/search", response_model=SearchResponse)
-async def search(request: SearchRequest) -> SearchResponse:
-    """Search."""
+async def search(request: SearchRequest, http_response: Response,
+                 x_profile: Optional[str] = Header(None)) -> SearchResponse:
+    """Search; with X-Profile: 1 the search is profiled and X-Profile-Id names the report."""
     try:
         logger.info(f"Searching: {request.query}")
         
         start_time = time.time()
+        trigger = profiling.trigger(x_profile)
+        profile = profiling.RequestProfile("search", request.query, trigger) if trigger else nullcontext()
         
         agent_req = AgentRequest(
             action="search",
             query=request.query,
-            top_k=request.top_k
+            top_k=request.top_k,
+            mode=request.mode.value if request.mode else None,
+            filters=request.to_filter()
         )
         
-        response = await agent.execute(agent_req)
+        with profile:
+            response = await agent.execute(agent_req)
         search_time = (time.time() - start_time) * 1000
+        if trigger:
+            http_response.headers["X-Profile-Id"] = profile.profile_id
         
         return SearchResponse(
             success=response.success,
             message=response.message,
             total_results=len(response.results) if response.results else 0,
             results=response.results or [],
-            search_time_ms=search_time
+            search_time_ms=search_time,
+            mode=response.data.get("mode") if response.data else None
+        )
+    except Exception as e:
+        logger.error(f"Error: {e}")
+        raise HTTPException(status_code=500, detail=str(e))
+
+@router.post("/search/batch", response_model=BatchSearchResponse)
+async def search_batch(request: BatchSearchRequest) -> BatchSearchResponse:
+    """Run several searches with one embedding call and one index search."""
+    try:
+        start_time = time.time()
+        success, message, data, results = await agent.search_batch(
+            request.queries, request.top_k, request.mode.value if request.mode else None, request.to_filter()
+        )
+        search_time = (time.time() - start_time) * 1000
+        
+        return BatchSearchResponse(
+            success=success,
+            message=message,
+            total_queries=len(request.queries),
+            results=[
+                BatchQueryResult(query=query, total_results=len(hits), results=hits)
+                for query, hits in zip(request.queries, results)
+            ],
+            search_time_ms=search_time,
+            mode=data.get("mode")
         )
     except Exception as e:
         logger.error(f"Error: {e}")
@@ -72,7 +208,7 @@ async def search(request: SearchRequest) -> SearchResponse:
 async def health_check() -> HealthResponse:
     """Health check."""
     try:
-        status = agent.get_status()
+        status = await agent.get_status()
         
         return HealthResponse(
             status="healthy",
@@ -88,26 +224,76 @@ async def health_check() -> HealthResponse:
 async def get_stats() -> StatsResponse:
     """Stats."""
     try:
-        status = agent.get_status()
+        status = await agent.get_status()
         stats = agent.executor.vector_store.get_stats()
+        cache_stats = status.get("embedding_cache", {})
+        query_stats = status.get("query_cache", {})
         
         return StatsResponse(
             total_pages=status.get("total_pages", 0),
             embedding_dimension=status.get("embedding_dimension", 0),
-            index_file_size=stats.get("index_file_size", 0)
+            index_file_size=stats.get("index_file_size", 0),
+            embedding_cache_entries=cache_stats.get("entries", 0),
+            embedding_cache_hit_rate=cache_stats.get("hit_rate", 0.0),
+            query_cache_entries=query_stats.get("entries", 0),
+            query_cache_hits=query_stats.get("hits", 0),
+            query_cache_misses=query_stats.get("misses", 0),
+            query_cache_coalesced=query_stats.get("coalesced", 0)
         )
     except Exception as e:
         logger.error(f"Error: {e}")
         raise HTTPException(status_code=500, detail=str(e))
 
+@router.get("/stats/recall")
+async def get_recall(k: int = Query(10, ge=1, le=100), queries: int = Query(100, ge=1, le=1000),
+                     ef_search: Optional[int] = Query(None, ge=1, le=4096),
+                     nprobe: Optional[int] = Query(None, ge=1, le=4096)) -> dict:
+    """Recall@k of the configured index against exact search."""
+    try:
+        store = agent.executor.vector_store
+        return await run_in_threadpool(store.evaluate_recall, k, queries, ef_search, nprobe)
+    except Exception as e:
+        logger.error(f"Error: {e}")
+        raise HTTPException(status_code=500, detail=str(e))
+
+@router.get("/profiles")
+async def list_profiles(limit: int = 50) -> list:
+    """Newest request profiles, newest first."""
+    return await run_in_threadpool(profiling.list_profiles, limit)
+
+@router.get("/profiles/{profile_id}")
+async def get_profile(profile_id: str) -> dict:
+    """Span tree and hottest functions of one profiled request."""
+    report = await run_in_threadpool(profiling.load_profile, profile_id)
+    if report is None:
+        raise HTTPException(status_code=404, detail="Profile not found")
+    return report
+
+@router.get("/profiles/{profile_id}/raw")
+async def get_raw_profile(profile_id: str) -> FileResponse:
+    """Raw profile: a pstats dump for cProfile, an HTML report for pyinstrument."""
+    for extension, media_type in ((".prof", "application/octet-stream"), (".html", "text/html")):
+        path = profiling.profile_path(profile_id, extension)
+        if path is not None:
+            return FileResponse(path, media_type=media_type, filename=profile_id + extension)
+    raise HTTPException(status_code=404, detail="Profile not found")
+
 @router.delete("/index")
-async def clear_index() -> dict:
-    """Clear index."""
+async def clear_index(url: Optional[str] = None) -> dict:
+    """Clear index, or only the chunks of one page when url is given."""
     try:
+        if url:
+            logger.info(f"Deleting page: {url}")
+            canonical = agent.executor.canonical_url(url)
+            async with agent.executor.url_locks.hold([url, canonical]):
+                deleted = agent.executor.vector_store.delete_url(url)
+                if canonical != url:
+                    deleted += agent.executor.vector_store.delete_url(canonical)
+                agent.executor.vector_store.save()
+            return {"success": True, "message": f"Deleted {deleted} chunks", "deleted": deleted}
+        
         logger.info("Clearing index...")
-        agent.executor.vector_store._create_new_index = lambda: setattr(agent.executor.vector_store, 'index', None)
-        agent.executor.metadata_store.clear()
-        agent.executor.cache.clear()
+        agent.executor.clear()
         
         return {"success": True, "message": "Index cleared"}
     except Exception as e:
@@ -1,5 +1,8 @@
 """Health endpoints."""
-from fastapi import APIRouter
+from fastapi import APIRouter, HTTPException
+from fastapi.responses import Response
+from starlette.concurrency import run_in_threadpool
+from smart_search.core import metrics
 from smart_search.core.config import get_settings
 
 router = APIRouter(tags=["health"])
@@ -18,3 +21,12 @@ async def root():
 async def ping():
     """Ping."""
     return {"status": "pong"}
+
+@router.get("/metrics")
+async def get_metrics() -> Response:
+    """Metrics in the Prometheus text format."""
+    if not metrics.enabled():
+        raise HTTPException(status_code=404, detail="Metrics are disabled")
+    # Collectors read index stats under the store lock
+    body = await run_in_threadpool(metrics.REGISTRY.render)
+    return Response(content=body, media_type=metrics.CONTENT_TYPE)
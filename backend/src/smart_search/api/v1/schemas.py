@@ -2,17 +2,31 @@
 from typing import List, Optional
 from datetime import datetime
 from pydantic import BaseModel, Field
-from smart_search.memory.schemas import SearchResult
+from smart_search.memory.schemas import SearchResult, SearchFilter
+from smart_search.decision.schemas import SearchMode
 
 class IndexPageRequest(BaseModel):
     url: str
-    title: str
-    content: str
+    title: str = ""
+    content: str = ""
+    # Raw page HTML, extracted server-side when content is empty
+    html: Optional[str] = None
     timestamp: Optional[datetime] = Field(default_factory=datetime.now)
 
-class SearchRequest(BaseModel):
+class SearchFilterFields(BaseModel):
+    domain: Optional[str] = None
+    url_prefix: Optional[str] = None
+    since: Optional[datetime] = None
+    until: Optional[datetime] = None
+
+    def to_filter(self) -> SearchFilter:
+        """Filter for the vector store."""
+        return SearchFilter(domain=self.domain, url_prefix=self.url_prefix, since=self.since, until=self.until)
+
+class SearchRequest(SearchFilterFields):
     query: str = Field(..., min_length=1, max_length=500)
     top_k: int = Field(5, ge=1, le=20)
+    mode: Optional[SearchMode] = None
 
 class SearchResponse(BaseModel):
     success: bool
@@ -20,11 +34,32 @@ class SearchResponse(BaseModel):
     total_results: int
     results: List[SearchResult] = []
     search_time_ms: float
+    mode: Optional[str] = None
+
+class BatchSearchRequest(SearchFilterFields):
+    queries: List[str] = Field(..., min_length=1, max_length=100)
+    top_k: int = Field(5, ge=1, le=20)
+    mode: Optional[SearchMode] = None
+
+class BatchQueryResult(BaseModel):
+    query: str
+    total_results: int
+    results: List[SearchResult] = []
+
+class BatchSearchResponse(BaseModel):
+    success: bool
+    message: str
+    total_queries: int
+    results: List[BatchQueryResult] = []
+    search_time_ms: float
+    mode: Optional[str] = None
 
 class IndexResponse(BaseModel):
     success: bool
     message: str
     total_pages: int
+    job_id: Optional[str] = None
+    status: Optional[str] = None
 
 class HealthResponse(BaseModel):
     status: str
@@ -36,3 +71,9 @@ class StatsResponse(BaseModel):
     total_pages: int
     embedding_dimension: int
     index_file_size: int
+    embedding_cache_entries: int = 0
+    embedding_cache_hit_rate: float = 0.0
+    query_cache_entries: int = 0
+    query_cache_hits: int = 0
+    query_cache_misses: int = 0
+    query_cache_coalesced: int = 0
@@ -16,25 +16,140 @@ class Settings(BaseSettings):
     ollama_base_url: str = "http://localhost:11434"
     ollama_embedding_model: str = "nomic-embed-text"
     ollama_timeout: int = 30
+    ollama_batch_size: int = 64
+    ollama_max_concurrency: int = 8
+    ollama_max_connections: int = 10
+    ollama_max_retries: int = 3
+    ollama_retry_backoff: float = 0.5
     
     # Storage Configuration
     data_dir: str = "./data"
     index_file: str = "faiss_index.bin"
     metadata_file: str = "metadata.pkl"
     cache_dir: str = "./cache"
+    # Max chunk embeddings kept in the on-disk embedding cache (0 disables it)
+    embedding_cache_size: int = 50000
+    # In-memory LRU of search query embeddings
+    query_cache_size: int = 1024
+    query_cache_max_mb: float = 16.0
+    
+    # Vector index: flat, hnsw, ivf_flat or ivf_pq
+    index_type: str = "flat"
+    hnsw_m: int = 32
+    hnsw_ef_construction: int = 200
+    hnsw_ef_search: int = 64
+    ivf_nlist: int = 1024
+    ivf_nprobe: int = 16
+    pq_m: int = 48
+    # IVF and quantized indexes stay flat until this many vectors exist to train on (at least 256
+    # for product codes, which faiss cannot train on fewer)
+    index_train_min_vectors: int = 10000
+    # Retrain IVF once the corpus has grown by this factor since the last training
+    index_retrain_factor: float = 4.0
+    # Filtered searches matching at most this many chunks are scored exactly instead of via the index
+    filter_exact_max: int = 5000
+    # Upper bound for HNSW efSearch when it is raised to make up for a selective filter
+    filter_max_ef_search: int = 1024
+    # Compact the index in the background once this fraction of vectors is deleted
+    compaction_threshold: float = 0.2
+    # Snapshot the index and truncate the write-ahead log once the log exceeds this size
+    wal_checkpoint_mb: int = 256
+    # Memory-map the checkpointed index read-only; it is copied into memory on first write
+    index_mmap: bool = True
+    # Vector storage in the index: full (float32), sq8 (8-bit scalar codes) or pq (pq_m-byte
+    # product codes). Quantized modes keep the float32 vectors in a memory-mapped side file
+    # and re-rank index candidates exactly against it
+    vector_storage: str = "full"
+    # Candidates taken from a quantized index per requested result for exact re-ranking
+    quantized_rerank_factor: int = 4
+    # Split the vector store into shards: none, url (by URL hash) or time (by the period a
+    # page was first indexed in). Each shard has its own index, metadata and write-ahead log
+    shard_by: str = "none"
+    # Number of shards for url sharding
+    shard_count: int = 8
+    # strftime format naming a page's time shard, e.g. %Y-%m for monthly shards
+    shard_time_format: str = "%Y-%m"
+    # Shards kept loaded (0 = no limit); the least recently used idle ones are unloaded, but never
+    # those the last search or write used, so a search over every shard can exceed it
+    shard_max_loaded: int = 0
+    # Threads searching shards in parallel
+    shard_search_threads: int = 4
+    
+    # Background indexing queue
+    index_queue_size: int = 100
+    index_workers: int = 2
+    # Finished jobs kept for status lookups
+    index_job_history: int = 1000
+    # Seconds to let queued jobs finish on shutdown
+    index_shutdown_timeout: float = 30.0
+    # Pages chunked and embedded together by the bulk index endpoint
+    bulk_index_group_size: int = 32
     
     # Search Configuration
     default_top_k: int = 5
     max_top_k: int = 20
+    # Default search mode: vector, hybrid or lexical
+    search_mode: str = "vector"
+    # Keep a BM25 index next to the vector index for hybrid and lexical search
+    lexical_index: bool = True
+    bm25_k1: float = 1.2
+    bm25_b: float = 0.75
+    # Reciprocal rank fusion constant for hybrid search
+    rrf_k: int = 60
+    # Candidates taken from each retriever per requested result in hybrid search
+    hybrid_candidates_factor: int = 4
+    # Fall back to lexical search when the query embedding takes longer than this (seconds)
+    query_embedding_timeout: float = 2.0
+    # After a failed query embedding, search lexically without trying Ollama for this long (seconds)
+    query_embedding_cooldown: float = 30.0
+    # Candidates fetched per requested result for re-ranking, page grouping and MMR
+    rerank_candidates_factor: int = 4
+    # Ranking strategy: relevance, recency or hybrid (relevance blended with recency_weight)
+    ranking_strategy: str = "hybrid"
+    recency_weight: float = 0.3
+    # Age at which a page's recency score halves
+    recency_half_life_days: float = 30.0
+    # Vector search candidates below this cosine similarity are dropped; hybrid and lexical
+    # scores are on other scales and are not thresholded
+    min_score_threshold: float = 0.3
+    # Combine chunk hits into one result per page: max, sum or none (chunk-level results)
+    page_aggregation: str = "max"
+    # MMR trade-off between relevance (1.0) and diversity (0.0)
+    mmr_lambda: float = 0.7
     max_content_length: int = 500000
-    # Chunking parameters
+    # Chunking strategy: fixed (character windows), sentence (packed sentences),
+    # token (token windows) or paragraph (packed paragraphs, new chunk at headings)
+    chunk_strategy: str = "fixed"
+    # Chunking parameters, in characters: window size for fixed, maximum size otherwise
     chunk_size: int = 512
+    # Overlap for fixed and sentence chunking
     chunk_overlap: int = 40
+    # Window size and overlap in tokens for token chunking
+    chunk_tokens: int = 256
+    chunk_token_overlap: int = 32
+    # Skip chunks whose 64-bit SimHash is within dedup_max_distance bits of a stored chunk
+    dedup_enabled: bool = True
+    dedup_max_distance: int = 3
+    # Keep only the main content block when extracting text from HTML
+    extract_main_content: bool = True
+    # Strip tracking parameters, fragments and default ports from indexed URLs
+    canonicalize_urls: bool = True
     
     # Logging Configuration
     log_level: str = "INFO"
     log_file: Optional[str] = None
-    
+
+    # Metrics: per-stage latency histograms and counters, served at /metrics
+    metrics_enabled: bool = True
+    # Request profiling of /search and /index: an X-Profile: 1 header profiles one request
+    # when profile_header is on, and profile_sample_rate profiles that share of all of them
+    profile_header: bool = True
+    profile_sample_rate: float = 0.0
+    # Function profiler: cprofile, or pyinstrument when installed
+    profiler: str = "cprofile"
+    # Reports kept under data_dir/profiles; the oldest are deleted beyond this
+    profile_max_files: int = 100
+
     class Config:
         env_file = ".env"
         env_file_encoding = "utf-8"
@@ -0,0 +1,282 @@
+"""In-process metrics exposed in the Prometheus text format."""
+import bisect
+import os
+import threading
+import time
+from contextlib import nullcontext
+from typing import Callable, Dict, List, Optional, Sequence, Tuple
+from loguru import logger
+from smart_search.core import profiling
+from smart_search.core.config import get_settings
+
+# Upper bounds in seconds; pipeline stages range from microseconds (snippets) to seconds (embedding)
+DEFAULT_BUCKETS = (0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5,
+                   1.0, 2.5, 5.0, 10.0, 30.0)
+
+def _label_text(names: Sequence[str], values: Sequence[str], extra: str = "") -> str:
+    """Label set as {a="x",b="y"}."""
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+def _escape(value: str) -> str:
+    """Escape a label value."""
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+def _number(value: float) -> str:
+    """Sample value text."""
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if not float(value).is_integer() else str(int(value))
+
+class _Metric:
+    """Metric family with a fixed set of label names."""
+
+    kind = ""
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._lock = threading.Lock()
+        self._children: Dict[Tuple[str, ...], object] = {}
+        if not self.labelnames:
+            self._default = self.labels()
+
+    def labels(self, **labels):
+        """Child for one label set; keep it to skip the lookup on hot paths."""
+        key = tuple(str(labels[name]) for name in self.labelnames)
+        child = self._children.get(key)
+        if child is None:
+            with self._lock:
+                child = self._children.setdefault(key, self._new_child())
+        return child
+
+    def _new_child(self):
+        raise NotImplementedError
+
+    def render(self) -> List[str]:
+        """Exposition lines of the family."""
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.kind}"]
+        with self._lock:
+            children = sorted(self._children.items())
+        for key, child in children:
+            lines.extend(self._render_child(key, child))
+        return lines
+
+    def _render_child(self, key: Tuple[str, ...], child) -> List[str]:
+        return [f"{self.name}{_label_text(self.labelnames, key)} {_number(child.value)}"]
+
+class _Value:
+    """Single number guarded by a lock."""
+
+    __slots__ = ("value", "_lock")
+
+    def __init__(self):
+        self.value = 0.0
+        self._lock = threading.Lock()
+
+    def inc(self, amount: float = 1.0) -> None:
+        """Add to the value."""
+        with self._lock:
+            self.value += amount
+
+    def set(self, value: float) -> None:
+        """Replace the value."""
+        self.value = float(value)
+
+class Counter(_Metric):
+    """Monotonically increasing count."""
+
+    kind = "counter"
+
+    def _new_child(self):
+        return _Value()
+
+    def inc(self, amount: float = 1.0) -> None:
+        """Increment the unlabelled counter."""
+        self._default.inc(amount)
+
+class Gauge(_Metric):
+    """Value that goes up and down, usually set by a collector before each scrape."""
+
+    kind = "gauge"
+
+    def _new_child(self):
+        return _Value()
+
+    def set(self, value: float) -> None:
+        """Set the unlabelled gauge."""
+        self._default.set(value)
+
+class _Timer:
+    """Context manager observing its elapsed time into a histogram child."""
+
+    __slots__ = ("_child", "_start")
+
+    def __init__(self, child: "_HistogramValue"):
+        self._child = child
+
+    def __enter__(self) -> "_Timer":
+        self._start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self._child.observe(time.perf_counter() - self._start)
+
+class _HistogramValue:
+    """Bucket counts and sum of one label set."""
+
+    __slots__ = ("bounds", "counts", "sum", "_lock")
+
+    def __init__(self, bounds: Tuple[float, ...]):
+        self.bounds = bounds
+        # One count per bound plus +Inf, not cumulative
+        self.counts = [0] * (len(bounds) + 1)
+        self.sum = 0.0
+        self._lock = threading.Lock()
+
+    def observe(self, value: float) -> None:
+        """Record one observation."""
+        position = bisect.bisect_left(self.bounds, value)
+        with self._lock:
+            self.counts[position] += 1
+            self.sum += value
+
+    def time(self) -> _Timer:
+        """Time a block."""
+        return _Timer(self)
+
+class Histogram(_Metric):
+    """Distribution of observations over fixed buckets."""
+
+    kind = "histogram"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = (),
+                 buckets: Sequence[float] = DEFAULT_BUCKETS):
+        self.buckets = tuple(sorted(buckets))
+        super().__init__(name, documentation, labelnames)
+
+    def _new_child(self):
+        return _HistogramValue(self.buckets)
+
+    def observe(self, value: float) -> None:
+        """Observe into the unlabelled histogram."""
+        self._default.observe(value)
+
+    def totals(self) -> Dict[Tuple[str, ...], Tuple[int, float]]:
+        """Observation count and sum per label set."""
+        with self._lock:
+            children = list(self._children.items())
+        return {key: (sum(child.counts), child.sum) for key, child in children}
+
+    def _render_child(self, key: Tuple[str, ...], child) -> List[str]:
+        with child._lock:
+            counts, total = list(child.counts), child.sum
+        lines = []
+        cumulative = 0
+        for bound, count in zip(self.buckets + (float("inf"),), counts):
+            cumulative += count
+            labels = _label_text(self.labelnames, key, f'le="{_number(bound)}"')
+            lines.append(f"{self.name}_bucket{labels} {cumulative}")
+        labels = _label_text(self.labelnames, key)
+        lines.append(f"{self.name}_sum{labels} {_number(total)}")
+        lines.append(f"{self.name}_count{labels} {cumulative}")
+        return lines
+
+class Registry:
+    """Metric families and the collectors refreshing gauges before a scrape."""
+
+    def __init__(self):
+        self._metrics: Dict[str, _Metric] = {}
+        self._collectors: Dict[str, Callable[[], None]] = {}
+
+    def register(self, metric: _Metric) -> _Metric:
+        """Add a metric family; raises ValueError on a duplicate name."""
+        if metric.name in self._metrics:
+            raise ValueError(f"Metric {metric.name} already registered")
+        self._metrics[metric.name] = metric
+        return metric
+
+    def add_collector(self, name: str, collector: Callable[[], None]) -> None:
+        """Call collector before every scrape, replacing an earlier one of the same name."""
+        self._collectors[name] = collector
+
+    def render(self) -> str:
+        """All metrics in the Prometheus text format."""
+        for name, collector in list(self._collectors.items()):
+            try:
+                collector()
+            except Exception as e:
+                logger.error(f"Metrics collector {name} error: {e}")
+        return "\n".join(line for metric in self._metrics.values() for line in metric.render()) + "\n"
+
+REGISTRY = Registry()
+
+# Content type of the text exposition format
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+STAGE_SECONDS = REGISTRY.register(Histogram(
+    "smart_search_stage_duration_seconds", "Time spent in each pipeline stage.", ("pipeline", "stage")))
+REQUEST_SECONDS = REGISTRY.register(Histogram(
+    "smart_search_request_duration_seconds", "End-to-end time of index and search requests.",
+    ("pipeline", "status")))
+EMBEDDINGS = REGISTRY.register(Counter(
+    "smart_search_embeddings_total", "Chunk and query texts sent to Ollama for embedding.", ("kind",)))
+EMBEDDING_CACHE = REGISTRY.register(Counter(
+    "smart_search_embedding_cache_lookups_total", "Chunk and query embedding cache lookups.",
+    ("cache", "result")))
+OLLAMA_REQUESTS = REGISTRY.register(Counter(
+    "smart_search_ollama_requests_total", "HTTP requests made to Ollama.", ("endpoint",)))
+OLLAMA_ERRORS = REGISTRY.register(Counter(
+    "smart_search_ollama_errors_total", "Failed Ollama requests, including retried attempts.", ("reason",)))
+INDEX_QUEUE = REGISTRY.register(Gauge(
+    "smart_search_index_queue_jobs", "Index jobs waiting or running.", ("state",)))
+VECTORS = REGISTRY.register(Gauge(
+    "smart_search_vectors", "Live vectors in the index."))
+INDEX_FILE_BYTES = REGISTRY.register(Gauge(
+    "smart_search_index_file_bytes", "Size of the checkpointed index file."))
+RESIDENT_MEMORY = REGISTRY.register(Gauge(
+    "process_resident_memory_bytes", "Resident memory size in bytes."))
+
+_NO_TIMER = nullcontext()
+
+def enabled() -> bool:
+    """Whether metrics are recorded."""
+    return get_settings().metrics_enabled
+
+def timer(pipeline: str, stage: str):
+    """Context manager timing one pipeline stage, also kept as a span when the request is profiled."""
+    if profiling.active():
+        observe = STAGE_SECONDS.labels(pipeline=pipeline, stage=stage).observe if enabled() else None
+        return profiling.span(f"{pipeline}.{stage}", observe)
+    if not enabled():
+        return _NO_TIMER
+    return STAGE_SECONDS.labels(pipeline=pipeline, stage=stage).time()
+
+def observe_request(pipeline: str, success: bool, seconds: float) -> None:
+    """Record an index or search request."""
+    if enabled():
+        REQUEST_SECONDS.labels(pipeline=pipeline, status="success" if success else "failure").observe(seconds)
+
+def count(counter: Counter, amount: float = 1.0, **labels) -> None:
+    """Increment a labelled counter; a no-op when metrics are disabled or amount is 0."""
+    if amount and enabled():
+        counter.labels(**labels).inc(amount)
+
+def resident_memory_bytes() -> Optional[int]:
+    """Resident set size from /proc, or None where it is unavailable."""
+    try:
+        with open("/proc/self/statm", "r") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError):
+        return None
+
+def _collect_process() -> None:
+    """Refresh process gauges."""
+    rss = resident_memory_bytes()
+    if rss is not None:
+        RESIDENT_MEMORY.set(rss)
+
+REGISTRY.add_collector("process", _collect_process)
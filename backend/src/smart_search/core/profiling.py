@@ -0,0 +1,260 @@
+"""Opt-in per-request profiling with named spans."""
+import cProfile
+import io
+import json
+import os
+import pstats
+import random
+import re
+import threading
+import time
+import uuid
+from contextvars import ContextVar
+from datetime import datetime
+from typing import Callable, List, Optional
+from loguru import logger
+from smart_search.core.config import get_settings
+
+try:
+    from pyinstrument import Profiler as PyinstrumentProfiler
+    PYINSTRUMENT_AVAILABLE = True
+except ImportError:
+    PYINSTRUMENT_AVAILABLE = False
+
+# Request header that profiles a single request when profile_header is on
+PROFILE_HEADER = "X-Profile"
+# Functions listed in a report, by cumulative time
+_TOP_FUNCTIONS = 40
+_PROFILE_ID_RE = re.compile(r"^[\w-]+$")
+
+class Span:
+    """Named, timed section of a request; spans nest."""
+
+    __slots__ = ("name", "start", "end", "children")
+
+    def __init__(self, name: str):
+        self.name = name
+        self.start = time.perf_counter()
+        self.end: Optional[float] = None
+        self.children: List["Span"] = []
+
+    def to_dict(self, origin: float) -> dict:
+        """Span tree with times in ms relative to origin."""
+        end = self.end if self.end is not None else time.perf_counter()
+        return {
+            "name": self.name,
+            "start_ms": round((self.start - origin) * 1000, 3),
+            "duration_ms": round((end - self.start) * 1000, 3),
+            "children": [child.to_dict(origin) for child in self.children],
+        }
+
+# Innermost open span of the request being profiled; asyncio tasks inherit a copy
+_current: ContextVar[Optional[Span]] = ContextVar("profiling_span", default=None)
+
+def active() -> bool:
+    """Whether the current request is being profiled."""
+    return _current.get() is not None
+
+class _SpanContext:
+    """Opens a child of the current span; calls observe with its duration on exit."""
+
+    __slots__ = ("name", "observe", "_span", "_token")
+
+    def __init__(self, name: str, observe: Optional[Callable[[float], None]] = None):
+        self.name = name
+        self.observe = observe
+
+    def __enter__(self) -> "_SpanContext":
+        parent = _current.get()
+        self._span = Span(self.name)
+        if parent is not None:
+            parent.children.append(self._span)
+        self._token = _current.set(self._span)
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self._span.end = time.perf_counter()
+        _current.reset(self._token)
+        if self.observe is not None:
+            self.observe(self._span.end - self._span.start)
+
+class _NoSpan:
+    __slots__ = ()
+
+    def __enter__(self) -> "_NoSpan":
+        return self
+
+    def __exit__(self, *exc) -> None:
+        pass
+
+_NO_SPAN = _NoSpan()
+
+def span(name: str, observe: Optional[Callable[[float], None]] = None):
+    """Context manager recording a named span when the request is profiled, else a no-op."""
+    if _current.get() is None:
+        return _NO_SPAN
+    return _SpanContext(name, observe)
+
+def trigger(header: Optional[str]) -> Optional[str]:
+    """Why a request should be profiled ("header" or "sampled"), or None."""
+    settings = get_settings()
+    if settings.profile_header and header and header.strip().lower() in ("1", "true", "yes"):
+        return "header"
+    if settings.profile_sample_rate > 0 and random.random() < settings.profile_sample_rate:
+        return "sampled"
+    return None
+
+def profiles_dir() -> str:
+    """Directory holding profile reports."""
+    return os.path.join(get_settings().data_dir, "profiles")
+
+# cProfile and pyinstrument profile a whole thread, so one request at a time gets a
+# function profile; requests profiled meanwhile record spans only
+_profiler_lock = threading.Lock()
+
+class RequestProfile:
+    """Profiles the request run inside it and writes a report to data_dir/profiles.
+
+    The report holds the span tree and, unless another profiled request
+    holds the profiler, the functions that took the most time. The
+    function profile covers the whole event loop thread, so work of other
+    requests running concurrently shows up in it too.
+    """
+
+    def __init__(self, kind: str, summary: str, trigger: str):
+        self.kind = kind
+        self.summary = summary[:200]
+        self.trigger = trigger
+        self.profile_id = f"{datetime.now():%Y%m%dT%H%M%S}-{kind}-{uuid.uuid4().hex[:8]}"
+        self._profiler = None
+        self._engine = None
+
+    def __enter__(self) -> "RequestProfile":
+        self.started_at = datetime.now()
+        if _profiler_lock.acquire(blocking=False):
+            self._start_profiler()
+        self._root = _SpanContext(self.kind)
+        self._root.__enter__()
+        return self
+
+    def _start_profiler(self) -> None:
+        """Start cProfile, or pyinstrument when configured and installed."""
+        engine = get_settings().profiler
+        try:
+            if engine == "pyinstrument" and PYINSTRUMENT_AVAILABLE:
+                self._profiler = PyinstrumentProfiler(async_mode="enabled")
+                self._profiler.start()
+            else:
+                if engine == "pyinstrument":
+                    logger.warning("pyinstrument is not installed, profiling with cProfile")
+                self._profiler = cProfile.Profile()
+                self._profiler.enable()
+                engine = "cprofile"
+            self._engine = engine
+        except Exception as e:
+            logger.warning(f"Could not start profiler: {e}")
+            self._profiler = None
+            _profiler_lock.release()
+
+    def __exit__(self, *exc) -> None:
+        self._root.__exit__(*exc)
+        if self._profiler is not None:
+            try:
+                if self._engine == "cprofile":
+                    self._profiler.disable()
+                else:
+                    self._profiler.stop()
+            finally:
+                _profiler_lock.release()
+        try:
+            self._write()
+        except Exception as e:
+            logger.error(f"Could not write profile {self.profile_id}: {e}")
+
+    def _write(self) -> None:
+        """Write the report and raw profile, then trim old reports."""
+        directory = profiles_dir()
+        os.makedirs(directory, exist_ok=True)
+        root = self._root._span
+        report = {
+            "id": self.profile_id,
+            "kind": self.kind,
+            "summary": self.summary,
+            "trigger": self.trigger,
+            "started_at": self.started_at.isoformat(),
+            "duration_ms": round((root.end - root.start) * 1000, 3),
+            "profiler": self._engine,
+            "spans": root.to_dict(root.start),
+        }
+        base = os.path.join(directory, self.profile_id)
+        if self._engine == "cprofile":
+            report["functions"] = _top_functions(self._profiler)
+            self._profiler.dump_stats(base + ".prof")
+        elif self._engine == "pyinstrument":
+            report["profile_text"] = self._profiler.output_text(unicode=False, color=False)
+            with open(base + ".html", "w", encoding="utf-8") as f:
+                f.write(self._profiler.output_html())
+        with open(base + ".json", "w", encoding="utf-8") as f:
+            json.dump(report, f)
+        logger.info(f"Wrote {self.kind} profile {self.profile_id} ({report['duration_ms']:.1f}ms)")
+        _trim(directory, get_settings().profile_max_files)
+
+def _top_functions(profiler: cProfile.Profile) -> List[dict]:
+    """Functions with the highest cumulative time."""
+    stats = pstats.Stats(profiler, stream=io.StringIO())
+    rows = []
+    for (filename, line, function), (calls, total_calls, own, cumulative, _) in stats.stats.items():
+        rows.append({
+            "function": function,
+            "location": f"{filename}:{line}",
+            "calls": total_calls,
+            "own_ms": round(own * 1000, 3),
+            "cumulative_ms": round(cumulative * 1000, 3),
+        })
+    rows.sort(key=lambda row: row["cumulative_ms"], reverse=True)
+    return rows[:_TOP_FUNCTIONS]
+
+def _trim(directory: str, keep: int) -> None:
+    """Delete the oldest reports beyond keep, with their raw profiles."""
+    ids = sorted(name[:-5] for name in os.listdir(directory) if name.endswith(".json"))
+    for profile_id in ids[:max(0, len(ids) - keep)]:
+        for extension in (".json", ".prof", ".html"):
+            path = os.path.join(directory, profile_id + extension)
+            if os.path.exists(path):
+                os.remove(path)
+
+def list_profiles(limit: int = 50) -> List[dict]:
+    """Summaries of the newest reports, newest first."""
+    directory = profiles_dir()
+    if not os.path.isdir(directory):
+        return []
+    summaries = []
+    for name in sorted((n for n in os.listdir(directory) if n.endswith(".json")), reverse=True)[:limit]:
+        try:
+            report = load_profile(name[:-5])
+        except (OSError, ValueError) as e:
+            logger.warning(f"Skipping unreadable profile {name}: {e}")
+            continue
+        files = [report["id"] + extension for extension in (".prof", ".html")
+                 if os.path.exists(os.path.join(directory, report["id"] + extension))]
+        summaries.append({
+            **{key: report.get(key) for key in
+               ("id", "kind", "summary", "trigger", "started_at", "duration_ms", "profiler")},
+            "files": files,
+        })
+    return summaries
+
+def profile_path(profile_id: str, extension: str = ".json") -> Optional[str]:
+    """Path of a report file, or None if there is none."""
+    if not _PROFILE_ID_RE.match(profile_id):
+        return None
+    path = os.path.join(profiles_dir(), profile_id + extension)
+    return path if os.path.exists(path) else None
+
+def load_profile(profile_id: str) -> Optional[dict]:
+    """A full report, or None if there is none."""
+    path = profile_path(profile_id)
+    if path is None:
+        return None
+    with open(path, "r", encoding="utf-8") as f:
+        return json.load(f)
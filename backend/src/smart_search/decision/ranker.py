@@ -1,7 +1,9 @@
 """Result ranking."""
-from typing import List
+from typing import List, Optional, Tuple
 from datetime import datetime
+import numpy as np
 from loguru import logger
+from smart_search.core.config import get_settings
 from smart_search.decision.schemas import RankedResult, RankingStrategy
 
 class Ranker:
@@ -12,43 +14,109 @@ class Ranker:
         """Rank results."""
         filtered = [r for r in results if r.score >= min_score]
         logger.debug(f"Filtered to {len(filtered)} results")
+        if not filtered:
+            return []
         
-        ranked = []
-        for rank, result in enumerate(filtered, 1):
-            if strategy == "relevance":
-                final_score = result.score
-            elif strategy == "recency":
-                final_score = Ranker._calculate_recency_score(result.timestamp)
-            else:
-                rel = result.score
-                rec = Ranker._calculate_recency_score(result.timestamp)
-                final_score = 0.7 * rel + 0.3 * rec
-            
-            ranked_result = RankedResult(
-                result=result,
-                relevance_score=result.score,
-                recency_score=Ranker._calculate_recency_score(result.timestamp),
-                final_score=final_score,
+        relevance = np.array([r.score for r in filtered], dtype=np.float32)
+        recency = Ranker.recency_scores(Ranker.timestamps(filtered))
+        final = Ranker.final_scores(relevance, recency, strategy)
+        order = np.argsort(-final, kind="stable")
+        return [
+            RankedResult(
+                result=filtered[i],
+                relevance_score=float(relevance[i]),
+                recency_score=float(recency[i]),
+                final_score=float(final[i]),
                 rank=rank
             )
-            ranked.append(ranked_result)
-        
-        ranked.sort(key=lambda x: x.final_score, reverse=True)
-        for i, r in enumerate(ranked, 1):
-            r.rank = i
-        
-        return ranked
+            for rank, i in enumerate(order.tolist(), 1)
+        ]
     
     @staticmethod
-    def _calculate_recency_score(timestamp: datetime) -> float:
-        """Calculate recency score."""
-        age_days = (datetime.now() - timestamp).days
-        
-        if age_days < 1:
-            return 1.0
-        elif age_days < 7:
-            return 0.8
-        elif age_days < 30:
-            return 0.6
+    def timestamps(results) -> np.ndarray:
+        """Result timestamps as a datetime64 array."""
+        return np.array([r.timestamp.replace(tzinfo=None) for r in results], dtype="datetime64[s]")
+    
+    @staticmethod
+    def recency_scores(timestamps: np.ndarray, half_life_days: Optional[float] = None,
+                       now: Optional[datetime] = None) -> np.ndarray:
+        """Exponential recency decay: 1.0 for now, 0.5 at one half-life."""
+        half_life_days = half_life_days or get_settings().recency_half_life_days
+        now = np.datetime64(now or datetime.now(), "s")
+        age_days = np.maximum((now - timestamps) / np.timedelta64(1, "D"), 0.0)
+        return np.exp2(-age_days / half_life_days).astype(np.float32)
+    
+    @staticmethod
+    def final_scores(relevance: np.ndarray, recency: np.ndarray, strategy: str = "relevance",
+                     recency_weight: Optional[float] = None) -> np.ndarray:
+        """Blend relevance and recency per the ranking strategy."""
+        if strategy == RankingStrategy.RELEVANCE:
+            return relevance
+        if strategy == RankingStrategy.RECENCY:
+            return recency
+        if recency_weight is None:
+            recency_weight = get_settings().recency_weight
+        return (1 - recency_weight) * relevance + recency_weight * recency
+    
+    @staticmethod
+    def aggregate_by_page(urls: List[str], scores: np.ndarray, how: str = "max") -> Tuple[np.ndarray, np.ndarray]:
+        """Group chunk hits by URL, best page first.
+
+        Returns the position of each page's best chunk and the page score:
+        the best chunk score for "max", or the sum of chunk scores for
+        "sum", scaled down so no page exceeds 1.
+        """
+        if not urls:
+            return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.float32)
+        _, first, pages = np.unique(np.array(urls, dtype=object), return_index=True, return_inverse=True)
+        # Best chunk per page: sort by page, then by descending score, and take each page's first row
+        order = np.lexsort((-scores, pages))
+        starts = np.flatnonzero(np.r_[True, pages[order][1:] != pages[order][:-1]])
+        best = order[starts]
+        if how == "sum":
+            page_scores = np.bincount(pages, weights=scores, minlength=len(first))[pages[best]]
+            page_scores = page_scores / max(1.0, float(page_scores.max()))
         else:
-            return 0.3
+            page_scores = scores[best]
+        ranked = np.argsort(-page_scores, kind="stable")
+        return best[ranked], page_scores[ranked].astype(np.float32)
+    
+    @staticmethod
+    def mmr(vectors: np.ndarray, scores: np.ndarray, top_k: int, lambda_: float = 0.7) -> np.ndarray:
+        """Maximal Marginal Relevance selection over candidate vectors.
+
+        Each pick maximizes lambda * relevance - (1 - lambda) * similarity to
+        the closest already-picked candidate. Relevance is the candidate's
+        score; vectors are assumed normalized. Returns candidate positions.
+        """
+        n = len(vectors)
+        top_k = min(top_k, n)
+        if top_k <= 0:
+            return np.empty(0, dtype=np.int64)
+        similarity = vectors @ vectors.T
+        relevance = lambda_ * scores
+        max_similarity = np.full(n, -np.inf, dtype=np.float32)
+        available = np.ones(n, dtype=bool)
+        selected = []
+        for _ in range(top_k):
+            # Nothing picked yet means no redundancy penalty
+            penalty = (1 - lambda_) * max_similarity if selected else 0.0
+            marginal = np.where(available, relevance - penalty, -np.inf)
+            pick = int(np.argmax(marginal))
+            selected.append(pick)
+            available[pick] = False
+            max_similarity = np.maximum(max_similarity, similarity[pick])
+        return np.array(selected, dtype=np.int64)
+    
+    @staticmethod
+    def reciprocal_rank_fusion(rankings: List[np.ndarray], top_k: int, k: int = 60) -> Tuple[np.ndarray, np.ndarray]:
+        """Fuse ranked id lists; scores are scaled so a top hit in every list scores 1."""
+        fused = {}
+        for ranking in rankings:
+            for rank, doc_id in enumerate(ranking.tolist()):
+                fused[doc_id] = fused.get(doc_id, 0.0) + 1.0 / (k + rank + 1)
+        best = sorted(fused.items(), key=lambda item: item[1], reverse=True)[:top_k]
+        scale = len(rankings) / (k + 1)
+        ids = np.array([doc_id for doc_id, _ in best], dtype=np.int64)
+        scores = np.array([score / scale for _, score in best], dtype=np.float32)
+        return ids, scores
@@ -9,6 +9,11 @@ class RankingStrategy(str, Enum):
     RECENCY = "recency"
     HYBRID = "hybrid"
 
+class SearchMode(str, Enum):
+    VECTOR = "vector"
+    HYBRID = "hybrid"
+    LEXICAL = "lexical"
+
 class RankedResult(BaseModel):
     result: SearchResult
     relevance_score: float
@@ -1,5 +1,6 @@
 """Search decision logic."""
 from loguru import logger
+from smart_search.core.config import get_settings
 
 class Searcher:
     """Search decisions."""
@@ -25,11 +26,11 @@ class Searcher:
     @staticmethod
     def make_search_decision(query: str, top_k: int = 5) -> dict:
         """Make search decision."""
-        logger.info(f"Search decision for: {query}")
+        logger.debug(f"Search decision for: {query}")
         
         return {
             "query": query,
             "top_k": top_k,
-            "min_score_threshold": 0.3,
+            "min_score_threshold": get_settings().min_score_threshold,
             "apply_diversity": len(query.split()) > 3
         }
@@ -1,41 +1,145 @@
 """Embedding generation."""
+import json
+import os
 import numpy as np
 from typing import List
 from loguru import logger
-from smart_search.embeddings.ollama_client import OllamaClient
+from smart_search.core import metrics
+from smart_search.core.config import get_settings
+from smart_search.embeddings.ollama_client import OllamaClient, AsyncOllamaClient
+from smart_search.memory.cache import EmbeddingCache, QueryEmbeddingCache
 
 class EmbeddingGenerator:
     """Generates embeddings."""
     
     def __init__(self):
-        self.client = OllamaClient()
+        self.client = AsyncOllamaClient()
         self.embedding_dimension = 0
         self._initialize_dimension()
+        self.cache = None
+        if get_settings().embedding_cache_size > 0:
+            self.cache = EmbeddingCache(self.client.model, self.embedding_dimension)
+        self.query_cache = QueryEmbeddingCache()
     
     def _initialize_dimension(self) -> None:
-        """Get embedding dimension."""
+        """Get embedding dimension, probing Ollama only for a model not seen before."""
+        dimensions_file = os.path.join(get_settings().data_dir, "embedding_dimensions.json")
+        dimensions = {}
+        if os.path.exists(dimensions_file):
+            try:
+                with open(dimensions_file, "r", encoding="utf-8") as f:
+                    dimensions = json.load(f)
+            except Exception as e:
+                logger.warning(f"Could not read {dimensions_file}: {e}")
+        if self.client.model in dimensions:
+            self.embedding_dimension = dimensions[self.client.model]
+            logger.info(f"Embedding dimension: {self.embedding_dimension} (stored)")
+            return
         try:
-            test_embedding = self.client.generate_embedding("test")
+            # One-off blocking probe; runs at construction, before any request is served
+            test_embedding = OllamaClient().generate_embedding("test")
             self.embedding_dimension = len(test_embedding)
             logger.info(f"Embedding dimension: {self.embedding_dimension}")
         except Exception as e:
             logger.error(f"Failed to initialize: {e}")
             raise
+        dimensions[self.client.model] = self.embedding_dimension
+        with open(dimensions_file, "w", encoding="utf-8") as f:
+            json.dump(dimensions, f)
     
-    def generate(self, text: str) -> np.ndarray:
+    async def generate(self, text: str) -> np.ndarray:
         """Generate normalized embedding."""
         try:
-            embedding = self.client.generate_embedding(text)
+            if self.cache is not None:
+                cached, hit = self.cache.get_many([text])
+                if hit[0]:
+                    return cached[0]
+            
+            metrics.count(metrics.EMBEDDINGS, kind="chunk")
+            embedding = await self.client.generate_embedding(text)
             embedding_array = np.array(embedding, dtype=np.float32)
             
             norm = np.linalg.norm(embedding_array)
             if norm > 0:
                 embedding_array = embedding_array / norm
             
+            if self.cache is not None:
+                self.cache.put_many([text], embedding_array.reshape(1, -1))
             return embedding_array
         except Exception as e:
             logger.error(f"Generation error: {e}")
             raise
+
+    async def generate_query(self, query: str) -> np.ndarray:
+        """Normalized query embedding; the returned array is read-only."""
+        return (await self.generate_queries([query]))[0]
+    
+    async def generate_queries(self, queries: List[str]) -> np.ndarray:
+        """Normalized query embeddings as an (n, dim) matrix.
+
+        Uncached queries are embedded in one batched call; repeated and
+        concurrent identical queries share a single request.
+        """
+        return np.stack(await self.query_cache.get_or_create_many(queries, self._embed_queries))
+    
+    async def _embed_queries(self, queries: List[str]) -> np.ndarray:
+        """Embed queries without touching the chunk embedding cache."""
+        try:
+            metrics.count(metrics.EMBEDDINGS, len(queries), kind="query")
+            return self.normalize(np.array(await self.client.generate_embeddings(queries), dtype=np.float32))
+        except Exception as e:
+            logger.error(f"Query embedding error: {e}")
+            raise
+
+    async def generate_batch(self, texts: List[str]) -> np.ndarray:
+        """Generate normalized embeddings as an (n, dim) matrix."""
+        if not texts:
+            return np.empty((0, self.embedding_dimension), dtype=np.float32)
+        try:
+            if self.cache is None:
+                metrics.count(metrics.EMBEDDINGS, len(texts), kind="chunk")
+                embeddings = await self.client.generate_embeddings(texts)
+                return self.normalize(np.array(embeddings, dtype=np.float32))
+            
+            matrix, hit = self.cache.get_many(texts)
+            missing = np.flatnonzero(~hit)
+            if len(missing):
+                misses = [texts[i] for i in missing]
+                metrics.count(metrics.EMBEDDINGS, len(misses), kind="chunk")
+                embeddings = await self.client.generate_embeddings(misses)
+                fresh = self.normalize(np.array(embeddings, dtype=np.float32))
+                matrix[missing] = fresh
+                self.cache.put_many(misses, fresh)
+            logger.debug(f"Embedding cache: {len(texts) - len(missing)}/{len(texts)} hits")
+            return matrix
+        except Exception as e:
+            logger.error(f"Batch generation error: {e}")
+            raise
+
+    @staticmethod
+    def normalize(matrix: np.ndarray) -> np.ndarray:
+        """L2-normalize rows in place."""
+        norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+        np.divide(matrix, norms, out=matrix, where=norms > 0)
+        return matrix
+
+    def save_cache(self) -> None:
+        """Persist embedding cache."""
+        if self.cache is not None:
+            self.cache.flush()
+    
+    def get_cache_stats(self) -> dict:
+        """Embedding cache stats."""
+        return self.cache.get_stats() if self.cache is not None else {}
+    
+    def get_query_cache_stats(self) -> dict:
+        """Query embedding cache stats."""
+        return self.query_cache.get_stats()
+    
+    async def close(self) -> None:
+        """Release client connections."""
+        self.save_cache()
+        await self.client.close()
     
     def get_dimension(self) -> int:
         """Get embedding dimension."""
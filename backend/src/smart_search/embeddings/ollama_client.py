@@ -1,8 +1,12 @@
 """Ollama API client."""
+import asyncio
+import httpx
 import requests
-from typing import List
+from typing import List, Optional
 from loguru import logger
+from smart_search.core import metrics, profiling
 from smart_search.core.config import get_settings
+from smart_search.utils.exceptions import OllamaEndpointNotFoundException, OllamaException
 
 class OllamaClient:
     """Client for Ollama API."""
@@ -67,3 +71,149 @@ class OllamaClient:
                 "current_model": self.model,
                 "error": str(e)
             }
+
+
+class AsyncOllamaClient:
+    """Async, connection-pooled client for Ollama API."""
+
+    RETRY_STATUS = {429, 500, 502, 503, 504}
+
+    def __init__(self, base_url: Optional[str] = None):
+        self.settings = get_settings()
+        self.base_url = base_url or self.settings.ollama_base_url
+        self.timeout = self.settings.ollama_timeout
+        self.model = self.settings.ollama_embedding_model
+        self.batch_size = self.settings.ollama_batch_size
+        self.max_concurrency = self.settings.ollama_max_concurrency
+        self.max_retries = self.settings.ollama_max_retries
+        self.retry_backoff = self.settings.ollama_retry_backoff
+        # Flipped off the first time the server rejects /api/embed
+        self.batch_supported = True
+        self._client: Optional[httpx.AsyncClient] = None
+
+    @property
+    def client(self) -> httpx.AsyncClient:
+        """Shared keep-alive client, created on first use."""
+        if self._client is None or self._client.is_closed:
+            max_connections = self.settings.ollama_max_connections
+            self._client = httpx.AsyncClient(
+                base_url=self.base_url,
+                timeout=self.timeout,
+                limits=httpx.Limits(
+                    max_connections=max_connections,
+                    max_keepalive_connections=max_connections
+                )
+            )
+        return self._client
+
+    async def close(self) -> None:
+        """Close pooled connections."""
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+
+    async def _post(self, path: str, payload: dict, timeout: Optional[float] = None) -> dict:
+        """POST with retry and exponential backoff."""
+        for attempt in range(self.max_retries + 1):
+            metrics.count(metrics.OLLAMA_REQUESTS, endpoint=path)
+            try:
+                with profiling.span(f"ollama {path}"):
+                    response = await self.client.post(path, json=payload, timeout=timeout or self.timeout)
+                if response.status_code == 200:
+                    return response.json()
+                if response.status_code == 404:
+                    raise self._not_found(path, response)
+                metrics.count(metrics.OLLAMA_ERRORS, reason=str(response.status_code))
+                error = OllamaException(f"Ollama error: {response.status_code}")
+                if response.status_code not in self.RETRY_STATUS:
+                    raise error
+            except httpx.TransportError as e:
+                metrics.count(metrics.OLLAMA_ERRORS, reason="timeout" if isinstance(e, httpx.TimeoutException)
+                              else "unreachable")
+                error = OllamaException(f"Ollama unreachable: {e!r}")
+
+            if attempt == self.max_retries:
+                raise error
+            delay = self.retry_backoff * (2 ** attempt)
+            logger.warning(f"{error}, retrying {path} in {delay:.2f}s")
+            await asyncio.sleep(delay)
+
+    @staticmethod
+    def _not_found(path: str, response: httpx.Response) -> OllamaException:
+        """Error for a 404, which Ollama returns for a model that is not pulled as well as a missing route."""
+        try:
+            message = str(response.json().get("error", ""))
+        except Exception:
+            message = response.text
+        if "model" in message and "not found" in message:
+            metrics.count(metrics.OLLAMA_ERRORS, reason="model_not_found")
+            return OllamaException(f"Ollama error: {message}")
+        metrics.count(metrics.OLLAMA_ERRORS, reason="404")
+        return OllamaEndpointNotFoundException(f"Ollama has no {path}")
+
+    async def generate_embedding(self, text: str, timeout: Optional[float] = None) -> List[float]:
+        """Generate embedding."""
+        data = await self._post(
+            "/api/embeddings", {"model": self.model, "prompt": text}, timeout
+        )
+        return data.get("embedding", [])
+
+    async def generate_embeddings(self, texts: List[str],
+                                  timeout: Optional[float] = None) -> List[List[float]]:
+        """Generate embeddings for many texts."""
+        if not texts:
+            return []
+        semaphore = asyncio.Semaphore(self.max_concurrency)
+
+        async def bounded(coro):
+            async with semaphore:
+                return await coro
+
+        if self.batch_supported:
+            batches = [texts[i:i + self.batch_size] for i in range(0, len(texts), self.batch_size)]
+            try:
+                results = await asyncio.gather(
+                    *(bounded(self._embed_batch(batch, timeout)) for batch in batches)
+                )
+                return [embedding for batch in results for embedding in batch]
+            except OllamaEndpointNotFoundException:
+                logger.warning("Ollama has no /api/embed, falling back to single requests")
+                self.batch_supported = False
+
+        return list(await asyncio.gather(
+            *(bounded(self.generate_embedding(text, timeout)) for text in texts)
+        ))
+
+    async def _embed_batch(self, texts: List[str], timeout: Optional[float] = None) -> List[List[float]]:
+        """Embed one batch via /api/embed."""
+        logger.debug(f"Generating {len(texts)} embeddings in one request")
+        data = await self._post("/api/embed", {"model": self.model, "input": texts}, timeout)
+        embeddings = data.get("embeddings", [])
+        if len(embeddings) != len(texts):
+            metrics.count(metrics.OLLAMA_ERRORS, reason="bad_response")
+            raise OllamaException(
+                f"Ollama returned {len(embeddings)} embeddings for {len(texts)} inputs"
+            )
+        return embeddings
+
+    async def check_health(self) -> dict:
+        """Check Ollama health."""
+        try:
+            response = await self.client.get("/api/tags", timeout=5)
+            response.raise_for_status()
+            model_names = [m.get("name", "") for m in response.json().get("models", [])]
+            return {
+                "ollama_running": True,
+                "model_available": any(self.model in name for name in model_names),
+                "available_models": model_names,
+                "current_model": self.model
+            }
+        except Exception as e:
+            logger.error(f"Health check error: {e}")
+            return {
+                "ollama_running": False,
+                "model_available": False,
+                "available_models": [],
+                "current_model": self.model,
+                "error": str(e)
+            }
@@ -38,6 +38,11 @@ async def startup():
     """Startup."""
     logger.info(f"🚀 API starting at {settings.api_host}:{settings.api_port}")
 
+@app.on_event("shutdown")
+async def shutdown():
+    """Shutdown."""
+    await endpoints.agent.close()
+
 app.include_router(health.router)
 app.include_router(endpoints.router)
 
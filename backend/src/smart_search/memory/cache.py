@@ -1,7 +1,15 @@
 """In-memory cache."""
-from typing import Dict, Optional, Any
+import asyncio
+import hashlib
+import os
+import pickle
+from collections import OrderedDict
+from typing import Awaitable, Callable, Dict, List, Optional, Any, Tuple
 from datetime import datetime
+import numpy as np
 from loguru import logger
+from smart_search.core.config import get_settings
+from smart_search.utils.helpers import generate_hash
 
 class CacheEntry:
     """Cache entry with TTL."""
@@ -60,3 +68,241 @@ class MemoryCache:
             del self.cache[k]
         if expired:
             logger.debug(f"Cleaned {len(expired)} expired entries")
+
+class EmbeddingCache:
+    """Persistent embedding cache keyed by (model, sha256 of normalized text).
+
+    Vectors live in a memory-mapped float32 matrix; an LRU-ordered
+    key -> row index is pickled next to it. Writes to the matrix reach the
+    file straight away, but the index only on flush(), so after a crash
+    the index can name rows that have since been reused. Each row
+    therefore carries a digest of its key and vector, and a row whose
+    digest does not match is a miss.
+    """
+    
+    # Bumped when the file layout changes; caches of another version start empty
+    VERSION = 2
+    DIGEST_SIZE = 16
+    
+    def __init__(self, model: str, dimension: int, capacity: Optional[int] = None,
+                 cache_dir: Optional[str] = None):
+        settings = get_settings()
+        self.model = model
+        self.dimension = dimension
+        self.capacity = capacity or settings.embedding_cache_size
+        self.cache_dir = cache_dir or os.path.join(settings.data_dir, "embedding_cache")
+        os.makedirs(self.cache_dir, exist_ok=True)
+        self.vectors_file = os.path.join(self.cache_dir, "vectors.f32")
+        self.digests_file = os.path.join(self.cache_dir, "digests.bin")
+        self.index_file = os.path.join(self.cache_dir, "index.pkl")
+        self.rows: "OrderedDict[Tuple[str, str], int]" = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self._dirty = False
+        self._load_or_create()
+    
+    def _load_or_create(self) -> None:
+        """Load cache files or start empty."""
+        files = (self.index_file, self.vectors_file, self.digests_file)
+        if all(os.path.exists(path) for path in files):
+            try:
+                with open(self.index_file, "rb") as f:
+                    state = pickle.load(f)
+                layout = (state.get("version"), state["dimension"], state["capacity"])
+                if layout == (self.VERSION, self.dimension, self.capacity):
+                    self.rows = state["rows"]
+                    self.vectors = np.memmap(self.vectors_file, dtype=np.float32, mode="r+",
+                                             shape=(self.capacity, self.dimension))
+                    self.digests = np.memmap(self.digests_file, dtype=np.uint8, mode="r+",
+                                             shape=(self.capacity, self.DIGEST_SIZE))
+                    logger.info(f"Loaded embedding cache with {len(self.rows)} entries")
+                    return
+                logger.info("Embedding cache layout changed, starting empty")
+            except Exception as e:
+                logger.warning(f"Could not load embedding cache: {e}")
+        self.rows = OrderedDict()
+        self.vectors = np.memmap(self.vectors_file, dtype=np.float32, mode="w+",
+                                 shape=(self.capacity, self.dimension))
+        self.digests = np.memmap(self.digests_file, dtype=np.uint8, mode="w+",
+                                 shape=(self.capacity, self.DIGEST_SIZE))
+    
+    def _key(self, text: str) -> Tuple[str, str]:
+        """Cache key for text."""
+        return self.model, generate_hash(" ".join(text.split()))
+    
+    def _digest(self, key: Tuple[str, str], vector: np.ndarray) -> np.ndarray:
+        """Digest of a key and the vector stored for it."""
+        digest = hashlib.blake2b("\0".join(key).encode(), digest_size=self.DIGEST_SIZE)
+        digest.update(np.ascontiguousarray(vector, dtype=np.float32).tobytes())
+        return np.frombuffer(digest.digest(), dtype=np.uint8)
+    
+    def get_many(self, texts: List[str]) -> Tuple[np.ndarray, np.ndarray]:
+        """Return (vectors, hit mask); rows for misses are left zeroed."""
+        vectors = np.zeros((len(texts), self.dimension), dtype=np.float32)
+        hit = np.zeros(len(texts), dtype=bool)
+        for i, text in enumerate(texts):
+            key = self._key(text)
+            row = self.rows.get(key)
+            if row is None:
+                continue
+            vector = np.array(self.vectors[row])
+            # A stale row keeps its index entry, so storing the key again reuses the row
+            if np.array_equal(self.digests[row], self._digest(key, vector)):
+                self.rows.move_to_end(key)
+                vectors[i] = vector
+                hit[i] = True
+        hit_count = int(hit.sum())
+        self.hits += hit_count
+        self.misses += len(texts) - hit_count
+        return vectors, hit
+    
+    def put_many(self, texts: List[str], vectors: np.ndarray) -> None:
+        """Store vectors, evicting least recently used entries when full."""
+        for text, vector in zip(texts, vectors):
+            key = self._key(text)
+            row = self.rows.pop(key, None)
+            if row is None:
+                if len(self.rows) < self.capacity:
+                    row = len(self.rows)
+                else:
+                    _, row = self.rows.popitem(last=False)
+            self.rows[key] = row
+            self.vectors[row] = vector
+            self.digests[row] = self._digest(key, self.vectors[row])
+        self._dirty = True
+    
+    def flush(self) -> None:
+        """Persist vectors and index."""
+        if not self._dirty:
+            return
+        try:
+            self.vectors.flush()
+            self.digests.flush()
+            tmp_file = self.index_file + ".tmp"
+            with open(tmp_file, "wb") as f:
+                pickle.dump({"version": self.VERSION, "dimension": self.dimension,
+                             "capacity": self.capacity, "rows": self.rows}, f)
+            os.replace(tmp_file, self.index_file)
+            self._dirty = False
+            logger.debug(f"Saved embedding cache with {len(self.rows)} entries")
+        except Exception as e:
+            logger.error(f"Embedding cache save error: {e}")
+    
+    def get_stats(self) -> dict:
+        """Get stats."""
+        lookups = self.hits + self.misses
+        return {
+            "entries": len(self.rows),
+            "capacity": self.capacity,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else 0.0
+        }
+
+class QueryEmbeddingCache:
+    """LRU cache of query embeddings bounded by entries and bytes, with single-flight.
+
+    Concurrent lookups of a query that is being embedded wait on the same
+    in-flight request instead of starting their own.
+    """
+    
+    def __init__(self, max_entries: Optional[int] = None, max_bytes: Optional[int] = None):
+        settings = get_settings()
+        self.max_entries = max_entries or settings.query_cache_size
+        self.max_bytes = max_bytes or int(settings.query_cache_max_mb * 1024 * 1024)
+        self.entries: "OrderedDict[str, np.ndarray]" = OrderedDict()
+        self.bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.coalesced = 0
+        self._inflight: Dict[str, asyncio.Task] = {}
+    
+    @staticmethod
+    def _key(query: str) -> str:
+        """Whitespace-insensitive key; case is kept, as "US" and "us" embed differently."""
+        return " ".join(query.split())
+    
+    def get(self, query: str) -> Optional[np.ndarray]:
+        """Cached embedding, refreshed as most recently used."""
+        key = self._key(query)
+        vector = self.entries.get(key)
+        if vector is not None:
+            self.entries.move_to_end(key)
+        return vector
+    
+    def put(self, query: str, vector: np.ndarray) -> np.ndarray:
+        """Cache a read-only copy of an embedding and return it."""
+        key = self._key(query)
+        vector = np.array(vector, dtype=np.float32)
+        vector.flags.writeable = False
+        old = self.entries.pop(key, None)
+        if old is not None:
+            self.bytes -= old.nbytes
+        self.entries[key] = vector
+        self.bytes += vector.nbytes
+        while self.entries and (len(self.entries) > self.max_entries or self.bytes > self.max_bytes):
+            _, evicted = self.entries.popitem(last=False)
+            self.bytes -= evicted.nbytes
+        return vector
+    
+    async def get_or_create_many(self, queries: List[str],
+                                 create_many: Callable[[List[str]], Awaitable[np.ndarray]]) -> List[np.ndarray]:
+        """Cached embeddings; queries not cached or in flight are created in one create_many() call."""
+        found: Dict[str, np.ndarray] = {}
+        waiting: Dict[str, asyncio.Task] = {}
+        missing: Dict[str, str] = {}
+        for query in queries:
+            key = self._key(query)
+            if key in found or key in waiting or key in missing:
+                self.coalesced += 1
+                continue
+            vector = self.get(query)
+            if vector is not None:
+                self.hits += 1
+                found[key] = vector
+            elif key in self._inflight:
+                self.coalesced += 1
+                waiting[key] = self._inflight[key]
+            else:
+                self.misses += 1
+                missing[key] = query
+        if missing:
+            batch = asyncio.ensure_future(create_many(list(missing.values())))
+            for row, (key, query) in enumerate(missing.items()):
+                task = asyncio.ensure_future(self._create(query, key, batch, row))
+                task.add_done_callback(self._retrieve)
+                self._inflight[key] = waiting[key] = task
+        for key, task in waiting.items():
+            # A caller that times out must not cancel the request others are waiting on
+            found[key] = await asyncio.shield(task)
+        return [found[self._key(query)] for query in queries]
+    
+    @staticmethod
+    def _retrieve(task: asyncio.Task) -> None:
+        """Mark a failure as retrieved; a failed batch stops its callers before they await every row."""
+        if not task.cancelled():
+            task.exception()
+    
+    async def _create(self, query: str, key: str, batch: asyncio.Future, row: int) -> np.ndarray:
+        """Cache one row of a create_many() result."""
+        try:
+            return self.put(query, (await asyncio.shield(batch))[row])
+        finally:
+            del self._inflight[key]
+    
+    def clear(self) -> None:
+        """Clear all."""
+        self.entries.clear()
+        self.bytes = 0
+    
+    def get_stats(self) -> dict:
+        """Get stats."""
+        lookups = self.hits + self.misses + self.coalesced
+        return {
+            "entries": len(self.entries),
+            "bytes": self.bytes,
+            "hits": self.hits,
+            "misses": self.misses,
+            "coalesced": self.coalesced,
+            "hit_rate": (self.hits + self.coalesced) / lookups if lookups else 0.0
+        }
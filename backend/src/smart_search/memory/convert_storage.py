@@ -0,0 +1,101 @@
+"""Convert the stored index to another vector storage mode offline.
+
+Run from backend/ with the server stopped:
+
+    python -m smart_search.memory.convert_storage --storage sq8
+
+The store migrates on load, as the server would at startup; the command then
+checkpoints and prints a memory/recall/latency report. With SHARD_BY set,
+each shard under data_dir/shards is converted in turn.
+"""
+import argparse
+import json
+import os
+import sys
+import time
+
+def _convert(pages_dir: str, dimension: int, k: int, queries: int) -> dict:
+    """Load one store, which migrates it, checkpoint it and report on it."""
+    from smart_search.memory.vector_store import VectorStore
+
+    start = time.time()
+    store = VectorStore(dimension, pages_dir)
+    store.checkpoint()
+    seconds = time.time() - start
+    stats = store.get_stats()
+    full_bytes = stats["num_vectors"] * dimension * 4
+    code_bytes = stats["vector_code_bytes"]
+    report = {
+        "vector_storage": stats["vector_storage"],
+        "index_type": stats["index_type"],
+        "vectors": stats["num_vectors"],
+        "seconds": round(seconds, 2),
+        "memory": {
+            "full_vector_bytes": full_bytes,
+            "vector_code_bytes": code_bytes,
+            "compression": round(full_bytes / code_bytes, 1) if code_bytes else None,
+            "index_file_size": stats["index_file_size"],
+            "vector_file_size": stats["vector_file"].get("file_size", 0),
+        },
+        "recall": store.evaluate_recall(k, queries),
+    }
+    store.close()
+    return report
+
+def _store_dirs(settings) -> list:
+    """Directories of the stores to convert: the shards when sharding is configured."""
+    if settings.shard_by == "none":
+        return [os.path.join(settings.data_dir, "pages")]
+    shards_dir = os.path.join(settings.data_dir, "shards")
+    manifest_file = os.path.join(shards_dir, "shards.json")
+    if not os.path.exists(manifest_file):
+        sys.exit(f"No shards at {shards_dir}; start the server once to import the unsharded store")
+    with open(manifest_file, "r", encoding="utf-8") as f:
+        manifest = json.load(f)
+    if manifest["shard_by"] != settings.shard_by:
+        sys.exit(f"Shards in {shards_dir} were built with shard_by={manifest['shard_by']}, "
+                 f"not {settings.shard_by}")
+    return [os.path.join(shards_dir, name) for name in sorted(manifest["shards"])]
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--storage", required=True, choices=("full", "sq8", "pq"))
+    parser.add_argument("--index-type", help="Also change the index type (default: INDEX_TYPE setting)")
+    parser.add_argument("--k", type=int, default=10)
+    parser.add_argument("--queries", type=int, default=200)
+    args = parser.parse_args()
+
+    # Settings are read at import time
+    os.environ["VECTOR_STORAGE"] = args.storage
+    if args.index_type:
+        os.environ["INDEX_TYPE"] = args.index_type
+    import faiss
+    from smart_search.core.config import get_settings
+    from smart_search.core.logging_config import setup_logging
+    setup_logging()
+
+    settings = get_settings()
+    store_dirs = _store_dirs(settings)
+    index_files = [os.path.join(path, "faiss_index.bin") for path in store_dirs]
+    index_files = [path for path in index_files if os.path.exists(path)]
+    if not index_files:
+        sys.exit(f"No index under {', '.join(store_dirs) or settings.data_dir}")
+    dimension = faiss.read_index(index_files[0], faiss.IO_FLAG_MMAP).d
+
+    if settings.shard_by == "none":
+        print(json.dumps(_convert(store_dirs[0], dimension, args.k, args.queries), indent=2))
+        return
+    # One shard at a time, so only one is in memory
+    shards = {os.path.basename(path): _convert(path, dimension, args.k, args.queries) for path in store_dirs}
+    queries = sum(report["recall"]["queries"] for report in shards.values())
+    print(json.dumps({
+        "shard_by": settings.shard_by,
+        "vectors": sum(report["vectors"] for report in shards.values()),
+        "seconds": round(sum(report["seconds"] for report in shards.values()), 2),
+        "recall": sum(r["recall"]["recall"] * r["recall"]["queries"] for r in shards.values()) / queries
+        if queries else 1.0,
+        "shards": shards,
+    }, indent=2))
+
+if __name__ == "__main__":
+    main()
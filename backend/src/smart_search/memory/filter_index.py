@@ -0,0 +1,101 @@
+"""Metadata filters over vector ids."""
+from array import array
+from functools import lru_cache
+from typing import Dict, Iterable, List, Optional
+import numpy as np
+from smart_search.memory.schemas import SearchFilter, StoredPage
+from smart_search.utils.helpers import extract_domain
+
+@lru_cache(maxsize=65536)
+def domain_key(value: str) -> str:
+    """Domain of a URL, or a bare domain, normalized for lookups."""
+    domain = extract_domain(value) if "://" in value else value
+    domain = domain.lower()
+    return domain[4:] if domain.startswith("www.") else domain
+
+class FilterIndex:
+    """Per-domain id lists and per-id timestamps for building filter masks.
+
+    Ids are dense and increasing, so timestamps live in an array indexed by
+    id (NaN for missing or deleted ids) with a lazily rebuilt time order for
+    range lookups.
+    """
+
+    def __init__(self):
+        self.domains: Dict[str, array] = {}
+        self.times = array("d")
+        self._order: Optional[np.ndarray] = None
+        self._sorted_times: Optional[np.ndarray] = None
+
+    def add(self, ids: Iterable[int], urls: Iterable[str], timestamps: Iterable[float]) -> None:
+        """Register ids with their page URL and timestamp (seconds since epoch)."""
+        for vector_id, url, timestamp in zip(ids, urls, timestamps):
+            if vector_id >= len(self.times):
+                self.times.extend([np.nan] * (vector_id + 1 - len(self.times)))
+            self.times[vector_id] = timestamp
+            self.domains.setdefault(domain_key(url), array("q")).append(vector_id)
+        self._order = None
+
+    def add_pages(self, ids: Iterable[int], pages: List[StoredPage]) -> None:
+        """Register stored pages."""
+        self.add(ids, (p.url for p in pages), (p.timestamp.timestamp() for p in pages))
+
+    def remove(self, ids: Iterable[int]) -> None:
+        """Forget ids; domain lists are cleaned up when masks are built."""
+        for vector_id in ids:
+            if vector_id < len(self.times):
+                self.times[vector_id] = np.nan
+        self._order = None
+
+    def clear(self) -> None:
+        """Forget every id."""
+        self.__init__()
+
+    def _time_order(self) -> None:
+        """Sort ids by timestamp; deleted ids (NaN) sort last."""
+        if self._order is None:
+            times = np.frombuffer(self.times, dtype=np.float64)
+            self._order = np.argsort(times, kind="stable")
+            self._sorted_times = times[self._order]
+
+    def mask(self, search_filter: SearchFilter, size: int,
+             url_prefix_ids: Optional[List[int]] = None) -> np.ndarray:
+        """Boolean mask over ids [0, size) of live ids matching the filter.
+
+        URL prefixes are resolved by the caller and passed as url_prefix_ids.
+        """
+        times = np.frombuffer(self.times, dtype=np.float64)
+        mask = np.zeros(size, dtype=bool)
+        mask[:len(times)] = ~np.isnan(times[:size])
+        if search_filter.domain:
+            key = domain_key(search_filter.domain)
+            ids = self.domains.get(key)
+            allowed = np.zeros(size, dtype=bool)
+            if ids:
+                domain_ids = np.frombuffer(ids, dtype=np.int64)
+                allowed[domain_ids[domain_ids < size]] = True
+                live = domain_ids[domain_ids < len(times)]
+                if np.isnan(times[live]).any():
+                    # Drop deleted ids so the list does not grow with every re-index
+                    self.domains[key] = array("q", live[~np.isnan(times[live])].tobytes())
+            mask &= allowed
+        if search_filter.since is not None or search_filter.until is not None:
+            self._time_order()
+            since = search_filter.since.timestamp() if search_filter.since else -np.inf
+            until = search_filter.until.timestamp() if search_filter.until else np.inf
+            start = np.searchsorted(self._sorted_times, since, side="left")
+            end = np.searchsorted(self._sorted_times, until, side="right")
+            in_range = self._order[start:end]
+            allowed = np.zeros(size, dtype=bool)
+            allowed[in_range[in_range < size]] = True
+            mask &= allowed
+        if url_prefix_ids is not None:
+            allowed = np.zeros(size, dtype=bool)
+            prefix_ids = np.array(url_prefix_ids, dtype=np.int64)
+            allowed[prefix_ids[prefix_ids < size]] = True
+            mask &= allowed
+        return mask
+
+    def get_stats(self) -> dict:
+        """Filter index size stats."""
+        return {"domains": len(self.domains)}
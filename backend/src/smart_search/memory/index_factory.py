@@ -0,0 +1,201 @@
+"""FAISS index construction and tuning."""
+import time
+from contextlib import nullcontext
+from typing import ContextManager, Optional, Tuple
+import numpy as np
+import faiss
+from loguru import logger
+from smart_search.core.config import get_settings
+
+INDEX_TYPES = ("flat", "hnsw", "ivf_flat", "ivf_pq")
+STORAGE_TYPES = ("full", "sq8", "pq")
+# 8-bit product codes have 256 centroids per subquantizer, and faiss needs a training point for each
+PQ_TRAIN_MIN = 256
+
+def needs_training(index_type: str, storage: str = "full") -> bool:
+    """Whether the index type must be trained before use."""
+    return index_type.startswith("ivf") or storage != "full"
+
+def min_training_vectors(index_type: str, storage: str = "full") -> int:
+    """Fewest vectors to train an index on: index_train_min_vectors, raised to what faiss requires."""
+    minimum = get_settings().index_train_min_vectors
+    if expected_layout(index_type, storage)[1] == "pq":
+        return max(minimum, PQ_TRAIN_MIN)
+    return minimum
+
+def _pq_subquantizers(dimension: int, pq_m: int) -> int:
+    """Largest subquantizer count <= pq_m that divides the dimension."""
+    for m in range(min(pq_m, dimension), 0, -1):
+        if dimension % m == 0:
+            return m
+    return 1
+
+def _encoding(storage: str, dimension: int) -> str:
+    """faiss.index_factory vector encoding for a storage mode."""
+    if storage == "full":
+        return "Flat"
+    if storage == "sq8":
+        return "SQ8"
+    if storage == "pq":
+        return f"PQ{_pq_subquantizers(dimension, get_settings().pq_m)}"
+    raise ValueError(f"Unknown vector storage: {storage} (expected one of {STORAGE_TYPES})")
+
+def factory_string(index_type: str, dimension: int, num_vectors: int = 0, storage: str = "full") -> str:
+    """faiss.index_factory description for an index type and vector storage."""
+    settings = get_settings()
+    encoding = _encoding(storage, dimension)
+    if index_type == "flat":
+        return encoding
+    if index_type == "hnsw":
+        return f"HNSW{settings.hnsw_m}" if storage == "full" else f"HNSW{settings.hnsw_m},{encoding}"
+    # Keep ~39 training points per centroid, as faiss recommends
+    nlist = max(1, min(settings.ivf_nlist, num_vectors // 39))
+    if index_type == "ivf_flat":
+        return f"IVF{nlist},{encoding}"
+    if index_type == "ivf_pq":
+        return f"IVF{nlist},PQ{_pq_subquantizers(dimension, settings.pq_m)}"
+    raise ValueError(f"Unknown index type: {index_type} (expected one of {INDEX_TYPES})")
+
+def create_index(dimension: int, index_type: str, training_vectors: Optional[np.ndarray] = None,
+                 storage: str = "full") -> faiss.Index:
+    """Create an inner-product index, training it when required."""
+    num_vectors = len(training_vectors) if training_vectors is not None else 0
+    description = factory_string(index_type, dimension, num_vectors, storage)
+    index = faiss.index_factory(dimension, description, faiss.METRIC_INNER_PRODUCT)
+    if index_type == "hnsw":
+        index.hnsw.efConstruction = get_settings().hnsw_ef_construction
+    if not index.is_trained:
+        if training_vectors is None:
+            raise ValueError(f"{index_type} index needs training vectors")
+        start = time.time()
+        index.train(training_vectors)
+        logger.info(f"Trained {description} on {num_vectors} vectors in {time.time() - start:.2f}s")
+    if needs_training(index_type):
+        # Keeps reconstruct() available for migrations and retraining
+        faiss.extract_index_ivf(index).make_direct_map()
+    return index
+
+def unwrap(index: faiss.Index) -> faiss.Index:
+    """Inner index of an ID map, downcast to its concrete type."""
+    index = faiss.downcast_index(index)
+    if isinstance(index, faiss.IndexIDMap):
+        return faiss.downcast_index(index.index)
+    return index
+
+def index_type_of(index: faiss.Index) -> str:
+    """Detect the index type of a loaded index."""
+    index = unwrap(index)
+    if isinstance(index, faiss.IndexHNSW):
+        return "hnsw"
+    if isinstance(index, faiss.IndexIVFPQ):
+        return "ivf_pq"
+    if isinstance(index, faiss.IndexIVF):
+        return "ivf_flat"
+    return "flat"
+
+def storage_of(index: faiss.Index) -> str:
+    """Detect how a loaded index encodes its vectors."""
+    index = unwrap(index)
+    if isinstance(index, faiss.IndexHNSW):
+        index = faiss.downcast_index(index.storage)
+    if isinstance(index, (faiss.IndexScalarQuantizer, faiss.IndexIVFScalarQuantizer)):
+        return "sq8"
+    if isinstance(index, (faiss.IndexPQ, faiss.IndexIVFPQ)):
+        return "pq"
+    return "full"
+
+def expected_layout(index_type: str, storage: str) -> Tuple[str, str]:
+    """(index type, storage) reported by index_type_of/storage_of for an index built with these settings."""
+    if index_type == "ivf_pq" or (index_type == "ivf_flat" and storage == "pq"):
+        return "ivf_pq", "pq"
+    return index_type, storage
+
+def code_size(index: faiss.Index) -> int:
+    """Bytes per stored vector code, excluding ids and graph links."""
+    index = unwrap(index)
+    if isinstance(index, faiss.IndexHNSW):
+        index = faiss.downcast_index(index.storage)
+    return index.sa_code_size()
+
+def index_ids(index: faiss.Index) -> np.ndarray:
+    """Ids stored in an index, without decoding vectors."""
+    outer = faiss.downcast_index(index)
+    if isinstance(outer, faiss.IndexIDMap):
+        return faiss.vector_to_array(outer.id_map).astype(np.int64)
+    return np.arange(index.ntotal, dtype=np.int64)
+
+def reconstruct_all(index: faiss.Index) -> Tuple[np.ndarray, np.ndarray]:
+    """Decode every stored vector with its id.
+
+    Exact for flat/hnsw/ivf_flat, approximate for ivf_pq.
+    """
+    if index.ntotal == 0:
+        return np.empty(0, dtype=np.int64), np.empty((0, index.d), dtype=np.float32)
+    inner = unwrap(index)
+    ids = index_ids(index)
+    ivf = faiss.try_extract_index_ivf(inner)
+    if ivf is not None and ivf.direct_map.type == faiss.DirectMap.NoMap:
+        ivf.make_direct_map()
+    return ids, inner.reconstruct_n(0, inner.ntotal)
+
+def search_parameters(index: faiss.Index, ef_search: Optional[int] = None,
+                      nprobe: Optional[int] = None,
+                      selector: Optional[faiss.IDSelector] = None) -> Optional[faiss.SearchParameters]:
+    """Per-query search parameters for the index type.
+
+    The caller must keep ``selector`` alive for the duration of the search.
+    """
+    settings = get_settings()
+    index_type = index_type_of(index)
+    if index_type == "hnsw":
+        return faiss.SearchParametersHNSW(efSearch=ef_search or settings.hnsw_ef_search, sel=selector)
+    if needs_training(index_type):
+        return faiss.SearchParametersIVF(nprobe=nprobe or settings.ivf_nprobe, sel=selector)
+    if selector is not None:
+        return faiss.SearchParameters(sel=selector)
+    return None
+
+def recall_at_k(index: faiss.Index, k: int = 10, num_queries: int = 100,
+                ef_search: Optional[int] = None, nprobe: Optional[int] = None,
+                deleted: Optional[np.ndarray] = None,
+                lock: Optional[ContextManager] = None) -> dict:
+    """Measure recall@k of an index against exact flat search over its own vectors.
+
+    ``deleted`` ids are left out of both searches. Only reading the index
+    happens under ``lock``; the exact search runs outside it.
+    """
+    with lock or nullcontext():
+        index_type = index_type_of(index)
+        ids, vectors = reconstruct_all(index)
+        if deleted is not None and len(deleted):
+            live = ~np.isin(ids, deleted)
+            ids, vectors = ids[live], vectors[live]
+        if len(vectors) == 0:
+            return {"index_type": index_type, "k": k, "queries": 0, "recall": 1.0}
+        k = min(k, len(vectors))
+        rng = np.random.default_rng(0)
+        queries = vectors[rng.choice(len(vectors), min(num_queries, len(vectors)), replace=False)]
+        selector = None
+        if deleted is not None and len(deleted):
+            batch = faiss.IDSelectorBatch(deleted)
+            selector = faiss.IDSelectorNot(batch)
+        start = time.time()
+        _, found = index.search(queries, k, params=search_parameters(index, ef_search, nprobe, selector))
+        ann_ms = (time.time() - start) * 1000
+
+    exact = faiss.IndexFlatIP(index.d)
+    exact.add(vectors)
+    start = time.time()
+    _, expected = exact.search(queries, k)
+    expected = ids[expected]
+    exact_ms = (time.time() - start) * 1000
+
+    hits = sum(len(set(e) & set(f)) for e, f in zip(expected, found))
+    return {
+        "index_type": index_type,
+        "k": k,
+        "queries": len(queries),
+        "recall": hits / (len(queries) * k),
+        "ann_ms_per_query": ann_ms / len(queries),
+        "exact_ms_per_query": exact_ms / len(queries),
+    }
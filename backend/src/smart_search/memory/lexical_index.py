@@ -0,0 +1,175 @@
+"""BM25 inverted index."""
+import pickle
+import re
+from array import array
+from collections import Counter
+from typing import Dict, Iterable, List, Optional, Tuple
+import numpy as np
+from smart_search.core.config import get_settings
+
+# Words, keeping identifiers like v2.3.1, x-request-id and ERR_CONN_RESET whole
+_TOKEN_RE = re.compile(r"\w+(?:[.\-]\w+)*")
+_PART_RE = re.compile(r"[^\W_]+")
+
+def tokenize(text: str) -> List[str]:
+    """Lowercase tokens; compound identifiers also yield their parts."""
+    tokens = []
+    for token in _TOKEN_RE.findall(text.lower()):
+        tokens.append(token)
+        parts = _PART_RE.findall(token)
+        if len(parts) > 1:
+            tokens.extend(parts)
+    return tokens
+
+class LexicalIndex:
+    """BM25 over chunks keyed by vector id.
+
+    Postings are parallel arrays of doc ids and term frequencies per term.
+    Deleted docs get a zero length and are dropped from postings lazily.
+    """
+
+    def __init__(self):
+        self.settings = get_settings()
+        self.vocab: Dict[str, int] = {}
+        self.posting_ids: List[array] = []
+        self.posting_tfs: List[array] = []
+        # Token count per doc id; 0 marks a missing or deleted doc
+        self.doc_lens = array("I")
+        # Distinct terms per doc id, i.e. its number of postings
+        self.doc_terms = array("I")
+        self.num_docs = 0
+        self.total_len = 0
+        self.dead_postings = 0
+        self.total_postings = 0
+
+    def __contains__(self, doc_id: int) -> bool:
+        return doc_id < len(self.doc_lens) and self.doc_lens[doc_id] > 0
+
+    def add(self, doc_id: int, text: str) -> None:
+        """Index a document; re-adding an existing id is a no-op."""
+        if doc_id in self:
+            return
+        counts = Counter(tokenize(text))
+        if not counts:
+            return
+        if doc_id >= len(self.doc_lens):
+            grow = doc_id + 1 - len(self.doc_lens)
+            self.doc_lens.extend([0] * grow)
+            self.doc_terms.extend([0] * grow)
+        length = sum(counts.values())
+        self.doc_lens[doc_id] = length
+        self.doc_terms[doc_id] = len(counts)
+        self.num_docs += 1
+        self.total_len += length
+        for term, tf in counts.items():
+            term_id = self.vocab.get(term)
+            if term_id is None:
+                term_id = self.vocab[term] = len(self.posting_ids)
+                self.posting_ids.append(array("q"))
+                self.posting_tfs.append(array("I"))
+            self.posting_ids[term_id].append(doc_id)
+            self.posting_tfs[term_id].append(tf)
+        self.total_postings += len(counts)
+
+    def add_many(self, docs: Iterable[Tuple[int, str]]) -> None:
+        """Index many documents."""
+        for doc_id, text in docs:
+            self.add(doc_id, text)
+
+    def remove(self, doc_id: int) -> None:
+        """Delete a document; its postings are dropped at the next compaction."""
+        if doc_id not in self:
+            return
+        self.num_docs -= 1
+        self.total_len -= self.doc_lens[doc_id]
+        self.doc_lens[doc_id] = 0
+        self.dead_postings += self.doc_terms[doc_id]
+        if self.dead_postings >= self.settings.compaction_threshold * max(1, self.total_postings):
+            self.compact()
+
+    def compact(self) -> None:
+        """Drop postings of deleted documents."""
+        lens = np.frombuffer(self.doc_lens, dtype=np.uint32)
+        total = 0
+        for term_id, ids in enumerate(self.posting_ids):
+            if not ids:
+                continue
+            doc_ids = np.frombuffer(ids, dtype=np.int64)
+            live = lens[doc_ids] > 0
+            if not live.all():
+                tfs = np.frombuffer(self.posting_tfs[term_id], dtype=np.uint32)
+                self.posting_ids[term_id] = array("q", doc_ids[live].tobytes())
+                self.posting_tfs[term_id] = array("I", tfs[live].tobytes())
+            total += len(self.posting_ids[term_id])
+        self.total_postings = total
+        self.dead_postings = 0
+
+    def clear(self) -> None:
+        """Remove every document."""
+        self.__init__()
+
+    def search(self, query: str, top_k: int = 5,
+               allowed: Optional[np.ndarray] = None) -> Tuple[np.ndarray, np.ndarray]:
+        """Top doc ids and BM25 scores, best first; allowed is an optional mask over doc ids."""
+        empty = np.empty(0, dtype=np.int64), np.empty(0, dtype=np.float32)
+        term_ids = {self.vocab[t] for t in tokenize(query) if t in self.vocab}
+        if not term_ids or self.num_docs == 0:
+            return empty
+        k1, b = self.settings.bm25_k1, self.settings.bm25_b
+        lens = np.frombuffer(self.doc_lens, dtype=np.uint32)
+        avg_len = self.total_len / self.num_docs
+        all_ids, all_scores = [], []
+        for term_id in term_ids:
+            ids = np.frombuffer(self.posting_ids[term_id], dtype=np.int64)
+            tfs = np.frombuffer(self.posting_tfs[term_id], dtype=np.uint32).astype(np.float32)
+            doc_lens = lens[ids]
+            live = doc_lens > 0
+            ids, tfs, doc_lens = ids[live], tfs[live], doc_lens[live]
+            if len(ids) == 0:
+                continue
+            idf = np.log(1 + (self.num_docs - len(ids) + 0.5) / (len(ids) + 0.5))
+            all_ids.append(ids)
+            all_scores.append(idf * tfs * (k1 + 1) / (tfs + k1 * (1 - b + b * doc_lens / avg_len)))
+        if not all_ids:
+            return empty
+        doc_ids, inverse = np.unique(np.concatenate(all_ids), return_inverse=True)
+        scores = np.bincount(inverse, weights=np.concatenate(all_scores)).astype(np.float32)
+        if allowed is not None:
+            keep = doc_ids < len(allowed)
+            keep[keep] = allowed[doc_ids[keep]]
+            doc_ids, scores = doc_ids[keep], scores[keep]
+            if len(doc_ids) == 0:
+                return empty
+        top_k = min(top_k, len(doc_ids))
+        top = np.argpartition(-scores, top_k - 1)[:top_k]
+        top = top[np.argsort(-scores[top])]
+        return doc_ids[top], scores[top]
+
+    def serialize(self) -> bytes:
+        """Snapshot for a checkpoint."""
+        return pickle.dumps({
+            "vocab": self.vocab,
+            "posting_ids": self.posting_ids,
+            "posting_tfs": self.posting_tfs,
+            "doc_lens": self.doc_lens,
+            "doc_terms": self.doc_terms,
+            "num_docs": self.num_docs,
+            "total_len": self.total_len,
+            "dead_postings": self.dead_postings,
+            "total_postings": self.total_postings,
+        }, protocol=pickle.HIGHEST_PROTOCOL)
+
+    @classmethod
+    def deserialize(cls, data: bytes) -> "LexicalIndex":
+        """Load a checkpoint snapshot."""
+        index = cls()
+        index.__dict__.update(pickle.loads(data))
+        return index
+
+    def get_stats(self) -> dict:
+        """Index size stats."""
+        return {
+            "documents": self.num_docs,
+            "terms": len(self.vocab),
+            "postings": self.total_postings,
+        }
@@ -1,44 +1,274 @@
 """Metadata storage."""
+import json
 import os
-import pickle
-from typing import List
+import sqlite3
+import threading
+from contextlib import contextmanager
+from datetime import datetime
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
 from loguru import logger
 from smart_search.core.config import get_settings
 from smart_search.memory.schemas import StoredPage
 
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS chunks (
+    id INTEGER PRIMARY KEY,
+    url TEXT NOT NULL,
+    chunk_index INTEGER NOT NULL,
+    title TEXT NOT NULL,
+    content TEXT NOT NULL,
+    timestamp TEXT NOT NULL,
+    embedding_dimension INTEGER NOT NULL,
+    metadata TEXT NOT NULL,
+    simhash INTEGER,
+    content_hash TEXT,
+    UNIQUE (url, chunk_index)
+)
+"""
+
+_PAGES_SCHEMA = """
+CREATE TABLE IF NOT EXISTS pages (
+    url TEXT PRIMARY KEY,
+    fingerprint TEXT NOT NULL,
+    indexed_at TEXT NOT NULL
+)
+"""
+
+# Columns added after the first release, created on open when missing
+_ADDED_COLUMNS = {"simhash": "INTEGER", "content_hash": "TEXT"}
+
+# Statements are parameterized constants so sqlite3's statement cache reuses them
+_INSERT = ("INSERT OR REPLACE INTO chunks (id, url, chunk_index, title, content, timestamp, "
+           "embedding_dimension, metadata, simhash, content_hash) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)")
+_INSERT_IGNORE = _INSERT.replace("OR REPLACE", "OR IGNORE")
+_SELECT = "SELECT id, url, chunk_index, title, content, timestamp, embedding_dimension, metadata FROM chunks"
+_IDS_FOR_URL = "SELECT id, chunk_index FROM chunks WHERE url = ?"
+_DELETE_ID = "DELETE FROM chunks WHERE id = ?"
+_DELETE_URL = "DELETE FROM chunks WHERE url = ?"
+
+# SQLite's default limit on bound parameters per statement
+_MAX_PARAMS = 999
+
+def _to_signed(value: int) -> int:
+    """Unsigned 64-bit value as SQLite's signed INTEGER."""
+    return value - (1 << 64) if value >= 1 << 63 else value
+
+def _chunk_index(page: StoredPage) -> int:
+    """Chunk index of a page; whole pages are chunk 0."""
+    return int(page.metadata.get("chunk_index", 0))
+
 class MetadataStore:
-    """Persists metadata."""
-    
-    def __init__(self):
+    """Chunk metadata in SQLite, keyed by vector id and by (url, chunk_index)."""
+
+    def __init__(self, db_path: Optional[str] = None):
         self.settings = get_settings()
-        self.metadata_file = os.path.join(self.settings.data_dir, self.settings.metadata_file)
-        self.metadata: List[StoredPage] = []
-        self._load()
-    
-    def _load(self) -> None:
-        """Load metadata."""
-        if os.path.exists(self.metadata_file):
+        self.db_path = db_path or os.path.join(self.settings.data_dir, "pages", "chunks.db")
+        os.makedirs(os.path.dirname(self.db_path), exist_ok=True)
+        # Shared with compaction/checkpoint threads; access is serialized by _lock
+        self.conn = sqlite3.connect(self.db_path, check_same_thread=False, isolation_level=None)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self.conn.execute(_SCHEMA)
+        self.conn.execute(_PAGES_SCHEMA)
+        columns = {row[1] for row in self.conn.execute("PRAGMA table_info(chunks)")}
+        for column, column_type in _ADDED_COLUMNS.items():
+            if column not in columns:
+                self.conn.execute(f"ALTER TABLE chunks ADD COLUMN {column} {column_type}")
+        self._lock = threading.RLock()
+        self._depth = 0
+        logger.info(f"Metadata store at {self.db_path} has {self.count()} chunks")
+
+    @contextmanager
+    def transaction(self) -> Iterator[sqlite3.Connection]:
+        """Run statements in one transaction; nested calls join the outer one."""
+        with self._lock:
+            if self._depth == 0:
+                self.conn.execute("BEGIN")
+            self._depth += 1
             try:
-                with open(self.metadata_file, 'rb') as f:
-                    self.metadata = pickle.load(f)
-                logger.info(f"Loaded {len(self.metadata)} pages")
-            except Exception as e:
-                logger.error(f"Load error: {e}")
-    
-    def save(self) -> None:
-        """Save metadata."""
-        try:
-            with open(self.metadata_file, 'wb') as f:
-                pickle.dump(self.metadata, f)
-            logger.debug(f"Saved {len(self.metadata)} pages")
-        except Exception as e:
-            logger.error(f"Save error: {e}")
-    
-    def add(self, page: StoredPage) -> None:
-        """Add page."""
-        self.metadata.append(page)
-    
+                yield self.conn
+            except Exception:
+                self._depth -= 1
+                if self._depth == 0:
+                    self.conn.execute("ROLLBACK")
+                raise
+            self._depth -= 1
+            if self._depth == 0:
+                self.conn.execute("COMMIT")
+
+    @staticmethod
+    def _row(vector_id: int, page: StoredPage) -> tuple:
+        """Insert parameters for a page; SimHash and content hash in its metadata get their own columns."""
+        metadata = dict(page.metadata)
+        simhash = metadata.pop("simhash", None)
+        content_hash = metadata.pop("content_hash", None)
+        return (vector_id, page.url, _chunk_index(page), page.title, page.content,
+                page.timestamp.isoformat(), page.embedding_dimension,
+                json.dumps(metadata, default=str), None if simhash is None else _to_signed(simhash),
+                content_hash)
+
+    @staticmethod
+    def _page(row: tuple) -> StoredPage:
+        """Page from a selected row."""
+        return StoredPage(
+            url=row[1],
+            title=row[3],
+            content=row[4],
+            timestamp=datetime.fromisoformat(row[5]),
+            embedding_dimension=row[6],
+            metadata=json.loads(row[7])
+        )
+
+    def replace_many(self, ids: Iterable[int], pages: List[StoredPage]) -> List[int]:
+        """Insert pages, replacing rows with the same (url, chunk_index).
+
+        Returns the ids of the replaced rows.
+        """
+        with self.transaction() as conn:
+            wanted: Dict[str, set] = {}
+            for page in pages:
+                wanted.setdefault(page.url, set()).add(_chunk_index(page))
+            replaced = []
+            for url, chunk_indexes in wanted.items():
+                replaced.extend(
+                    vector_id for vector_id, chunk_index in conn.execute(_IDS_FOR_URL, (url,))
+                    if chunk_index in chunk_indexes
+                )
+            conn.executemany(_DELETE_ID, ((vector_id,) for vector_id in replaced))
+            conn.executemany(_INSERT, (self._row(i, p) for i, p in zip(ids, pages)))
+            return replaced
+
+    def put_many(self, ids: Iterable[int], pages: List[StoredPage]) -> None:
+        """Insert or overwrite rows by id."""
+        with self.transaction() as conn:
+            conn.executemany(_INSERT, (self._row(i, p) for i, p in zip(ids, pages)))
+
+    def delete_ids(self, ids: Iterable[int]) -> None:
+        """Delete rows by id."""
+        with self.transaction() as conn:
+            conn.executemany(_DELETE_ID, ((int(i),) for i in ids))
+
+    def delete_url(self, url: str) -> List[int]:
+        """Delete every chunk of a page, and its fingerprint, and return their ids."""
+        with self.transaction() as conn:
+            ids = [row[0] for row in conn.execute(_IDS_FOR_URL, (url,))]
+            conn.execute(_DELETE_URL, (url,))
+            conn.execute("DELETE FROM pages WHERE url = ?", (url,))
+            return ids
+
+    def get_many(self, ids: List[int]) -> Dict[int, StoredPage]:
+        """Fetch pages by id."""
+        pages = {}
+        with self._lock:
+            for start in range(0, len(ids), _MAX_PARAMS):
+                batch = [int(i) for i in ids[start:start + _MAX_PARAMS]]
+                query = f"{_SELECT} WHERE id IN ({','.join('?' * len(batch))})"
+                for row in self.conn.execute(query, batch):
+                    pages[row[0]] = self._page(row)
+        return pages
+
+    def get(self, url: str, chunk_index: int = 0) -> Optional[Tuple[int, StoredPage]]:
+        """Fetch a chunk by (url, chunk_index)."""
+        with self._lock:
+            row = self.conn.execute(f"{_SELECT} WHERE url = ? AND chunk_index = ?",
+                                    (url, chunk_index)).fetchone()
+        return (row[0], self._page(row)) if row else None
+
+    def ids(self, start: int = 0) -> List[int]:
+        """Ids of all rows, or of rows with id >= start."""
+        with self._lock:
+            return [row[0] for row in self.conn.execute("SELECT id FROM chunks WHERE id >= ?", (start,))]
+
+    def ids_for_url(self, url: str) -> List[int]:
+        """Ids of every chunk of a page."""
+        with self._lock:
+            return [row[0] for row in self.conn.execute(_IDS_FOR_URL, (url,))]
+
+    def chunk_hashes(self, url: str) -> List[Tuple[int, int, Optional[str], str, Optional[int]]]:
+        """(id, chunk_index, content_hash, title, char_start) of every chunk of a page."""
+        with self._lock:
+            return self.conn.execute(
+                "SELECT id, chunk_index, content_hash, title, json_extract(metadata, '$.char_start') "
+                "FROM chunks WHERE url = ?", (url,)
+            ).fetchall()
+
+    def get_fingerprint(self, url: str) -> Optional[str]:
+        """Content fingerprint of a page as last indexed."""
+        with self._lock:
+            row = self.conn.execute("SELECT fingerprint FROM pages WHERE url = ?", (url,)).fetchone()
+        return row[0] if row else None
+
+    def set_fingerprint(self, url: str, fingerprint: str) -> None:
+        """Record the content fingerprint of an indexed page."""
+        with self.transaction() as conn:
+            conn.execute("INSERT OR REPLACE INTO pages (url, fingerprint, indexed_at) VALUES (?, ?, ?)",
+                         (url, fingerprint, datetime.now().isoformat()))
+
+    def delete_fingerprint(self, url: str) -> None:
+        """Forget a page's fingerprint so its next visit indexes it again."""
+        with self.transaction() as conn:
+            conn.execute("DELETE FROM pages WHERE url = ?", (url,))
+
+    def simhashes(self) -> List[Tuple[int, int]]:
+        """(id, unsigned SimHash) of every chunk that has a signature."""
+        with self._lock:
+            rows = self.conn.execute("SELECT id, simhash FROM chunks WHERE simhash IS NOT NULL").fetchall()
+        return [(vector_id, simhash & 0xFFFFFFFFFFFFFFFF) for vector_id, simhash in rows]
+
+    def ids_with_url_prefix(self, prefix: str) -> List[int]:
+        """Ids of chunks whose URL starts with prefix, via a range scan on the url index."""
+        with self._lock:
+            return [row[0] for row in self.conn.execute(
+                "SELECT id FROM chunks WHERE url >= ? AND url < ?", (prefix, prefix + "\U0010ffff")
+            )]
+
+    def filter_rows(self) -> Iterator[Tuple[int, str, str]]:
+        """(id, url, timestamp) of every chunk."""
+        with self._lock:
+            rows = self.conn.execute("SELECT id, url, timestamp FROM chunks").fetchall()
+        return iter(rows)
+
+    def count(self) -> int:
+        """Number of chunks."""
+        with self._lock:
+            return self.conn.execute("SELECT COUNT(*) FROM chunks").fetchone()[0]
+
+    def import_json(self, path: str, key_to_id: Dict[str, int]) -> int:
+        """One-time import of the old chunk_metadata.json, matched to ids by chunk key.
+
+        Existing rows win; entries whose key has no vector are skipped.
+        """
+        with open(path, "r", encoding="utf-8") as f:
+            entries = json.load(f)
+        rows = []
+        for entry in entries:
+            vector_id = key_to_id.get(f"{entry['url']}#chunk{entry['chunk_index']}")
+            if vector_id is None:
+                continue
+            metadata = dict(entry.get("metadata") or {})
+            metadata.setdefault("chunk_index", entry["chunk_index"])
+            rows.append(self._row(vector_id, StoredPage(
+                url=entry["url"],
+                title=entry.get("title", ""),
+                content=entry.get("content", ""),
+                timestamp=datetime.fromisoformat(entry["timestamp"]),
+                embedding_dimension=entry.get("embedding_dimension", 0),
+                metadata=metadata
+            )))
+        with self.transaction() as conn:
+            before = conn.total_changes
+            conn.executemany(_INSERT_IGNORE, rows)
+            imported = conn.total_changes - before
+        logger.info(f"Imported {imported} chunks from {path}")
+        return imported
+
     def clear(self) -> None:
         """Clear metadata."""
-        self.metadata = []
-        self.save()
+        with self.transaction() as conn:
+            conn.execute("DELETE FROM chunks")
+            conn.execute("DELETE FROM pages")
+
+    def close(self) -> None:
+        """Close the database."""
+        with self._lock:
+            self.conn.close()
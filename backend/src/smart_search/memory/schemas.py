@@ -17,6 +17,16 @@ class SearchResult(BaseModel):
     content: str
     score: float = Field(ge=0.0, le=1.0)
     timestamp: datetime = Field(default_factory=datetime.now)
+    chunk_index: Optional[int] = None
+    # Span of the page text the chunk was cut from
+    char_start: Optional[int] = None
+    char_end: Optional[int] = None
+
+class SearchFilter(BaseModel):
+    domain: Optional[str] = None
+    url_prefix: Optional[str] = None
+    since: Optional[datetime] = None
+    until: Optional[datetime] = None
 
 class MemoryStats(BaseModel):
     total_pages: int
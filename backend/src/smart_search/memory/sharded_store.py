@@ -0,0 +1,529 @@
+"""Vector storage split across shards."""
+import heapq
+import json
+import os
+import shutil
+import sqlite3
+import threading
+import zlib
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from datetime import datetime
+from typing import Dict, Iterator, List, Optional, Set, Tuple
+import numpy as np
+from loguru import logger
+from smart_search.core.config import get_settings
+from smart_search.memory.schemas import SearchFilter, SearchResult, StoredPage
+from smart_search.memory.vector_store import VectorStore
+from smart_search.memory.wal import atomic_write
+
+SHARD_MODES = ("none", "url", "time")
+# Global ids keep the shard-local id in the low bits and the shard number above them
+SHARD_BITS = 40
+_LOCAL_MASK = (1 << SHARD_BITS) - 1
+# Rows moved per batch when importing an unsharded store
+_IMPORT_BATCH = 10000
+
+def open_vector_store(embedding_dimension: int):
+    """VectorStore, or ShardedVectorStore when sharding is configured."""
+    if get_settings().shard_by == "none":
+        return VectorStore(embedding_dimension)
+    return ShardedVectorStore(embedding_dimension)
+
+def _split(ids: np.ndarray) -> Dict[int, np.ndarray]:
+    """Positions of global ids grouped by shard number."""
+    numbers = ids >> SHARD_BITS
+    return {int(number): np.flatnonzero(numbers == number) for number in np.unique(numbers)}
+
+def _merge(hits: List[Tuple[int, Tuple[np.ndarray, np.ndarray]]], top_k: int) -> Tuple[np.ndarray, np.ndarray]:
+    """Best top_k of per-shard (ids, scores) hit lists, with global ids."""
+    top = heapq.nlargest(top_k, (
+        (score, (number << SHARD_BITS) | vector_id)
+        for number, (ids, scores) in hits
+        for vector_id, score in zip(ids.tolist(), scores.tolist())
+    ))
+    return (np.array([vector_id for _, vector_id in top], dtype=np.int64),
+            np.array([score for score, _ in top], dtype=np.float32))
+
+class ShardedMetadata:
+    """Metadata lookups routed to the shard holding a page, with global ids."""
+
+    def __init__(self, store: "ShardedVectorStore"):
+        self.store = store
+
+    def get_fingerprint(self, url: str) -> Optional[str]:
+        """Content fingerprint of a page as last indexed."""
+        name = self.store.find_shard(url)
+        if name is None:
+            return None
+        with self.store.using([name]) as (shard,):
+            return shard.metadata_store.get_fingerprint(url)
+
+    def set_fingerprint(self, url: str, fingerprint: str) -> None:
+        """Record the content fingerprint of an indexed page in the shard holding its chunks.
+
+        A page with no stored chunks has no shard and is not fingerprinted.
+        """
+        name = self.store.find_shard(url)
+        if name is None:
+            return
+        with self.store.using([name]) as (shard,):
+            shard.metadata_store.set_fingerprint(url, fingerprint)
+
+    def delete_fingerprint(self, url: str) -> None:
+        """Forget a page's fingerprint so its next visit indexes it again."""
+        name = self.store.find_shard(url)
+        if name is None:
+            return
+        with self.store.using([name]) as (shard,):
+            shard.metadata_store.delete_fingerprint(url)
+
+    def ids_for_url(self, url: str) -> List[int]:
+        """Ids of every chunk of a page."""
+        name = self.store.find_shard(url)
+        if name is None:
+            return []
+        number = self.store.shards[name]["number"] << SHARD_BITS
+        with self.store.using([name]) as (shard,):
+            return [number | i for i in shard.metadata_store.ids_for_url(url)]
+
+    def chunk_hashes(self, url: str) -> List[tuple]:
+        """(id, chunk_index, content_hash, title, char_start) of every chunk of a page."""
+        name = self.store.find_shard(url)
+        if name is None:
+            return []
+        number = self.store.shards[name]["number"] << SHARD_BITS
+        with self.store.using([name]) as (shard,):
+            return [(number | row[0], *row[1:]) for row in shard.metadata_store.chunk_hashes(url)]
+
+    def get_many(self, ids: List[int]) -> Dict[int, StoredPage]:
+        """Fetch pages by id."""
+        ids = np.asarray(ids, dtype=np.int64)
+        pages = {}
+        for number, positions in _split(ids).items():
+            name = self.store.names.get(number)
+            if name is None:
+                continue
+            with self.store.using([name]) as (shard,):
+                found = shard.metadata_store.get_many((ids[positions] & _LOCAL_MASK).tolist())
+            pages.update({(number << SHARD_BITS) | i: page for i, page in found.items()})
+        return pages
+
+class ShardedSimHash:
+    """Near-duplicate lookups across the signatures of loaded shards."""
+
+    def __init__(self, store: "ShardedVectorStore"):
+        self.store = store
+
+    def find(self, signature: int, exclude=()) -> Optional[int]:
+        """A global id whose signature is within max_distance bits, or None."""
+        names = self.store.loaded_shards()
+        with self.store.using(names) as shards:
+            for name, shard in zip(names, shards):
+                number = self.store.shards[name]["number"]
+                local_exclude = {i & _LOCAL_MASK for i in exclude if i >> SHARD_BITS == number}
+                match = shard.simhash_index().find(signature, local_exclude)
+                if match is not None:
+                    return (number << SHARD_BITS) | match
+        return None
+
+class ShardedVectorStore:
+    """VectorStore split into shards by URL hash or by time bucket.
+
+    Each shard is a VectorStore with its own index, metadata and write-ahead
+    log under data/shards/<name>. Shards are loaded on first use and the
+    least recently used are unloaded beyond shard_max_loaded. Searches fan
+    out to the shards on a thread pool and are merged with a heap.
+    """
+
+    def __init__(self, embedding_dimension: int):
+        self.settings = get_settings()
+        if self.settings.shard_by not in SHARD_MODES[1:]:
+            raise ValueError(f"Unknown shard mode: {self.settings.shard_by} (expected one of {SHARD_MODES})")
+        self.embedding_dimension = embedding_dimension
+        self.shard_by = self.settings.shard_by
+        self.pages_dir = os.path.join(self.settings.data_dir, "shards")
+        os.makedirs(self.pages_dir, exist_ok=True)
+        self.manifest_file = os.path.join(self.pages_dir, "shards.json")
+        # Shard name -> number, live count and time range of its chunks
+        self.shards: Dict[str, dict] = {}
+        if os.path.exists(self.manifest_file):
+            with open(self.manifest_file, "r", encoding="utf-8") as f:
+                manifest = json.load(f)
+            if (manifest["shard_by"], manifest.get("shard_count")) != (self.shard_by, self._shard_count()):
+                raise ValueError(
+                    f"Shards in {self.pages_dir} were built with shard_by={manifest['shard_by']}, "
+                    f"shard_count={manifest.get('shard_count')}; resharding is not supported"
+                )
+            self.shards = manifest["shards"]
+        self.names: Dict[int, str] = {info["number"]: name for name, info in self.shards.items()}
+        # Loaded shards, least recently used first
+        self._loaded: "OrderedDict[str, VectorStore]" = OrderedDict()
+        # Operations in progress per shard; busy shards are never unloaded
+        self._busy: Dict[str, int] = {}
+        # Shards the last search or write used; kept loaded for the lookups that follow it
+        self._working: Set[str] = set()
+        self._lock = threading.RLock()
+        self._pool = ThreadPoolExecutor(max_workers=self.settings.shard_search_threads,
+                                        thread_name_prefix="shard-search")
+        self.routes: Optional[sqlite3.Connection] = None
+        if self.shard_by == "time":
+            # Pages stay in the shard of the period they were first indexed in
+            self.routes = sqlite3.connect(os.path.join(self.pages_dir, "routes.db"),
+                                          check_same_thread=False, isolation_level=None)
+            self.routes.execute("PRAGMA journal_mode=WAL")
+            self.routes.execute("CREATE TABLE IF NOT EXISTS routes (url TEXT PRIMARY KEY, shard TEXT NOT NULL)")
+        self.metadata_store = ShardedMetadata(self)
+        self._import_unsharded()
+        logger.info(f"ShardedVectorStore initialized with {len(self.shards)} {self.shard_by} shards, "
+                    f"{self.live_count} pages")
+
+    def _shard_count(self) -> Optional[int]:
+        """Fixed shard count, or None for time shards."""
+        return self.settings.shard_count if self.shard_by == "url" else None
+
+    @property
+    def live_count(self) -> int:
+        """Number of searchable vectors."""
+        with self._lock:
+            return sum(self._loaded[name].live_count if name in self._loaded else info["count"]
+                       for name, info in self.shards.items())
+
+    @property
+    def lexical(self) -> Optional[bool]:
+        """True when shards keep a BM25 index, None otherwise."""
+        return True if self.settings.lexical_index else None
+
+    def _write_manifest(self) -> None:
+        """Persist shard numbers, counts and time ranges."""
+        with self._lock:
+            for name, shard in self._loaded.items():
+                self.shards[name]["count"] = shard.live_count
+            manifest = {"shard_by": self.shard_by, "shard_count": self._shard_count(), "shards": self.shards}
+            atomic_write(self.manifest_file, json.dumps(manifest, indent=2).encode())
+
+    def find_shard(self, url: str) -> Optional[str]:
+        """Shard holding a page, or None when it was never stored."""
+        if self.shard_by == "url":
+            name = f"url-{zlib.crc32(url.encode()) % self.settings.shard_count:03d}"
+            return name if name in self.shards else None
+        with self._lock:
+            row = self.routes.execute("SELECT shard FROM routes WHERE url = ?", (url,)).fetchone()
+        return row[0] if row else None
+
+    def route(self, url: str, timestamp: datetime) -> str:
+        """Shard a page is written to, created when new."""
+        with self._lock:
+            name = self.find_shard(url)
+            if name is not None:
+                return name
+            if self.shard_by == "url":
+                name = f"url-{zlib.crc32(url.encode()) % self.settings.shard_count:03d}"
+            else:
+                name = timestamp.strftime(self.settings.shard_time_format).replace(os.sep, "-")
+                self.routes.execute("INSERT OR IGNORE INTO routes (url, shard) VALUES (?, ?)", (url, name))
+            if name not in self.shards:
+                number = len(self.shards)
+                self.shards[name] = {"number": number, "count": 0, "min_time": None, "max_time": None}
+                self.names[number] = name
+                self._write_manifest()
+                logger.info(f"Created shard {name}")
+            return name
+
+    def _shard(self, name: str) -> VectorStore:
+        """A shard's store, loaded on first use."""
+        with self._lock:
+            shard = self._loaded.get(name)
+            if shard is None:
+                shard = VectorStore(self.embedding_dimension, os.path.join(self.pages_dir, name))
+                self._loaded[name] = shard
+                logger.info(f"Loaded shard {name} ({shard.live_count} vectors)")
+            self._loaded.move_to_end(name)
+            return shard
+
+    @contextmanager
+    def using(self, names: List[str], working: bool = False) -> Iterator[List[VectorStore]]:
+        """Loaded stores of the named shards, kept loaded until the block exits.
+
+        working marks a search or write whose shards should stay loaded for
+        the result lookups that follow it.
+        """
+        with self._lock:
+            for name in names:
+                self._busy[name] = self._busy.get(name, 0) + 1
+            if working:
+                self._working = set(names)
+        try:
+            yield [self._shard(name) for name in names]
+        finally:
+            with self._lock:
+                for name in names:
+                    self._busy[name] -= 1
+                self._unload_cold(self._working | set(names))
+
+    def _unload_cold(self, keep: Set[str]) -> None:
+        """Unload least recently used idle shards beyond shard_max_loaded.
+
+        Shards in keep, those of the last search or write and of the operation
+        that just finished, stay loaded even beyond the limit; a search over
+        every shard would otherwise reload most of them on each query.
+        Unloading checkpoints a shard only if it changed since it was loaded.
+        """
+        limit = self.settings.shard_max_loaded
+        if not limit or len(self._loaded) <= limit:
+            return
+        unloaded = False
+        for name in [name for name in self._loaded if not self._busy.get(name) and name not in keep]:
+            if len(self._loaded) <= limit:
+                break
+            shard = self._loaded.pop(name)
+            self.shards[name]["count"] = shard.live_count
+            shard.close()
+            unloaded = True
+            logger.info(f"Unloaded shard {name}")
+        if unloaded:
+            self._write_manifest()
+
+    def loaded_shards(self) -> List[str]:
+        """Names of the loaded shards."""
+        with self._lock:
+            return list(self._loaded)
+
+    def _shards_for(self, search_filter: Optional[SearchFilter]) -> List[str]:
+        """Shards that may hold chunks matching a filter's time range."""
+        since = search_filter.since.timestamp() if search_filter and search_filter.since else None
+        until = search_filter.until.timestamp() if search_filter and search_filter.until else None
+        with self._lock:
+            return [
+                name for name, info in self.shards.items()
+                if info["min_time"] is not None
+                and (since is None or info["max_time"] >= since)
+                and (until is None or info["min_time"] <= until)
+            ]
+
+    def add(self, embedding: np.ndarray, page_data: StoredPage) -> int:
+        """Add or replace page."""
+        return self.add_batch(embedding.reshape(1, -1), [page_data])
+
+    def add_batch(self, embeddings: np.ndarray, pages: List[StoredPage]) -> int:
+        """Upsert chunks, one add_batch call per shard."""
+        groups: Dict[str, List[int]] = {}
+        for position, page in enumerate(pages):
+            groups.setdefault(self.route(page.url, page.timestamp), []).append(position)
+        added = 0
+        names = list(groups)
+        with self.using(names, working=True) as shards:
+            for name, shard in zip(names, shards):
+                positions = groups[name]
+                added += shard.add_batch(embeddings[positions], [pages[i] for i in positions])
+                times = [pages[i].timestamp.timestamp() for i in positions]
+                with self._lock:
+                    info = self.shards[name]
+                    info["min_time"] = min(times + ([info["min_time"]] if info["min_time"] is not None else []))
+                    info["max_time"] = max(times + ([info["max_time"]] if info["max_time"] is not None else []))
+        return added
+
+    def delete_url(self, url: str) -> int:
+        """Delete every chunk of a page."""
+        name = self.find_shard(url)
+        if name is None:
+            return 0
+        with self.using([name]) as (shard,):
+            return shard.delete_url(url)
+
+    def delete_ids(self, ids: List[int]) -> int:
+        """Delete chunks by id."""
+        ids = np.asarray(ids, dtype=np.int64)
+        deleted = 0
+        for number, positions in _split(ids).items():
+            with self.using([self.names[number]]) as (shard,):
+                deleted += shard.delete_ids((ids[positions] & _LOCAL_MASK).tolist())
+        return deleted
+
+    def clear(self) -> None:
+        """Remove every shard."""
+        with self._lock:
+            for shard in self._loaded.values():
+                shard.close()
+            self._loaded.clear()
+            for name in self.shards:
+                shutil.rmtree(os.path.join(self.pages_dir, name), ignore_errors=True)
+            self.shards.clear()
+            self.names.clear()
+            if self.routes is not None:
+                self.routes.execute("DELETE FROM routes")
+            self._write_manifest()
+        logger.info("Sharded vector store cleared")
+
+    def search_ids(self, query_embedding: np.ndarray, top_k: int = 5,
+                   ef_search: Optional[int] = None,
+                   nprobe: Optional[int] = None,
+                   allowed: Optional[Dict[str, np.ndarray]] = None) -> Tuple[np.ndarray, np.ndarray]:
+        """Nearest live ids and their scores, best first."""
+        return self.search_ids_batch(query_embedding.reshape(1, -1), top_k, ef_search, nprobe, allowed)[0]
+
+    def search_ids_batch(self, query_embeddings: np.ndarray, top_k: int = 5,
+                         ef_search: Optional[int] = None,
+                         nprobe: Optional[int] = None,
+                         allowed: Optional[Dict[str, np.ndarray]] = None) -> List[Tuple[np.ndarray, np.ndarray]]:
+        """Nearest live ids and scores for each query, searching the shards in parallel.
+
+        ``allowed`` maps shard names to filter masks from filter_mask(); shards
+        missing from it are skipped.
+        """
+        names = list(allowed) if allowed is not None else self._shards_for(None)
+        hits = self._fan_out(names, lambda name, shard: shard.search_ids_batch(
+            query_embeddings, top_k, ef_search, nprobe, None if allowed is None else allowed[name]
+        ))
+        return [_merge([(number, results[row]) for number, results in hits], top_k)
+                for row in range(len(query_embeddings))]
+
+    def lexical_search_ids(self, query: str, top_k: int = 5,
+                           allowed: Optional[Dict[str, np.ndarray]] = None) -> Tuple[np.ndarray, np.ndarray]:
+        """Top ids and BM25 scores for a text query, best first.
+
+        Each shard scores with its own term statistics.
+        """
+        names = list(allowed) if allowed is not None else self._shards_for(None)
+        hits = self._fan_out(names, lambda name, shard: shard.lexical_search_ids(
+            query, top_k, None if allowed is None else allowed[name]
+        ))
+        return _merge(hits, top_k)
+
+    def _fan_out(self, names: List[str], search) -> List[Tuple[int, object]]:
+        """(shard number, search(name, shard)) for each shard, run on the thread pool."""
+        if not names:
+            return []
+        with self.using(names, working=True) as shards:
+            if len(shards) == 1:
+                return [(self.shards[names[0]]["number"], search(names[0], shards[0]))]
+            futures = [self._pool.submit(search, name, shard) for name, shard in zip(names, shards)]
+            return [(self.shards[name]["number"], future.result()) for name, future in zip(names, futures)]
+
+    def filter_mask(self, search_filter: Optional[SearchFilter]) -> Optional[Dict[str, np.ndarray]]:
+        """Filter masks of the shards with matching chunks; None when nothing is filtered.
+
+        Shards whose time range falls outside the filter are skipped without loading.
+        """
+        if search_filter is None or not any(search_filter.model_dump().values()):
+            return None
+        names = self._shards_for(search_filter)
+        masks = {}
+        with self.using(names) as shards:
+            for name, shard in zip(names, shards):
+                mask = shard.filter_mask(search_filter)
+                if mask is not None and mask.any():
+                    masks[name] = mask
+        return masks
+
+    def simhash_index(self) -> ShardedSimHash:
+        """Near-duplicate lookups over the loaded shards."""
+        return ShardedSimHash(self)
+
+    def get_vectors(self, ids: np.ndarray) -> np.ndarray:
+        """Stored vectors for ids, as an (n, dim) matrix."""
+        ids = np.asarray(ids, dtype=np.int64)
+        vectors = np.empty((len(ids), self.embedding_dimension), dtype=np.float32)
+        for number, positions in _split(ids).items():
+            with self.using([self.names[number]]) as (shard,):
+                vectors[positions] = shard.get_vectors(ids[positions] & _LOCAL_MASK)
+        return vectors
+
+    # Result loading only needs metadata_store.get_many, which takes global ids
+    fetch = VectorStore.fetch
+    fetch_many = VectorStore.fetch_many
+
+    def search(self, query_embedding: np.ndarray, top_k: int = 5,
+               ef_search: Optional[int] = None, nprobe: Optional[int] = None) -> List[SearchResult]:
+        """Search pages; ef_search/nprobe override the HNSW/IVF defaults."""
+        ids, scores = self.search_ids(query_embedding, top_k, ef_search, nprobe)
+        return self.fetch(ids, scores)
+
+    def save(self) -> None:
+        """Persist the manifest, then each loaded shard's pending changes."""
+        try:
+            # Written first so time ranges never miss chunks a shard already logged
+            self._write_manifest()
+        except Exception as e:
+            logger.error(f"Save error: {e}")
+        for shard in list(self._loaded.values()):
+            shard.save()
+
+    def checkpoint(self) -> None:
+        """Checkpoint every loaded shard."""
+        self._write_manifest()
+        for shard in list(self._loaded.values()):
+            shard.checkpoint()
+
+    def close(self) -> None:
+        """Checkpoint and close every loaded shard."""
+        self._pool.shutdown()
+        with self._lock:
+            self._write_manifest()
+            for shard in self._loaded.values():
+                shard.close()
+            self._loaded.clear()
+            if self.routes is not None:
+                self.routes.close()
+
+    def _import_unsharded(self) -> None:
+        """Move an existing unsharded store into the shards, once.
+
+        Vectors are copied, so nothing is re-embedded. Page fingerprints are
+        not copied; pages are fingerprinted again on their next visit.
+        """
+        legacy_dir = os.path.join(self.settings.data_dir, "pages")
+        if self.shards or not os.path.exists(os.path.join(legacy_dir, "faiss_index.bin")):
+            return
+        logger.info(f"Importing unsharded store from {legacy_dir}")
+        legacy = VectorStore(self.embedding_dimension, legacy_dir)
+        ids = legacy.metadata_store.ids()
+        for start in range(0, len(ids), _IMPORT_BATCH):
+            pages = legacy.metadata_store.get_many(ids[start:start + _IMPORT_BATCH])
+            live = [i for i in pages if i not in legacy.tombstones]
+            if live:
+                self.add_batch(legacy.get_vectors(np.array(live, dtype=np.int64)), [pages[i] for i in live])
+            self.save()
+        self.checkpoint()
+        legacy.close()
+        os.replace(legacy_dir, legacy_dir + ".unsharded")
+        logger.info(f"Imported {self.live_count} chunks into {len(self.shards)} shards")
+
+    def get_stats(self) -> Dict:
+        """Get stats."""
+        with self._lock:
+            loaded = dict(self._loaded)
+            shards = {
+                name: {
+                    "vectors": loaded[name].live_count if name in loaded else info["count"],
+                    "loaded": name in loaded,
+                    "min_time": info["min_time"],
+                    "max_time": info["max_time"],
+                }
+                for name, info in self.shards.items()
+            }
+        index_files = [os.path.join(self.pages_dir, name, "faiss_index.bin") for name in shards]
+        return {
+            "total_pages": sum(shard["vectors"] for shard in shards.values()),
+            "embedding_dimension": self.embedding_dimension,
+            "index_file_size": sum(os.path.getsize(path) for path in index_files if os.path.exists(path)),
+            "shard_by": self.shard_by,
+            "loaded_shards": len(loaded),
+            "shards": shards,
+        }
+
+    def evaluate_recall(self, k: int = 10, num_queries: int = 100,
+                        ef_search: Optional[int] = None, nprobe: Optional[int] = None) -> dict:
+        """Recall@k of each shard's index against exact search, and their weighted mean."""
+        names = self._shards_for(None)
+        with self.using(names) as shards:
+            reports = {name: shard.evaluate_recall(k, num_queries, ef_search, nprobe)
+                       for name, shard in zip(names, shards)}
+        queries = sum(report["queries"] for report in reports.values())
+        return {
+            "k": k,
+            "queries": queries,
+            "recall": sum(r["recall"] * r["queries"] for r in reports.values()) / queries if queries else 1.0,
+            "shards": reports,
+        }
@@ -0,0 +1,72 @@
+"""LSH index over SimHash signatures."""
+from array import array
+from typing import Container, Dict, Iterable, List, Optional
+import numpy as np
+
+class SimHashIndex:
+    """Finds 64-bit signatures within max_distance bits of a query.
+
+    Signatures are split into max_distance + 1 bands. Two signatures that
+    differ in at most max_distance bits agree exactly on at least one band,
+    so only ids sharing a band value are compared.
+    """
+
+    def __init__(self, max_distance: int = 3):
+        self.max_distance = max_distance
+        edges = np.linspace(0, 64, max_distance + 2).astype(int).tolist()
+        self._bands = [(lo, (1 << (hi - lo)) - 1) for lo, hi in zip(edges[:-1], edges[1:])]
+        self.buckets: List[Dict[int, array]] = [{} for _ in self._bands]
+        self.signatures = array("Q")
+        # 1 for ids currently in the index
+        self.live = array("B")
+        self.count = 0
+
+    def _keys(self, signature: int) -> List[int]:
+        """Band values of a signature."""
+        return [(signature >> shift) & mask for shift, mask in self._bands]
+
+    def add(self, vector_id: int, signature: int) -> None:
+        """Index a signature under an id."""
+        if vector_id >= len(self.signatures):
+            grow = vector_id + 1 - len(self.signatures)
+            self.signatures.extend([0] * grow)
+            self.live.extend([0] * grow)
+        if self.live[vector_id]:
+            return
+        self.signatures[vector_id] = signature
+        self.live[vector_id] = 1
+        self.count += 1
+        for band, key in enumerate(self._keys(signature)):
+            self.buckets[band].setdefault(key, array("q")).append(vector_id)
+
+    def remove(self, ids: Iterable[int]) -> None:
+        """Drop ids; their bucket entries are pruned on the next lookup that meets them."""
+        for vector_id in ids:
+            if vector_id < len(self.live) and self.live[vector_id]:
+                self.live[vector_id] = 0
+                self.count -= 1
+
+    def find(self, signature: int, exclude: Container[int] = ()) -> Optional[int]:
+        """An id whose signature is within max_distance bits, or None."""
+        for band, key in enumerate(self._keys(signature)):
+            ids = self.buckets[band].get(key)
+            if not ids:
+                continue
+            dead = False
+            for vector_id in ids:
+                if not self.live[vector_id]:
+                    dead = True
+                elif (vector_id not in exclude
+                      and bin(self.signatures[vector_id] ^ signature).count("1") <= self.max_distance):
+                    return vector_id
+            if dead:
+                self.buckets[band][key] = array("q", (i for i in ids if self.live[i]))
+        return None
+
+    def clear(self) -> None:
+        """Remove every signature."""
+        self.__init__(self.max_distance)
+
+    def get_stats(self) -> dict:
+        """Index size stats."""
+        return {"signatures": self.count, "max_distance": self.max_distance}
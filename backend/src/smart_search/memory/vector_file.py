@@ -0,0 +1,214 @@
+"""Full-precision vectors kept on disk next to a quantized index."""
+import glob
+import json
+import os
+import threading
+from typing import Optional
+import numpy as np
+from loguru import logger
+from smart_search.memory.wal import atomic_write
+
+# Rows copied per read/write when rewriting the file
+_COPY_BATCH = 65536
+
+class VectorFile:
+    """float32 vectors by id in an append-only file, read through a memory map.
+
+    Rows are appended in id order, so a row is found by binary search over the
+    ids, which stay in memory (8 bytes per vector). Rewrites go to a new
+    generation of files that a small manifest switches to atomically.
+    """
+
+    def __init__(self, directory: str, dimension: int):
+        self.directory = directory
+        self.dimension = dimension
+        self.row_bytes = dimension * 4
+        self.manifest_file = os.path.join(directory, "vectors.json")
+        self.generation = 0
+        if os.path.exists(self.manifest_file):
+            with open(self.manifest_file, "r", encoding="utf-8") as f:
+                manifest = json.load(f)
+            if manifest["dimension"] != dimension:
+                raise ValueError(f"Vector file has dimension {manifest['dimension']}, expected {dimension}")
+            self.generation = manifest["generation"]
+        else:
+            self._write_manifest()
+        self._map_lock = threading.Lock()
+        self._open()
+        self._remove_stale()
+
+    def _write_manifest(self) -> None:
+        """Record the current generation."""
+        atomic_write(self.manifest_file, json.dumps(
+            {"generation": self.generation, "dimension": self.dimension}
+        ).encode())
+
+    def _paths(self, generation: int) -> tuple:
+        """Vector and id file paths of a generation."""
+        base = os.path.join(self.directory, f"vectors.{generation}")
+        return base + ".f32", base + ".ids"
+
+    def _open(self) -> None:
+        """Open the current generation, dropping a torn tail left by a crash."""
+        self.vectors_path, self.ids_path = self._paths(self.generation)
+        open(self.vectors_path, "ab").close()
+        # Not opened in append mode, where pwrite() ignores the offset on Linux
+        self._vectors_file = open(self.vectors_path, "r+b")
+        self._ids_file = open(self.ids_path, "ab")
+        ids = np.fromfile(self.ids_path, dtype="<i8")
+        rows = min(len(ids), os.path.getsize(self.vectors_path) // self.row_bytes)
+        if rows < len(ids) or rows * self.row_bytes < os.path.getsize(self.vectors_path):
+            logger.warning(f"Truncating {self.vectors_path} to {rows} complete rows")
+            self._vectors_file.truncate(rows * self.row_bytes)
+            self._ids_file.truncate(rows * 8)
+        # Grown by doubling; readers keep a reference to the array they started with
+        self._ids = np.empty(max(1024, rows), dtype=np.int64)
+        self._ids[:rows] = ids[:rows]
+        self.count = rows
+        self._map: Optional[np.ndarray] = None
+
+    def _remove_stale(self) -> None:
+        """Delete files of other generations left by an interrupted rewrite."""
+        current = set(self._paths(self.generation))
+        for path in glob.glob(os.path.join(self.directory, "vectors.*.f32")) + \
+                glob.glob(os.path.join(self.directory, "vectors.*.ids")):
+            if path not in current:
+                os.remove(path)
+
+    @property
+    def next_id(self) -> int:
+        """One past the largest stored id."""
+        return int(self._ids[self.count - 1]) + 1 if self.count else 0
+
+    def ids(self) -> np.ndarray:
+        """Stored ids, ascending."""
+        return self._ids[:self.count].copy()
+
+    def _positions(self, ids: np.ndarray) -> tuple:
+        """Row positions of ids and a mask of the ids that are stored."""
+        count = self.count
+        stored = self._ids[:count]
+        positions = np.minimum(np.searchsorted(stored, ids), max(count - 1, 0))
+        found = stored[positions] == ids if count else np.zeros(len(ids), dtype=bool)
+        return positions, found
+
+    def contains(self, ids: np.ndarray) -> np.ndarray:
+        """Mask of the ids that have a stored vector."""
+        return self._positions(np.asarray(ids, dtype=np.int64))[1]
+
+    def write(self, ids: np.ndarray, vectors: np.ndarray) -> None:
+        """Store vectors; stored ids are overwritten in place, new ids must be appended in order."""
+        ids = np.asarray(ids, dtype=np.int64)
+        vectors = np.ascontiguousarray(vectors, dtype="<f4").reshape(len(ids), self.dimension)
+        positions, found = self._positions(ids)
+        for position, vector in zip(positions[found].tolist(), vectors[found]):
+            os.pwrite(self._vectors_file.fileno(), vector.tobytes(), position * self.row_bytes)
+        new = ~found
+        if not new.any():
+            return
+        ids, vectors = ids[new], vectors[new]
+        if (self.count and ids[0] < self.next_id) or np.any(np.diff(ids) <= 0):
+            raise ValueError("New vector ids must be appended in increasing order")
+        self._vectors_file.seek(self.count * self.row_bytes)
+        self._vectors_file.write(vectors.tobytes())
+        self._ids_file.write(ids.astype("<i8").tobytes())
+        # Make rows visible to the memory map before they can be looked up
+        self._vectors_file.flush()
+        self._ids_file.flush()
+        if self.count + len(ids) > len(self._ids):
+            grown = np.empty(max(2 * len(self._ids), self.count + len(ids)), dtype=np.int64)
+            grown[:self.count] = self._ids[:self.count]
+            self._ids = grown
+        self._ids[self.count:self.count + len(ids)] = ids
+        self.count += len(ids)
+
+    def _rows(self, count: int) -> np.ndarray:
+        """Memory map covering at least the first count rows."""
+        with self._map_lock:
+            if self._map is None or len(self._map) < count:
+                self._map = np.memmap(self.vectors_path, dtype="<f4", mode="r", shape=(count, self.dimension))
+            return self._map
+
+    def read(self, ids: np.ndarray) -> np.ndarray:
+        """Vectors for ids, as an (n, dim) matrix; raises KeyError for ids without one."""
+        ids = np.asarray(ids, dtype=np.int64)
+        if len(ids) == 0:
+            return np.empty((0, self.dimension), dtype=np.float32)
+        positions, found = self._positions(ids)
+        if not found.all():
+            raise KeyError(f"No stored vector for ids {ids[~found][:10].tolist()}")
+        return np.asarray(self._rows(int(positions.max()) + 1)[positions], dtype=np.float32)
+
+    def flush(self) -> None:
+        """fsync written rows."""
+        os.fsync(self._vectors_file.fileno())
+        os.fsync(self._ids_file.fileno())
+
+    def _copy(self, ids: np.ndarray, generation: int, mode: str) -> None:
+        """Write the rows of ids into a generation's files and fsync them."""
+        vectors_path, ids_path = self._paths(generation)
+        with open(vectors_path, mode) as vectors_file, open(ids_path, mode) as ids_file:
+            for start in range(0, len(ids), _COPY_BATCH):
+                batch = ids[start:start + _COPY_BATCH]
+                vectors_file.write(self.read(batch).astype("<f4").tobytes())
+                ids_file.write(batch.astype("<i8").tobytes())
+            vectors_file.flush()
+            ids_file.flush()
+            os.fsync(vectors_file.fileno())
+            os.fsync(ids_file.fileno())
+
+    def rewrite(self, keep_ids: np.ndarray) -> int:
+        """Copy the rows of keep_ids (ascending) into the next generation; returns it.
+
+        Rows appended meanwhile are copied over by switch().
+        """
+        generation = self.generation + 1
+        self._copy(keep_ids, generation, "wb")
+        return generation
+
+    def switch(self, generation: int, since: int) -> None:
+        """Append rows with ids >= since to a rewritten generation and make it current."""
+        stored = self._ids[:self.count]
+        self._copy(stored[np.searchsorted(stored, since):], generation, "ab")
+        self._close_files()
+        self.generation = generation
+        self._write_manifest()
+        self._open()
+        self._remove_stale()
+        logger.info(f"Rewrote vector file with {self.count} vectors")
+
+    def clear(self) -> None:
+        """Remove every vector.
+
+        Switches to an empty generation rather than truncating, so memory maps
+        still held by readers stay valid.
+        """
+        self.switch(self.rewrite(np.empty(0, dtype=np.int64)), self.next_id)
+
+    def _close_files(self) -> None:
+        """Close the file handles and drop the memory map."""
+        self._vectors_file.close()
+        self._ids_file.close()
+        with self._map_lock:
+            self._map = None
+
+    def close(self) -> None:
+        """Flush and close the files."""
+        self.flush()
+        self._close_files()
+
+    def remove(self) -> None:
+        """Close and delete every file of the vector store."""
+        self._close_files()
+        for path in self._paths(self.generation) + (self.manifest_file,):
+            if os.path.exists(path):
+                os.remove(path)
+
+    @property
+    def size(self) -> int:
+        """Bytes on disk."""
+        return self.count * (self.row_bytes + 8)
+
+    def get_stats(self) -> dict:
+        """Vector file stats."""
+        return {"vectors": self.count, "file_size": self.size, "generation": self.generation}
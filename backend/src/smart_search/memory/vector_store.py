@@ -1,110 +1,815 @@
 """FAISS vector storage."""
+import itertools
+import json
 import os
-from typing import List, Dict, Optional
+import pickle
+import threading
+import time
+from datetime import datetime
+from typing import List, Dict, Optional, Set, Tuple
 import numpy as np
 import faiss
 from loguru import logger
+from smart_search.core import metrics
 from smart_search.core.config import get_settings
-from smart_search.memory.schemas import StoredPage, SearchResult
+from smart_search.memory.schemas import StoredPage, SearchResult, SearchFilter
+from smart_search.memory.metadata_store import MetadataStore
+from smart_search.memory.lexical_index import LexicalIndex
+from smart_search.memory.filter_index import FilterIndex
+from smart_search.memory.simhash_index import SimHashIndex
+from smart_search.memory.index_factory import (
+    code_size, create_index, expected_layout, index_ids, index_type_of, min_training_vectors,
+    needs_training, reconstruct_all, recall_at_k, search_parameters, storage_of
+)
+from smart_search.memory.vector_file import VectorFile
+from smart_search.memory.wal import WriteAheadLog, atomic_write, OP_ADD, OP_DELETE, OP_CLEAR
+
+# Vectors read per batch when a quantized index is built from the vector file
+_BUILD_BATCH = 65536
+# Most vectors a quantized index is trained on
+_TRAIN_SAMPLE = 100000
 
 class VectorStore:
-    """FAISS vector storage."""
-    
-    def __init__(self, embedding_dimension: int):
-        import pickle
+    """FAISS vector storage keyed by stable int64 ids."""
+
+    def __init__(self, embedding_dimension: int, pages_dir: Optional[str] = None):
         self.settings = get_settings()
         self.embedding_dimension = embedding_dimension
         # Use a new subfolder for all pages
-        self.pages_dir = os.path.join(self.settings.data_dir, "pages")
+        self.pages_dir = pages_dir or os.path.join(self.settings.data_dir, "pages")
         os.makedirs(self.pages_dir, exist_ok=True)
         self.index_file = os.path.join(self.pages_dir, "faiss_index.bin")
         self.metadata_file = os.path.join(self.pages_dir, "metadata.pkl")
-        self.index = faiss.IndexFlatIP(embedding_dimension)
-        self.metadata: List[StoredPage] = []
-        self.url_to_idx: Dict[str, int] = {}
-        self._load_or_create()
-        logger.info(f"VectorStore initialized with {len(self.metadata)} pages")
-    
-    def _load_or_create(self) -> None:
-        """Load or create index and metadata."""
-        import pickle
+        self.state_file = os.path.join(self.pages_dir, "index_state.json")
+        self.wal_file = os.path.join(self.pages_dir, "wal.log")
+        self.lexical_file = os.path.join(self.pages_dir, "bm25_index.bin")
+        # Written by older versions; imported once into the metadata store
+        self.chunk_json_file = os.path.join(self.pages_dir, "chunk_metadata.json")
+        # Log left behind by a checkpoint that did not finish
+        self.rotated_wal_file = self.wal_file + ".old"
+        self.index_type = self.settings.index_type
+        self.storage = self.settings.vector_storage
+        # Number of vectors the current IVF index was trained on (0 = untrained)
+        self.trained_on = 0
+        self.index = self._new_index()
+        # Index loaded read-only from a memory map; copied into memory on first write
+        self._mapped_index: Optional[faiss.Index] = None
+        self.metadata_store = MetadataStore(os.path.join(self.pages_dir, "chunks.db"))
+        self.lexical = LexicalIndex() if self.settings.lexical_index else None
+        # Full-precision vectors for quantized storage; kept until a migration back to full storage
+        self.vectors: Optional[VectorFile] = None
+        if self.storage != "full" or os.path.exists(os.path.join(self.pages_dir, "vectors.json")):
+            self.vectors = VectorFile(self.pages_dir, embedding_dimension)
+        # Domain and time filters, built from the metadata store on the first filtered search
+        self._filters: Optional[FilterIndex] = None
+        # Chunk SimHash signatures for near-duplicate detection, built on first use
+        self._simhashes: Optional[SimHashIndex] = None
+        self.next_id = 0
+        # Deleted ids whose vectors stay in the index until the next compaction
+        self.tombstones: Set[int] = set()
+        self._selector = None
+        self._lock = threading.RLock()
+        self._compact_lock = threading.Lock()
+        self._compaction_thread: Optional[threading.Thread] = None
+        self._checkpoint_lock = threading.Lock()
+        self._checkpoint_thread: Optional[threading.Thread] = None
+        # Mutations not yet written to the log
+        self._pending: List[tuple] = []
+        # State that is in neither the checkpoint nor the log, e.g. a compacted index
+        self._unsaved = False
+        imported = self._load_or_create()
+        self.wal = WriteAheadLog(self.wal_file)
+        if imported or os.path.exists(self.rotated_wal_file):
+            self.checkpoint()
+        logger.info(f"VectorStore initialized with {self.live_count} pages")
+
+    @property
+    def live_count(self) -> int:
+        """Number of searchable vectors."""
+        return self.index.ntotal - len(self.tombstones)
+
+    def _load_or_create(self) -> bool:
+        """Load or create index and metadata; returns whether legacy metadata was imported."""
+        imported = False
         if os.path.exists(self.index_file):
             try:
-                self.index = faiss.read_index(self.index_file)
+                self.index = self._read_index()
                 logger.info(f"Loaded index from {self.index_file}")
             except Exception as e:
                 logger.warning(f"Could not load index: {e}")
-                self.index = faiss.IndexFlatIP(self.embedding_dimension)
+                self.index = self._new_index()
+        if os.path.exists(self.state_file):
+            with open(self.state_file, "r", encoding="utf-8") as f:
+                self.trained_on = json.load(f).get("trained_on", 0)
+        if self.lexical is not None and os.path.exists(self.lexical_file):
+            try:
+                with open(self.lexical_file, "rb") as f:
+                    self.lexical = LexicalIndex.deserialize(f.read())
+            except Exception as e:
+                logger.warning(f"Could not load lexical index, rebuilding: {e}")
         if os.path.exists(self.metadata_file):
             try:
                 with open(self.metadata_file, "rb") as f:
-                    self.metadata = pickle.load(f)
-                self.url_to_idx = {page.url: i for i, page in enumerate(self.metadata)}
+                    state = pickle.load(f)
+                if isinstance(state, list):
+                    state = self._upgrade_legacy_metadata(state)
+                self.next_id = state["next_id"]
+                self.tombstones = state["tombstones"]
+                if "pages" in state:
+                    self._import_legacy(state["pages"], state["keys"])
+                    imported = True
                 logger.info(f"Loaded metadata from {self.metadata_file}")
             except Exception as e:
                 logger.warning(f"Could not load metadata: {e}")
-    
-    def add(self, url: str, embedding: np.ndarray, page_data: StoredPage) -> int:
-        """Add page."""
-        if url in self.url_to_idx:
-            logger.info(f"Updating existing URL in index: {url}")
-            idx = self.url_to_idx[url]
-            self.metadata[idx] = page_data
+        if not isinstance(faiss.downcast_index(self.index), faiss.IndexIDMap):
+            # Legacy positional index: vector i belongs to metadata entry i
+            ids, vectors = reconstruct_all(self.index)
+            self.index = self._build_index(ids, vectors)
+            self._unsaved = True
+        for path in (self.rotated_wal_file, self.wal_file):
+            self._replay(path)
+        self._reconcile()
+        self._migrate_if_needed()
+        return imported
+
+    def _read_index(self) -> faiss.Index:
+        """Read the checkpointed index, memory-mapping it when enabled.
+
+        A mapped index shares the OS page cache across workers and loads without
+        copying, but cannot be modified in place.
+        """
+        if not self.settings.index_mmap:
+            return faiss.read_index(self.index_file)
+        index = faiss.read_index(self.index_file, faiss.IO_FLAG_MMAP_IFC)
+        self._mapped_index = index
+        return index
+
+    def _writable_index(self) -> faiss.Index:
+        """Current index, copied out of its memory map before the first mutation."""
+        if self.index is self._mapped_index:
+            logger.info(f"Copying memory-mapped index ({self.index.ntotal} vectors) into memory")
+            self.index = faiss.deserialize_index(faiss.serialize_index(self.index))
+            self._mapped_index = None
+        return self.index
+
+    def _import_legacy(self, pages: Dict[int, StoredPage], keys: Dict[str, int]) -> None:
+        """Move pickled page metadata and chunk_metadata.json into the metadata store."""
+        live = set(keys.values())
+        ids = [i for i in pages if i in live]
+        with self.metadata_store.transaction():
+            self.metadata_store.put_many(ids, [pages[i] for i in ids])
+            if os.path.exists(self.chunk_json_file):
+                self.metadata_store.import_json(self.chunk_json_file, keys)
+        if os.path.exists(self.chunk_json_file):
+            os.replace(self.chunk_json_file, self.chunk_json_file + ".imported")
+        logger.info(f"Imported {len(ids)} pages into {self.metadata_store.db_path}")
+
+    def _replay(self, path: str) -> None:
+        """Re-apply logged mutations on top of the loaded checkpoint.
+
+        Replay is idempotent, so records already covered by the checkpoint are harmless.
+        """
+        existing = set(index_ids(self.index).tolist())
+        new_ids: List[int] = []
+        new_vectors: List[np.ndarray] = []
+        count = 0
+        with self.metadata_store.transaction():
+            for record in WriteAheadLog.replay(path):
+                count += 1
+                op = record[0]
+                if op == OP_ADD:
+                    vector_id, vector, page = record[1], record[2], record[-1]
+                    if vector_id not in existing:
+                        existing.add(vector_id)
+                        new_ids.append(vector_id)
+                        new_vectors.append(vector)
+                    self.metadata_store.put_many([vector_id], [page])
+                    if self.lexical is not None:
+                        self.lexical.add(vector_id, self._lexical_text(page))
+                    self.next_id = max(self.next_id, vector_id + 1)
+                elif op == OP_DELETE:
+                    self.metadata_store.delete_ids([record[1]])
+                    if self.lexical is not None:
+                        self.lexical.remove(record[1])
+                elif op == OP_CLEAR:
+                    self.index = self._new_index()
+                    if self.vectors is not None:
+                        self.vectors.clear()
+                    self.trained_on = 0
+                    existing.clear()
+                    new_ids.clear()
+                    new_vectors.clear()
+                    self.metadata_store.clear()
+                    if self.lexical is not None:
+                        self.lexical.clear()
+                    self.tombstones.clear()
+        if new_ids:
+            if self.vectors is not None:
+                # Rewrites rows a crash may have left unsynced
+                self.vectors.write(np.array(new_ids, dtype=np.int64), np.vstack(new_vectors))
+            self._writable_index().add_with_ids(np.vstack(new_vectors), np.array(new_ids, dtype=np.int64))
+        if count:
+            self._unsaved = True
+            logger.info(f"Replayed {count} log records from {path}")
+
+    @staticmethod
+    def _upgrade_legacy_metadata(pages: List[StoredPage]) -> dict:
+        """Convert the old positional metadata list to id-keyed state."""
+        keys = {}
+        for i, page in enumerate(pages):
+            chunk_index = page.metadata.get("chunk_index")
+            keys[page.url if chunk_index is None else f"{page.url}#chunk{chunk_index}"] = i
+        live = set(keys.values())
+        return {
+            "next_id": len(pages),
+            "pages": {i: page for i, page in enumerate(pages) if i in live},
+            "keys": keys,
+            "tombstones": set(range(len(pages))) - live,
+        }
+
+    def _reconcile(self) -> None:
+        """Drop ids that exist only in the index or only in the metadata store."""
+        stored_ids = set(index_ids(self.index).tolist())
+        row_ids = set(self.metadata_store.ids())
+        self.tombstones = (self.tombstones | (stored_ids - row_ids)) & stored_ids
+        orphans = row_ids - stored_ids
+        if orphans:
+            self._unsaved = True
+            logger.warning(f"Dropping {len(orphans)} metadata rows without vectors")
+            self.metadata_store.delete_ids(orphans)
+        if stored_ids:
+            self.next_id = max(self.next_id, max(stored_ids) + 1)
+        if self.lexical is not None:
+            self._reconcile_lexical(stored_ids - self.tombstones)
+        if self.vectors is not None:
+            # Rows written but never logged must not be reused by new ids
+            self.next_id = max(self.next_id, self.vectors.next_id)
+            self._fill_vector_file(np.array(sorted(stored_ids - self.tombstones), dtype=np.int64))
+
+    def _fill_vector_file(self, live_ids: np.ndarray) -> None:
+        """Copy vectors the vector file lacks out of the index, e.g. when switching to quantized storage."""
+        missing = live_ids[~self.vectors.contains(live_ids)]
+        if not len(missing):
+            return
+        if storage_of(self.index) != "full":
+            logger.warning(f"{len(missing)} vectors exist only as quantized codes; re-ranking them is approximate")
+        if missing[0] < self.vectors.next_id:
+            logger.warning("Vector file is missing rows in the middle, rebuilding it from the index")
+            self.vectors.clear()
+            missing = live_ids
+        for start in range(0, len(missing), _BUILD_BATCH):
+            batch = missing[start:start + _BUILD_BATCH]
+            self.vectors.write(batch, self.index.reconstruct_batch(batch))
+        self.vectors.flush()
+        logger.info(f"Copied {len(missing)} vectors into {self.vectors.vectors_path}")
+
+    @staticmethod
+    def _lexical_text(page: StoredPage) -> str:
+        """Text indexed for BM25."""
+        return f"{page.title} {page.content}"
+
+    def _reconcile_lexical(self, live_ids: Set[int]) -> None:
+        """Make the BM25 index cover exactly the live ids, building it on first use."""
+        indexed = set(np.flatnonzero(np.frombuffer(self.lexical.doc_lens, dtype=np.uint32)).tolist())
+        if indexed != live_ids:
+            self._unsaved = True
+        for doc_id in indexed - live_ids:
+            self.lexical.remove(doc_id)
+        missing = sorted(live_ids - indexed)
+        for start in range(0, len(missing), 10000):
+            pages = self.metadata_store.get_many(missing[start:start + 10000])
+            self.lexical.add_many((i, self._lexical_text(p)) for i, p in pages.items())
+        if missing:
+            logger.info(f"Added {len(missing)} chunks to the lexical index")
+
+    def _new_index(self, training_vectors: Optional[np.ndarray] = None) -> faiss.Index:
+        """Empty ID-mapped index; IVF and quantized types stay flat until there is enough data to train."""
+        if needs_training(self.index_type, self.storage) and (
+                training_vectors is None
+                or len(training_vectors) < min_training_vectors(self.index_type, self.storage)):
+            return faiss.IndexIDMap2(faiss.IndexFlatIP(self.embedding_dimension))
+        return faiss.IndexIDMap2(
+            create_index(self.embedding_dimension, self.index_type, training_vectors, self.storage)
+        )
+
+    def _build_index(self, ids: np.ndarray, vectors: Optional[np.ndarray] = None) -> faiss.Index:
+        """Build an index of the configured type holding the given vectors.
+
+        Without vectors they are read from the vector file in batches, so a
+        quantized index is built without loading every full vector.
+        """
+        if vectors is not None:
+            index = self._new_index(vectors)
+            index.add_with_ids(vectors, ids)
         else:
-            logger.info(f"Adding new URL to index: {url}")
-            logger.info(f"Embedding shape: {embedding.shape}, dtype: {embedding.dtype}")
-            embedding_2d = embedding.reshape(1, -1)
-            self.index.add(embedding_2d)
-            self.metadata.append(page_data)
-            idx = len(self.metadata) - 1
-            self.url_to_idx[url] = idx
-            logger.info(f"Added at index {idx}: {url}")
-            logger.info(f"Current number of vectors in FAISS index: {self.index.ntotal}")
-        return len(self.metadata)
-    
-    def search(self, query_embedding: np.ndarray, top_k: int = 5) -> List[SearchResult]:
-        """Search pages."""
-        if len(self.metadata) == 0:
-            return []
-        
-        top_k = min(top_k, len(self.metadata))
-        query_2d = query_embedding.reshape(1, -1)
-        distances, indices = self.index.search(query_2d, top_k)
-        # Flatten the results to 1D arrays
-        distances = distances[0]
-        indices = indices[0]
+            train_min = min_training_vectors(self.index_type, self.storage)
+            sample_size = max(_TRAIN_SAMPLE, train_min)
+            sample = ids
+            if len(ids) > sample_size:
+                sample = np.sort(np.random.default_rng(0).choice(ids, sample_size, replace=False))
+            index = self._new_index(self.vectors.read(sample) if len(ids) >= train_min else None)
+            for start in range(0, len(ids), _BUILD_BATCH):
+                batch = ids[start:start + _BUILD_BATCH]
+                index.add_with_ids(self.vectors.read(batch), batch)
+        layout = (index_type_of(index), storage_of(index))
+        self.trained_on = len(ids) if needs_training(*layout) else 0
+        logger.info(f"Built {layout[0]} index ({layout[1]} vectors) with {index.ntotal} vectors")
+        return index
+
+    def _migrate_if_needed(self) -> None:
+        """Rebuild a loaded index whose type or vector storage differs from the configured one."""
+        current = (index_type_of(self.index), storage_of(self.index))
+        expected = expected_layout(self.index_type, self.storage)
+        if current != expected and not (
+                needs_training(*expected) and current == ("flat", "full")
+                and self.index.ntotal < min_training_vectors(self.index_type, self.storage)):
+            logger.info(f"Migrating index from {'/'.join(current)} to {'/'.join(expected)}")
+            self.compact()
+            self._write_checkpoint(*self._snapshot())
+        if self.storage == "full" and self.vectors is not None:
+            logger.info("Removing the vector file of the previous quantized storage")
+            self.vectors.remove()
+            self.vectors = None
+
+    def _maybe_train(self) -> None:
+        """Train IVF once enough vectors exist, and retrain as the corpus grows."""
+        if not needs_training(self.index_type, self.storage):
+            return
+        threshold = min_training_vectors(self.index_type, self.storage)
+        if self.trained_on:
+            threshold = max(threshold, int(self.trained_on * self.settings.index_retrain_factor))
+        if self.index.ntotal >= threshold:
+            self._maybe_compact(force=True)
+
+    def _needs_compaction(self) -> bool:
+        """Whether enough of the index is tombstoned to be worth a rebuild."""
+        if not self.tombstones or self.index.ntotal == 0:
+            return False
+        return len(self.tombstones) / self.index.ntotal >= self.settings.compaction_threshold
+
+    def _maybe_compact(self, force: bool = False) -> None:
+        """Start a background compaction once enough of the index is tombstoned."""
+        if not force and not self._needs_compaction():
+            return
+        if self._compaction_thread is not None and self._compaction_thread.is_alive():
+            return
+        self._compaction_thread = threading.Thread(target=self._compact_in_background, daemon=True)
+        self._compaction_thread.start()
+
+    def _compact_in_background(self) -> None:
+        """Compaction thread body; repeats while deletions made meanwhile warrant it."""
+        try:
+            self.compact()
+            while self._needs_compaction():
+                self.compact()
+        except Exception as e:
+            logger.error(f"Compaction error: {e}")
+
+    def compact(self) -> None:
+        """Rebuild the index without tombstoned vectors.
+
+        The new index is built outside the store lock; vectors added and
+        deleted meanwhile are reconciled before it is swapped in.
+        """
+        with self._compact_lock, metrics.timer("store", "compact"):
+            with self._lock:
+                if self.vectors is None:
+                    ids, vectors = reconstruct_all(self.index)
+                else:
+                    # Rebuilt from the exact vectors rather than decoded codes
+                    ids, vectors = np.sort(index_ids(self.index)), None
+                dead = np.fromiter(self.tombstones, dtype=np.int64, count=len(self.tombstones))
+                cutoff = self.next_id
+            live = ~np.isin(ids, dead)
+            index = self._build_index(ids[live], None if vectors is None else vectors[live])
+            generation = None
+            if self.vectors is not None and self.storage != "full":
+                generation = self.vectors.rewrite(ids[live])
+            with self._lock:
+                added = np.array(self.metadata_store.ids(cutoff), dtype=np.int64)
+                if len(added):
+                    index.add_with_ids(self._get_vectors(added), added)
+                if generation is not None:
+                    self.vectors.switch(generation, cutoff)
+                # Deletions made during the rebuild are still in the new index
+                self.tombstones = {i for i in self.tombstones if i < cutoff} - set(dead.tolist())
+                self.index = index
+                self._selector = None
+                self._unsaved = True
+            logger.info(f"Compacted index: dropped {len(dead)} vectors, {index.ntotal} remain")
+
+    def _tombstone(self, ids: List[int]) -> None:
+        """Tombstone vectors whose metadata rows were deleted."""
+        for vector_id in ids:
+            self.tombstones.add(vector_id)
+            self._pending.append((OP_DELETE, vector_id))
+            if self.lexical is not None:
+                self.lexical.remove(vector_id)
+        if ids:
+            self._selector = None
+            if self._filters is not None:
+                self._filters.remove(ids)
+            if self._simhashes is not None:
+                self._simhashes.remove(ids)
+
+    def _tombstone_selector(self) -> Optional[faiss.IDSelector]:
+        """Selector excluding tombstoned ids (cached until tombstones change)."""
+        if not self.tombstones:
+            return None
+        if self._selector is None:
+            batch = faiss.IDSelectorBatch(
+                np.fromiter(self.tombstones, dtype=np.int64, count=len(self.tombstones))
+            )
+            # Keep the inner selector referenced alongside the negation
+            self._selector = (faiss.IDSelectorNot(batch), batch)
+        return self._selector[0]
+
+    def add(self, embedding: np.ndarray, page_data: StoredPage) -> int:
+        """Add or replace page."""
+        return self.add_batch(embedding.reshape(1, -1), [page_data])
+
+    def add_batch(self, embeddings: np.ndarray, pages: List[StoredPage]) -> int:
+        """Upsert chunks by (url, chunk_index) with a single index.add call."""
+        with self._lock:
+            ids = np.arange(self.next_id, self.next_id + len(pages), dtype=np.int64)
+            self.next_id += len(pages)
+            embeddings = np.ascontiguousarray(embeddings, dtype=np.float32)
+            replaced = self.metadata_store.replace_many(ids.tolist(), pages)
+            self._tombstone(replaced)
+            self._pending.extend(
+                (OP_ADD, vector_id, vector, page)
+                for vector_id, vector, page in zip(ids.tolist(), embeddings, pages)
+            )
+            if len(ids):
+                if self.vectors is not None:
+                    self.vectors.write(ids, embeddings)
+                self._writable_index().add_with_ids(embeddings, ids)
+            if self.lexical is not None:
+                self.lexical.add_many(
+                    (vector_id, self._lexical_text(page)) for vector_id, page in zip(ids.tolist(), pages)
+                )
+            if self._filters is not None:
+                self._filters.add_pages(ids.tolist(), pages)
+            if self._simhashes is not None:
+                for vector_id, page in zip(ids.tolist(), pages):
+                    if "simhash" in page.metadata:
+                        self._simhashes.add(vector_id, page.metadata["simhash"])
+            logger.info(f"Added {len(ids) - len(replaced)} new, replaced {len(replaced)} "
+                        f"(index has {self.index.ntotal} vectors)")
+            self._maybe_train()
+            self._maybe_compact()
+            return len(ids)
+
+    def delete_url(self, url: str) -> int:
+        """Delete every chunk of a page."""
+        with self._lock:
+            ids = self.metadata_store.delete_url(url)
+            self._tombstone(ids)
+            if ids:
+                logger.info(f"Deleted {len(ids)} vectors for {url}")
+                self._maybe_compact()
+            return len(ids)
+
+    def delete_ids(self, ids: List[int]) -> int:
+        """Delete chunks by id."""
+        with self._lock:
+            self.metadata_store.delete_ids(ids)
+            self._tombstone(list(ids))
+            if ids:
+                self._maybe_compact()
+            return len(ids)
+
+    def clear(self) -> None:
+        """Remove every vector and page."""
+        with self._compact_lock, self._lock:
+            self.index = self._new_index()
+            if self.vectors is not None:
+                self.vectors.clear()
+            self.trained_on = 0
+            self.metadata_store.clear()
+            if self.lexical is not None:
+                self.lexical.clear()
+            self.tombstones.clear()
+            self._selector = None
+            self._filters = None
+            self._simhashes = None
+            self._pending.append((OP_CLEAR,))
+        self.checkpoint()
+        logger.info("Vector store cleared")
+
+    def search_ids(self, query_embedding: np.ndarray, top_k: int = 5,
+                   ef_search: Optional[int] = None,
+                   nprobe: Optional[int] = None,
+                   allowed: Optional[np.ndarray] = None) -> Tuple[np.ndarray, np.ndarray]:
+        """Nearest live ids and their scores, best first."""
+        return self.search_ids_batch(query_embedding.reshape(1, -1), top_k, ef_search, nprobe, allowed)[0]
+
+    def search_ids_batch(self, query_embeddings: np.ndarray, top_k: int = 5,
+                         ef_search: Optional[int] = None,
+                         nprobe: Optional[int] = None,
+                         allowed: Optional[np.ndarray] = None) -> List[Tuple[np.ndarray, np.ndarray]]:
+        """Nearest live ids and scores for each row of an (n, dim) query matrix, in one search.
+
+        ``allowed`` is a filter mask from filter_mask(); it is applied inside the
+        index search, or by exact scoring when few ids match.
+        """
+        empty = np.empty(0, dtype=np.int64), np.empty(0, dtype=np.float32)
+        with self._lock:
+            if allowed is not None:
+                allowed_ids = np.flatnonzero(allowed)
+                if len(allowed_ids) <= self.settings.filter_exact_max:
+                    return self._search_subset(query_embeddings, allowed_ids, top_k)
+                top_k = min(top_k, len(allowed_ids))
+                bitmap = np.packbits(allowed, bitorder="little")
+                selector = faiss.IDSelectorBitmap(len(bitmap), faiss.swig_ptr(bitmap))
+                # A selective filter leaves fewer matches per visited node; widen the HNSW beam to match
+                selectivity = len(allowed_ids) / max(1, self.live_count)
+                ef_search = min(self.settings.filter_max_ef_search,
+                                int((ef_search or self.settings.hnsw_ef_search) / selectivity))
+                candidates = len(allowed_ids)
+            else:
+                top_k = min(top_k, self.live_count)
+                selector = self._tombstone_selector()
+                candidates = self.live_count
+            if top_k <= 0:
+                return [empty] * len(query_embeddings)
+            rerank = self._reranks()
+            if rerank:
+                candidates = min(candidates, top_k * self.settings.quantized_rerank_factor)
+            params = search_parameters(self.index, ef_search, nprobe, selector)
+            distances, indices = self.index.search(query_embeddings, candidates if rerank else top_k,
+                                                   params=params)
+            if rerank:
+                return self._rerank(query_embeddings, indices, top_k)
+        found = indices >= 0
+        return [(ids[mask], scores[mask]) for ids, scores, mask in zip(indices, distances, found)]
+
+    def _reranks(self) -> bool:
+        """Whether index results are re-ranked against the vector file."""
+        return self.vectors is not None and storage_of(self.index) != "full"
+
+    def _rerank(self, query_embeddings: np.ndarray, candidates: np.ndarray,
+                top_k: int) -> List[Tuple[np.ndarray, np.ndarray]]:
+        """Exact top_k of each query's index candidates, scored against the full-precision vectors."""
+        unique = np.unique(candidates[candidates >= 0])
+        vectors = self.vectors.read(unique)
+        results = []
+        for query, row in zip(query_embeddings, candidates):
+            ids = row[row >= 0]
+            scores = vectors[np.searchsorted(unique, ids)] @ query
+            order = np.argsort(-scores, kind="stable")[:top_k]
+            results.append((ids[order], scores[order]))
+        return results
+
+    def _search_subset(self, query_embeddings: np.ndarray, ids: np.ndarray,
+                       top_k: int) -> List[Tuple[np.ndarray, np.ndarray]]:
+        """Exact inner-product search over the given ids only."""
+        top_k = min(top_k, len(ids))
+        if top_k <= 0:
+            return [(np.empty(0, dtype=np.int64), np.empty(0, dtype=np.float32))] * len(query_embeddings)
+        scores = query_embeddings @ self._get_vectors(ids).T
+        top = np.argpartition(-scores, top_k - 1, axis=1)[:, :top_k]
+        top = np.take_along_axis(top, np.argsort(-np.take_along_axis(scores, top, axis=1), axis=1), axis=1)
+        return [(ids[row], scores[i, row]) for i, row in enumerate(top)]
+
+    def filter_mask(self, search_filter: Optional[SearchFilter]) -> Optional[np.ndarray]:
+        """Mask over ids of live chunks matching a filter; None when nothing is filtered."""
+        if search_filter is None or not any(search_filter.model_dump().values()):
+            return None
+        with self._lock:
+            if self._filters is None:
+                self._filters = FilterIndex()
+                rows = self.metadata_store.filter_rows()
+                for batch in iter(lambda: list(itertools.islice(rows, 10000)), []):
+                    ids, urls, timestamps = zip(*batch)
+                    self._filters.add(ids, urls, (datetime.fromisoformat(t).timestamp() for t in timestamps))
+                logger.info(f"Built filter index over {len(self._filters.domains)} domains")
+            prefix_ids = None
+            if search_filter.url_prefix:
+                prefix_ids = self.metadata_store.ids_with_url_prefix(search_filter.url_prefix)
+            return self._filters.mask(search_filter, self.next_id, prefix_ids)
+
+    def simhash_index(self) -> SimHashIndex:
+        """SimHash signatures of stored chunks, loaded from the metadata store on first use."""
+        with self._lock:
+            if self._simhashes is None:
+                self._simhashes = SimHashIndex(self.settings.dedup_max_distance)
+                for vector_id, signature in self.metadata_store.simhashes():
+                    self._simhashes.add(vector_id, signature)
+                logger.info(f"Loaded {self._simhashes.count} chunk signatures")
+            return self._simhashes
+
+    def lexical_search_ids(self, query: str, top_k: int = 5,
+                           allowed: Optional[np.ndarray] = None) -> Tuple[np.ndarray, np.ndarray]:
+        """Top ids and BM25 scores for a text query, best first."""
+        if self.lexical is None:
+            return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.float32)
+        with self._lock:
+            return self.lexical.search(query, top_k, allowed)
+
+    def fetch(self, ids: np.ndarray, scores: np.ndarray) -> List[SearchResult]:
+        """Load metadata rows for search hits."""
+        return self.fetch_many([(ids, scores)])[0][1]
+
+    def fetch_many(self, rankings: List[Tuple[np.ndarray, np.ndarray]]) -> List[Tuple[np.ndarray, List[SearchResult]]]:
+        """Load metadata rows for several hit lists with one lookup.
+
+        Returns, per list, the ids that still have metadata and their results.
+        """
+        all_ids = np.unique(np.concatenate([ids for ids, _ in rankings])) if rankings else []
+        pages = self.metadata_store.get_many(list(map(int, all_ids)))
         results = []
-        for idx, distance in zip(indices, distances):
-            if 0 <= idx < len(self.metadata):
-                page = self.metadata[idx]
-                score = float(max(0, min(distance, 1.0)))
-                results.append(SearchResult(
+        for ids, scores in rankings:
+            found, hits = [], []
+            for idx, score in zip(ids.tolist(), np.clip(scores, 0.0, 1.0).tolist()):
+                page = pages.get(idx)
+                if page is None:
+                    continue
+                found.append(idx)
+                hits.append(SearchResult(
                     url=page.url, title=page.title,
                     content=page.content, score=score,
-                    timestamp=page.timestamp
+                    timestamp=page.timestamp,
+                    chunk_index=page.metadata.get("chunk_index"),
+                    char_start=page.metadata.get("char_start"),
+                    char_end=page.metadata.get("char_end")
                 ))
+            results.append((np.array(found, dtype=np.int64), hits))
         return results
-    
+
+    def _get_vectors(self, ids: np.ndarray) -> np.ndarray:
+        """Stored vectors for ids, exact when the vector file holds them."""
+        if self.vectors is not None:
+            return self.vectors.read(ids)
+        return self.index.reconstruct_batch(np.asarray(ids, dtype=np.int64))
+
+    def get_vectors(self, ids: np.ndarray) -> np.ndarray:
+        """Stored vectors for ids, as an (n, dim) matrix."""
+        with self._lock:
+            return self._get_vectors(ids)
+
+    def search(self, query_embedding: np.ndarray, top_k: int = 5,
+               ef_search: Optional[int] = None, nprobe: Optional[int] = None) -> List[SearchResult]:
+        """Search pages; ef_search/nprobe override the HNSW/IVF defaults."""
+        ids, scores = self.search_ids(query_embedding, top_k, ef_search, nprobe)
+        return self.fetch(ids, scores)
+
     def save(self) -> None:
-        """Save index and metadata."""
-        import pickle
+        """Append pending changes to the write-ahead log; checkpoint once the log is large."""
         try:
-            logger.info(f"Saving FAISS index to: {self.index_file}")
-            logger.info(f"Number of vectors in index: {self.index.ntotal}")
-            faiss.write_index(self.index, self.index_file)
-            logger.info(f"Saved index at {self.index_file}")
-            with open(self.metadata_file, "wb") as f:
-                pickle.dump(self.metadata, f)
-            logger.info(f"Saved metadata at {self.metadata_file}")
+            with self._lock:
+                self.wal.append(self._pending)
+                self._pending = []
+                due = self.wal.size >= self.settings.wal_checkpoint_mb * 1024 * 1024
+            if due and (self._checkpoint_thread is None or not self._checkpoint_thread.is_alive()):
+                self._checkpoint_thread = threading.Thread(target=self._checkpoint_in_background,
+                                                           daemon=True)
+                self._checkpoint_thread.start()
         except Exception as e:
             logger.error(f"Save error: {e}")
-    
+
+    def _checkpoint_in_background(self) -> None:
+        """Checkpoint thread body."""
+        try:
+            self.checkpoint()
+        except Exception as e:
+            logger.error(f"Checkpoint error: {e}")
+
+    def _snapshot(self) -> tuple:
+        """Serialize index, metadata and state in memory."""
+        index_bytes = faiss.serialize_index(self.index)
+        # Page metadata lives in the metadata store, which commits on its own
+        metadata_bytes = pickle.dumps({
+            "next_id": self.next_id,
+            "tombstones": self.tombstones,
+        }, protocol=pickle.HIGHEST_PROTOCOL)
+        state_bytes = json.dumps(
+            {"index_type": index_type_of(self.index), "trained_on": self.trained_on}
+        ).encode()
+        lexical_bytes = self.lexical.serialize() if self.lexical is not None else None
+        return index_bytes, metadata_bytes, state_bytes, lexical_bytes
+
+    def _write_checkpoint(self, index_bytes, metadata_bytes, state_bytes, lexical_bytes) -> None:
+        """Write snapshot files through atomic renames."""
+        atomic_write(self.index_file, index_bytes)
+        atomic_write(self.metadata_file, metadata_bytes)
+        atomic_write(self.state_file, state_bytes)
+        if lexical_bytes is not None:
+            atomic_write(self.lexical_file, lexical_bytes)
+
+    def checkpoint(self) -> None:
+        """Snapshot index and metadata, then drop the log records they cover.
+
+        The snapshot is taken under the lock; files are written outside it while
+        new mutations go to a fresh log.
+        """
+        with self._checkpoint_lock, metrics.timer("store", "checkpoint"):
+            with self._lock:
+                self.wal.append(self._pending)
+                self._pending = []
+                snapshot = self._snapshot()
+                self._unsaved = False
+                self.wal.rotate(self.rotated_wal_file)
+                if self.vectors is not None:
+                    # The checkpointed index must not reference rows lost in a crash
+                    self.vectors.flush()
+            logger.info(f"Checkpointing {self.index.ntotal} vectors to {self.pages_dir}")
+            self._write_checkpoint(*snapshot)
+            os.remove(self.rotated_wal_file)
+            logger.info(f"Saved checkpoint at {self.index_file}")
+
+    @property
+    def needs_checkpoint(self) -> bool:
+        """Whether the files on disk are behind the in-memory state, so closing must checkpoint."""
+        with self._lock:
+            return bool(self._pending) or self.wal.size > 0 or self._unsaved
+
+    def close(self) -> None:
+        """Checkpoint if anything changed since the last checkpoint, and close the log."""
+        for thread in (self._compaction_thread, self._checkpoint_thread):
+            if thread is not None:
+                thread.join()
+        if self.needs_checkpoint:
+            self.checkpoint()
+        self.wal.close()
+        if self.vectors is not None:
+            self.vectors.close()
+        self.metadata_store.close()
+
     def get_stats(self) -> Dict:
         """Get stats."""
         index_size = os.path.getsize(self.index_file) if os.path.exists(self.index_file) else 0
         return {
-            "total_pages": len(self.metadata),
+            "total_pages": self.live_count,
             "embedding_dimension": self.embedding_dimension,
             "index_file_size": index_size,
+            "index_type": index_type_of(self.index),
+            "configured_index_type": self.index_type,
+            "vector_storage": storage_of(self.index),
+            "configured_vector_storage": self.storage,
+            "vector_code_bytes": self.index.ntotal * code_size(self.index),
+            "vector_file": self.vectors.get_stats() if self.vectors is not None else {},
+            "num_vectors": self.index.ntotal,
+            "index_mmapped": self.index is self._mapped_index,
+            "tombstones": len(self.tombstones),
+            "wal_size": self.wal.size,
+            "lexical": self.lexical.get_stats() if self.lexical is not None else {},
+        }
+
+    def evaluate_recall(self, k: int = 10, num_queries: int = 100,
+                        ef_search: Optional[int] = None, nprobe: Optional[int] = None) -> dict:
+        """Recall@k of the current index against exact search.
+
+        With quantized storage the exact search runs over the vector file, and
+        recall is reported for the index alone and after re-ranking.
+        """
+        with self._lock:
+            if self._reranks():
+                return self._rerank_recall(k, num_queries, ef_search, nprobe)
+            dead = np.fromiter(self.tombstones, dtype=np.int64, count=len(self.tombstones))
+            index = self.index
+        return recall_at_k(index, k, num_queries, ef_search, nprobe, dead, self._lock)
+
+    def _rerank_recall(self, k: int, num_queries: int, ef_search: Optional[int],
+                       nprobe: Optional[int]) -> dict:
+        """Recall@k and latency of a quantized index with and without re-ranking."""
+        dead = np.fromiter(self.tombstones, dtype=np.int64, count=len(self.tombstones))
+        ids = np.setdiff1d(index_ids(self.index), dead)
+        k = min(k, len(ids))
+        rng = np.random.default_rng(0)
+        queries = self.vectors.read(np.sort(rng.choice(ids, min(num_queries, len(ids)), replace=False)))
+        report = {"index_type": index_type_of(self.index), "vector_storage": storage_of(self.index),
+                  "k": k, "queries": len(queries), "rerank_factor": self.settings.quantized_rerank_factor}
+        if k == 0:
+            return {**report, "recall": 1.0}
+
+        start = time.time()
+        best_ids = np.empty((len(queries), 0), dtype=np.int64)
+        best_scores = np.empty((len(queries), 0), dtype=np.float32)
+        for offset in range(0, len(ids), _BUILD_BATCH):
+            batch = ids[offset:offset + _BUILD_BATCH]
+            best_ids = np.hstack([best_ids, np.broadcast_to(batch, (len(queries), len(batch)))])
+            best_scores = np.hstack([best_scores, queries @ self.vectors.read(batch).T])
+            top = np.argpartition(-best_scores, min(k, best_scores.shape[1] - 1), axis=1)[:, :k]
+            best_ids = np.take_along_axis(best_ids, top, axis=1)
+            best_scores = np.take_along_axis(best_scores, top, axis=1)
+        exact_ms = (time.time() - start) * 1000
+        start = time.time()
+        params = search_parameters(self.index, ef_search, nprobe, self._tombstone_selector())
+        _, found = self.index.search(queries, k, params=params)
+        ann_ms = (time.time() - start) * 1000
+        start = time.time()
+        reranked = self.search_ids_batch(queries, k, ef_search, nprobe)
+        rerank_ms = (time.time() - start) * 1000
+
+        def recall(results) -> float:
+            hits = sum(len(set(e.tolist()) & set(f.tolist())) for e, f in zip(best_ids, results))
+            return hits / (len(queries) * k)
+        return {
+            **report,
+            "recall": recall([hit_ids for hit_ids, _ in reranked]),
+            "index_recall": recall(found),
+            "ann_ms_per_query": ann_ms / len(queries),
+            "rerank_ms_per_query": rerank_ms / len(queries),
+            "exact_ms_per_query": exact_ms / len(queries),
         }
-    
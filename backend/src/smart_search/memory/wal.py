@@ -0,0 +1,102 @@
+"""Write-ahead log for vector store mutations."""
+import os
+import pickle
+import struct
+import zlib
+from typing import Iterator, List, Tuple
+from loguru import logger
+
+# Record ops
+OP_ADD = 1
+OP_DELETE = 2
+OP_CLEAR = 3
+
+# Each record is framed as (payload length, crc32 of payload)
+_HEADER = struct.Struct("<II")
+
+class WriteAheadLog:
+    """Append-only log of (op, id, vector, metadata) records, fsync'd per batch."""
+
+    def __init__(self, path: str):
+        self.path = path
+        valid_length = 0
+        for _, valid_length in self._scan(path):
+            pass
+        self._file = open(self.path, "ab")
+        if self._file.tell() > valid_length:
+            # Drop a torn tail so new records are not appended after garbage
+            self._file.truncate(valid_length)
+            self._file.seek(valid_length)
+
+    @property
+    def size(self) -> int:
+        """Current log size in bytes."""
+        return self._file.tell()
+
+    def append(self, records: List[Tuple]) -> None:
+        """Append records and fsync once for the whole batch."""
+        if not records:
+            return
+        buffer = bytearray()
+        for record in records:
+            payload = pickle.dumps(record, protocol=pickle.HIGHEST_PROTOCOL)
+            buffer += _HEADER.pack(len(payload), zlib.crc32(payload))
+            buffer += payload
+        self._file.write(buffer)
+        self._file.flush()
+        os.fsync(self._file.fileno())
+
+    def rotate(self, rotated_path: str) -> None:
+        """Move the current log aside and start an empty one."""
+        self._file.close()
+        os.replace(self.path, rotated_path)
+        self._file = open(self.path, "ab")
+        _fsync_dir(os.path.dirname(self.path))
+
+    def close(self) -> None:
+        """Close the log file."""
+        self._file.close()
+
+    @staticmethod
+    def replay(path: str) -> Iterator[Tuple]:
+        """Yield records from a log file, stopping at a torn or corrupt tail."""
+        for record, _ in WriteAheadLog._scan(path):
+            yield record
+
+    @staticmethod
+    def _scan(path: str) -> Iterator[Tuple[Tuple, int]]:
+        """Yield (record, end offset) for every intact record."""
+        if not os.path.exists(path):
+            return
+        with open(path, "rb") as f:
+            while True:
+                header = f.read(_HEADER.size)
+                if not header:
+                    return
+                if len(header) < _HEADER.size:
+                    logger.warning(f"Ignoring torn record at end of {path}")
+                    return
+                length, crc = _HEADER.unpack(header)
+                payload = f.read(length)
+                if len(payload) < length or zlib.crc32(payload) != crc:
+                    logger.warning(f"Ignoring corrupt record at end of {path}")
+                    return
+                yield pickle.loads(payload), f.tell()
+
+def _fsync_dir(path: str) -> None:
+    """fsync a directory so renames inside it are durable."""
+    fd = os.open(path or ".", os.O_RDONLY)
+    try:
+        os.fsync(fd)
+    finally:
+        os.close(fd)
+
+def atomic_write(path: str, data: bytes) -> None:
+    """Write a file through a temp file, fsync and rename."""
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "wb") as f:
+        f.write(data)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_path, path)
+    _fsync_dir(os.path.dirname(path))
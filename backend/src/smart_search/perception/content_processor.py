@@ -2,10 +2,34 @@
 import re
 import time
 from datetime import datetime
-from typing import Tuple
+from bisect import bisect_right
+from typing import Iterable, Iterator, List, Tuple
 from loguru import logger
 from smart_search.core.config import get_settings
-from smart_search.perception.schemas import ProcessedContent
+from smart_search.perception.schemas import Chunk, ChunkStrategy
+
+# One pass over the page. Every match starts with a character from a small set so
+# the scan can skip ahead; the lookbehind then checks which kind of match it is:
+# a run of spaces, a link, the "@" of an email address, a run of !/?, or control characters
+_CLEAN_RE = re.compile(
+    r'[ hw@!?\x00-\x1f\x7f-\x9f]'
+    r'(?:(?<= )(?P<spaces> +)'
+    r'|(?<=h)ttp\S+|(?<=w)ww\S+'
+    r'|(?<=@)(?P<email>(?=\S))'
+    r'|(?<=[!?])(?P<bang>[!?]+)'
+    r'|(?<=[\x00-\x1f\x7f-\x9f])(?P<control>[\x00-\x1f\x7f-\x9f]*))'
+)
+_TOKEN_END = re.compile(r'\S*')
+_WHITESPACE_RE = re.compile(r'\s')
+# Sentence ends: terminal punctuation followed by whitespace, or a line break
+_SENTENCE_BREAK_RE = re.compile(r'(?<=[.!?])\s+|\s*\n\s*')
+_LINE_BREAK_RE = re.compile(r'\s*\n\s*')
+# Paragraphs are separated by blank lines
+_PARAGRAPH_BREAK_RE = re.compile(r'\s*\n[^\S\n]*\n\s*')
+# Approximate model tokens: words and single punctuation marks
+_WORD_RE = re.compile(r'\w+|[^\w\s]')
+# Short lines without closing punctuation are treated as headings
+_HEADING_MAX_LENGTH = 80
 
 class ContentProcessor:
     """Processes content."""
@@ -15,66 +39,253 @@ class ContentProcessor:
         # Set chunk size and overlap, fallback to defaults if not present in settings
         self.chunk_size = getattr(self.settings, 'chunk_size', 256)
         self.chunk_overlap = getattr(self.settings, 'chunk_overlap', 40)
+        self.strategy = ChunkStrategy(self.settings.chunk_strategy)
+        self._chunkers = {
+            ChunkStrategy.FIXED: self._fixed_chunks,
+            ChunkStrategy.SENTENCE: self._sentence_chunks,
+            ChunkStrategy.TOKEN: self._token_chunks,
+            ChunkStrategy.PARAGRAPH: self._paragraph_chunks,
+        }
     
     def process(self, url: str, title: str, content: str, metadata: dict = None) -> Tuple:
         """Process content and split into overlapping chunks."""
         start_time = time.time()
+        chunks = list(self.iter_chunks(url, title, content, metadata))
+        processing_time = (time.time() - start_time) * 1000
+        return chunks, processing_time
+    
+    def iter_chunks(self, url: str, title: str, content: str, metadata: dict = None) -> Iterator[Chunk]:
+        """Yield chunks of the cleaned content as they are cut, using the configured strategy.
+
+        Chunk metadata records char_start and char_end, the span of content
+        the chunk was cut from.
+        """
+        timestamp = datetime.now()
         original_length = len(content)
-        cleaned = self._clean_content(content)
-        normalized = self._normalize_whitespace(cleaned)
-        chunk_size = self.chunk_size
-        overlap = self.chunk_overlap
-        chunks = []
-        i = 0
-        start = 0
-        while start < len(normalized):
-            end = min(start + chunk_size, len(normalized))
-            chunk_text = normalized[start:end]
-            quality_score = self._calculate_quality_score(content, chunk_text)
+        for i, (chunk_text, start, end) in enumerate(self._chunkers[self.strategy](content)):
             chunk_metadata = dict(metadata or {})
             chunk_metadata['chunk_index'] = i
-            processed = ProcessedContent(
-                url=url,
-                title=title,
-                content=chunk_text,
-                original_length=original_length,
-                processed_length=len(chunk_text),
-                extraction_quality=quality_score,
-                metadata=chunk_metadata,
-                timestamp=datetime.now()
-            )
-            chunks.append(processed)
-            i += 1
-            start += chunk_size - overlap
-        processing_time = (time.time() - start_time) * 1000
-        return chunks, processing_time
+            chunk_metadata['char_start'] = start
+            chunk_metadata['char_end'] = end
+            yield Chunk(url, title, chunk_text, original_length, chunk_metadata, timestamp)
+    
+    def _fixed_chunks(self, content: str) -> Iterator[Tuple[str, int, int]]:
+        """chunk_size character windows of the cleaned content, chunk_overlap apart."""
+        return self._windows(self._clean(content), self.chunk_size, self.chunk_overlap)
+    
+    def _sentence_chunks(self, content: str) -> Iterator[Tuple[str, int, int]]:
+        """Whole sentences packed up to chunk_size, repeating trailing sentences up to chunk_overlap."""
+        units = ((text, start, end, False) for text, start, end in self._sentences(content, 0, len(content)))
+        return self._pack(units, self.chunk_overlap)
+    
+    def _token_chunks(self, content: str) -> Iterator[Tuple[str, int, int]]:
+        """Windows of chunk_tokens tokens, chunk_token_overlap apart."""
+        size = self.settings.chunk_tokens
+        step = max(size - self.settings.chunk_token_overlap, 1)
+        window: List[Tuple[int, int]] = []
+        fresh = 0
+        for match in _WORD_RE.finditer(content):
+            window.append(match.span())
+            fresh += 1
+            if len(window) == size:
+                text = self._clean_text(content, window[0][0], window[-1][1])
+                if text:
+                    yield text, window[0][0], window[-1][1]
+                del window[:step]
+                fresh = 0
+        if fresh:
+            text = self._clean_text(content, window[0][0], window[-1][1])
+            if text:
+                yield text, window[0][0], window[-1][1]
+    
+    def _paragraph_chunks(self, content: str) -> Iterator[Tuple[str, int, int]]:
+        """Whole paragraphs packed up to chunk_size; a heading after body text starts a new chunk.
+
+        Paragraphs longer than chunk_size are split into sentences.
+        """
+        def units() -> Iterator[Tuple[str, int, int, bool]]:
+            for paragraph_start, paragraph_end in self._spans(content, _PARAGRAPH_BREAK_RE, 0, len(content)):
+                block: List[Tuple[str, int, int]] = []
+                for line_start, line_end in self._spans(content, _LINE_BREAK_RE, paragraph_start, paragraph_end):
+                    text = self._clean_text(content, line_start, line_end)
+                    if not text:
+                        continue
+                    if len(text) <= min(_HEADING_MAX_LENGTH, self.chunk_size) and text[-1] not in '.!?,;:':
+                        yield from self._block(content, block)
+                        block = []
+                        yield text, line_start, line_end, True
+                    else:
+                        block.append((text, line_start, line_end))
+                yield from self._block(content, block)
+        return self._pack(units(), 0)
+    
+    def _block(self, content: str, lines: List[Tuple[str, int, int]]) -> Iterator[Tuple[str, int, int, bool]]:
+        """Consecutive body lines as one unit, or as sentences if longer than chunk_size."""
+        if not lines:
+            return
+        text = ' '.join(line for line, _, _ in lines)
+        start, end = lines[0][1], lines[-1][2]
+        if len(text) <= self.chunk_size:
+            yield text, start, end, False
+        else:
+            for text, start, end in self._sentences(content, start, end):
+                yield text, start, end, False
+    
+    def _sentences(self, content: str, start: int, end: int) -> Iterator[Tuple[str, int, int]]:
+        """Cleaned sentences of content[start:end]; sentences over chunk_size are cut into windows."""
+        for sentence_start, sentence_end in self._spans(content, _SENTENCE_BREAK_RE, start, end):
+            text = self._clean_text(content, sentence_start, sentence_end)
+            if len(text) <= self.chunk_size:
+                if text:
+                    yield text, sentence_start, sentence_end
+            else:
+                yield from self._windows(self._clean(content, sentence_start, sentence_end),
+                                         self.chunk_size, self.chunk_overlap)
+    
+    def _pack(self, units: Iterable[Tuple[str, int, int, bool]], overlap: int) -> Iterator[Tuple[str, int, int]]:
+        """Join consecutive units into chunks of up to chunk_size characters.
+
+        Units are (text, start, end, heading). A heading that follows body text
+        starts a new chunk. Trailing units of up to overlap characters are
+        repeated at the start of the next chunk.
+        """
+        current: List[Tuple[str, int, int]] = []
+        length = 0
+        body = False
+        for text, start, end, heading in units:
+            if current and (length + 1 + len(text) > self.chunk_size or (heading and body)):
+                yield ' '.join(unit for unit, _, _ in current), current[0][1], current[-1][2]
+                carried: List[Tuple[str, int, int]] = []
+                carried_length = -1
+                if not heading:
+                    for unit in reversed(current):
+                        if carried_length + 1 + len(unit[0]) > overlap:
+                            break
+                        carried.insert(0, unit)
+                        carried_length += 1 + len(unit[0])
+                    if carried_length + 1 + len(text) > self.chunk_size:
+                        carried, carried_length = [], -1
+                current, length, body = carried, max(carried_length, 0), bool(carried)
+            current.append((text, start, end))
+            length += len(text) + (1 if len(current) > 1 else 0)
+            body = body or not heading
+        if current:
+            yield ' '.join(unit for unit, _, _ in current), current[0][1], current[-1][2]
     
     @staticmethod
-    def _clean_content(content: str) -> str:
-        """Clean content."""
-        content = re.sub(r'http\S+|www\S+', '', content)
-        content = re.sub(r'\S+@\S+', '', content)
-        content = re.sub(r'[!?]{2,}', '!', content)
-        content = re.sub(r'[\x00-\x1f\x7f-\x9f]', '', content)
-        return content
+    def _spans(content: str, pattern: re.Pattern, start: int, end: int) -> Iterator[Tuple[int, int]]:
+        """Non-empty spans of content[start:end] between matches of pattern."""
+        position = start
+        for match in pattern.finditer(content, start, end):
+            if match.start() > position:
+                yield position, match.start()
+            position = match.end()
+        if position < end:
+            yield position, end
+    
+    def _clean_text(self, content: str, start: int, end: int) -> str:
+        """Cleaned content[start:end]."""
+        if _CLEAN_RE.search(content, start, end) is None:
+            return content[start:end].strip()
+        return ''.join(piece for piece, _, _ in self._clean(content, start, end)).strip()
     
     @staticmethod
-    def _normalize_whitespace(content: str) -> str:
-        """Normalize whitespace."""
-        content = re.sub(r'\n{2,}', '\n', content)
-        content = re.sub(r' {2,}', ' ', content)
-        content = content.replace('\t', ' ')
-        return content.strip()
+    def _clean(content: str, start: int = 0, end: int = None) -> Iterator[Tuple[str, int, int]]:
+        """Yield content[start:end] with links, emails and control characters removed and spaces collapsed.
+
+        Pieces come with the span of content they replace. Removed line breaks
+        and tabs leave a space so the words around them stay apart.
+        """
+        end = len(content) if end is None else end
+        position = start
+        # Whether the text yielded so far ends with a space
+        space = False
+        for match in _CLEAN_RE.finditer(content, start, end):
+            match_start, match_end = match.span()
+            if match_start < position:
+                continue
+            kind = match.lastgroup
+            if kind == 'email':
+                # Drop the whole token around the "@"
+                token = match_start
+                while token > position and not content[token - 1].isspace():
+                    token -= 1
+                if token == match_start:
+                    continue
+                match_start, match_end = token, _TOKEN_END.match(content, match_start, end).end()
+            if match_start > position:
+                skip = 1 if space and content[position] == ' ' else 0
+                if match_start > position + skip:
+                    piece = content[position + skip:match_start]
+                    yield piece, position + skip, match_start
+                    space = piece[-1] == ' '
+            if kind == 'bang':
+                yield '!', match_start, match_end
+                space = False
+            elif not space and (kind == 'spaces' or (kind == 'control' and _WHITESPACE_RE.search(match.group()))):
+                yield ' ', match_start, match_end
+                space = True
+            position = match_end
+        skip = 1 if space and position < end and content[position] == ' ' else 0
+        if end > position + skip:
+            yield content[position + skip:end], position + skip, end
+    
+    def _windows(self, pieces: Iterable[Tuple[str, int, int]], size: int,
+                 overlap: int) -> Iterator[Tuple[str, int, int]]:
+        """Cut a stream of cleaned pieces into size-character windows, overlap apart, after stripping it.
+
+        Window offsets are mapped back to content through the spans of the pieces.
+        """
+        step = max(size - overlap, 1)
+        parts: List[str] = []
+        pending = 0
+        # Position of parts[0] in the cleaned text; position and (start, end, length) of each piece
+        base = 0
+        positions: List[int] = []
+        spans: List[Tuple[int, int, int]] = []
+        started = False
+        for piece, start, end in pieces:
+            if not started:
+                stripped = piece.lstrip()
+                if not stripped:
+                    continue
+                start += len(piece) - len(stripped)
+                piece = stripped
+                started = True
+            positions.append(base + pending)
+            spans.append((start, end, len(piece)))
+            parts.append(piece)
+            pending += len(piece)
+            if pending < size:
+                continue
+            text = ''.join(parts)
+            # A window is final once non-space text reaches its end
+            text_end = len(text.rstrip())
+            window = 0
+            while text_end - window >= size:
+                yield (text[window:window + size], self._offset(positions, spans, base + window),
+                       self._offset(positions, spans, base + window + size - 1, last=True))
+                window += step
+            parts = [text[window:]]
+            pending = len(parts[0])
+            base += window
+            first = bisect_right(positions, base) - 1
+            if first > 0:
+                del positions[:first]
+                del spans[:first]
+        text = ''.join(parts).rstrip()
+        for window in range(0, len(text), step):
+            stop = min(window + size, len(text))
+            yield (text[window:stop], self._offset(positions, spans, base + window),
+                   self._offset(positions, spans, base + stop - 1, last=True))
     
     @staticmethod
-    def _calculate_quality_score(original: str, processed: str) -> float:
-        """Calculate quality score."""
-        if not original:
-            return 0.0
-        retention = len(processed) / len(original)
-        score = min(retention, 1.0) * 0.7
-        if len(processed.split()) > 10:
-            score += 0.15
-        if '.' in processed:
-            score += 0.15
-        return min(score, 1.0)
+    def _offset(positions: List[int], spans: List[Tuple[int, int, int]], position: int,
+                last: bool = False) -> int:
+        """Content offset of a cleaned-text position, or of the end of its character if last."""
+        i = bisect_right(positions, position) - 1
+        start, end, length = spans[i]
+        delta = position - positions[i]
+        if last:
+            return end if delta == length - 1 else start + delta + 1
+        return start + delta
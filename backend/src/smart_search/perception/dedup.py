@@ -0,0 +1,104 @@
+"""Near-duplicate chunk detection."""
+import hashlib
+import re
+from typing import List, Optional, Tuple
+import numpy as np
+from loguru import logger
+from smart_search.core.config import get_settings
+from smart_search.memory.simhash_index import SimHashIndex
+
+_WORD_RE = re.compile(r"\w+")
+
+def simhash(text: str, shingle_size: int = 3) -> int:
+    """64-bit SimHash over word shingles."""
+    words = _WORD_RE.findall(text.lower())
+    if len(words) > shingle_size:
+        shingles = [" ".join(words[i:i + shingle_size]) for i in range(len(words) - shingle_size + 1)]
+    else:
+        shingles = [" ".join(words)]
+    hashes = np.array(
+        [int.from_bytes(hashlib.blake2b(s.encode(), digest_size=8).digest(), "little") for s in shingles],
+        dtype="<u8"
+    )
+    # One row of 64 bits per shingle hash, least significant bit first
+    bits = np.unpackbits(hashes.view(np.uint8).reshape(-1, 8), axis=1, bitorder="little")
+    votes = 2 * bits.sum(axis=0, dtype=np.int64) - len(hashes)
+    return int(np.packbits(votes > 0, bitorder="little").view("<u8")[0])
+
+class DedupBatch:
+    """Signatures of chunks kept earlier in one index call."""
+
+    def __init__(self, max_distance: int):
+        self.index = SimHashIndex(max_distance)
+        self.keys: List[str] = []
+
+class Deduplicator:
+    """Drops chunks that nearly duplicate stored chunks or earlier chunks in the same call."""
+
+    def __init__(self, vector_store):
+        self.settings = get_settings()
+        self.vector_store = vector_store
+        self.chunks_seen = 0
+        self.duplicates = 0
+
+    def batch(self) -> DedupBatch:
+        """Empty batch to share across the pages of one index call."""
+        return DedupBatch(self.settings.dedup_max_distance)
+
+    def filter(self, url: str, chunks: list,
+               batch: Optional[DedupBatch] = None) -> Tuple[list, List[dict]]:
+        """Kept chunks, signed in metadata["simhash"], and a record per dropped chunk.
+
+        Chunks are compared with stored chunks and with those kept earlier in
+        the batch. The page's own stored chunks are ignored since they are
+        about to be replaced.
+        """
+        if not self.settings.dedup_enabled or not chunks:
+            return chunks, []
+        stored = self.vector_store.simhash_index()
+        own_ids = set(self.vector_store.metadata_store.ids_for_url(url))
+        batch = batch or self.batch()
+
+        kept, dropped, stored_matches = [], [], {}
+        for chunk in chunks:
+            signature = simhash(chunk.content)
+            chunk_index = chunk.metadata.get("chunk_index")
+            match = stored.find(signature, own_ids)
+            if match is not None:
+                stored_matches[len(dropped)] = match
+                dropped.append({"chunk_index": chunk_index})
+                continue
+            match = batch.index.find(signature)
+            if match is not None:
+                dropped.append({"chunk_index": chunk_index, "duplicate_of": batch.keys[match]})
+                continue
+            batch.index.add(len(batch.keys), signature)
+            batch.keys.append(f"{url}#chunk{chunk_index}")
+            chunk.metadata["simhash"] = signature
+            kept.append(chunk)
+
+        if stored_matches:
+            pages = self.vector_store.metadata_store.get_many(list(stored_matches.values()))
+            for position, vector_id in stored_matches.items():
+                page = pages.get(vector_id)
+                if page is not None:
+                    dropped[position]["duplicate_of"] = f"{page.url}#chunk{page.metadata.get('chunk_index', 0)}"
+        self.chunks_seen += len(chunks)
+        self.duplicates += len(dropped)
+        if dropped:
+            logger.info(f"Skipped {len(dropped)}/{len(chunks)} near-duplicate chunks of {url}")
+        return kept, dropped
+
+    @staticmethod
+    def from_other_pages(url: str, dropped: List[dict]) -> bool:
+        """Whether any dropped chunk of a page duplicates another page, or a chunk since deleted."""
+        own = f"{url}#chunk"
+        return any(not record.get("duplicate_of", "").startswith(own) for record in dropped)
+    
+    def get_stats(self) -> dict:
+        """Dedup counters since startup."""
+        return {
+            "chunks_seen": self.chunks_seen,
+            "duplicates": self.duplicates,
+            "embeddings_saved_pct": 100.0 * self.duplicates / self.chunks_seen if self.chunks_seen else 0.0
+        }
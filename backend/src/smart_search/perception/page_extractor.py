@@ -1,6 +1,15 @@
 """Page content extraction."""
 import re
+from typing import List, Optional
 from loguru import logger
+from smart_search.core.config import get_settings
+
+try:
+    import lxml.html
+    from lxml import etree
+    LXML_AVAILABLE = True
+except ImportError:
+    LXML_AVAILABLE = False
 
 try:
     from bs4 import BeautifulSoup
@@ -8,26 +17,152 @@ try:
 except ImportError:
     BS_AVAILABLE = False
 
+# Private-use characters marking paragraph and line breaks while source whitespace is collapsed
+_PARAGRAPH_MARK = '\ue000'
+_LINE_MARK = '\ue001'
+_PARAGRAPH_TAGS = ('p', 'h1', 'h2', 'h3', 'h4', 'h5', 'h6', 'blockquote', 'pre', 'table', 'ul', 'ol', 'dl',
+                   'article', 'section')
+_LINE_TAGS = ('div', 'li', 'tr', 'dt', 'dd', 'br', 'figcaption', 'main', 'header', 'footer', 'nav', 'aside', 'form')
+_CELL_TAGS = ('td', 'th')
+_SPACE_RE = re.compile(r'\s+')
+_BREAK_RE = re.compile(rf' ?[{_PARAGRAPH_MARK}{_LINE_MARK}][{_PARAGRAPH_MARK}{_LINE_MARK} ]*')
+# Boilerplate dropped before looking for the main content
+_BOILERPLATE_TAGS = ('nav', 'footer', 'aside', 'form', 'button', 'select', 'svg')
+_UNLIKELY_RE = re.compile(r'-ad-|banner|breadcrumb|combx|comment|community|cookie|disqus|footer|gdpr|menu|modal|'
+                          r'pager|pagination|popup|promo|related|remark|replies|share|sidebar|social|sponsor|'
+                          r'subscribe|newsletter', re.I)
+_MAYBE_RE = re.compile(r'and|article|body|column|content|main|shadow', re.I)
+# Elements whose text is scored, and the least text worth scoring
+_SCORED_TAGS = ('p', 'pre', 'td', 'blockquote')
+_MIN_SCORED_LENGTH = 25
+# Main content shorter than this falls back to the whole page
+_MIN_MAIN_LENGTH = 250
+
 class PageExtractor:
     """Extracts content from pages."""
     
     REMOVE_TAGS = {'script', 'style', 'meta', 'link', 'noscript', 'iframe', 'embed', 'object'}
     
     @staticmethod
-    def extract_from_html(html_content: str, url: str, title: str):
-        """Extract text from HTML."""
+    def extract_from_html(html_content: str, url: str, title: str, main_content: Optional[bool] = None):
+        """Extract text from HTML, keeping only the main content unless disabled.
+
+        Uses lxml when available and falls back to BeautifulSoup, then to
+        stripping tags.
+        """
         try:
-            if BS_AVAILABLE:
-                soup = BeautifulSoup(html_content, 'html.parser')
-                for tag in PageExtractor.REMOVE_TAGS:
-                    for element in soup.find_all(tag):
-                        element.decompose()
-                text = soup.get_text(separator=' ', strip=True)
-            else:
-                text = re.sub(r'<[^>]+>', ' ', html_content)
-            
             from .schemas import PageData
-            return PageData(url=url, title=title, content=text)
+            if main_content is None:
+                main_content = get_settings().extract_main_content
+            if LXML_AVAILABLE:
+                try:
+                    text, page_title = PageExtractor._extract_lxml(html_content, main_content)
+                    return PageData(url=url, title=title or page_title, content=text)
+                except (etree.ParserError, ValueError) as e:
+                    logger.debug(f"lxml extraction failed for {url}, falling back: {e}")
+            return PageData(url=url, title=title, content=PageExtractor._extract_bs4(html_content))
         except Exception as e:
             logger.error(f"Extraction error: {e}")
             raise
+    
+    @staticmethod
+    def _extract_bs4(html_content: str) -> str:
+        """Text of a page with BeautifulSoup, or with tags stripped if it is not installed."""
+        if not BS_AVAILABLE:
+            return re.sub(r'<[^>]+>', ' ', html_content)
+        soup = BeautifulSoup(html_content, 'html.parser')
+        for tag in PageExtractor.REMOVE_TAGS:
+            for element in soup.find_all(tag):
+                element.decompose()
+        return soup.get_text(separator=' ', strip=True)
+    
+    @staticmethod
+    def _extract_lxml(html_content: str, main_content: bool):
+        """Text and <title> of a page, with paragraph and line breaks kept."""
+        if isinstance(html_content, str):
+            html_content = html_content.encode('utf-8')
+        root = lxml.html.document_fromstring(html_content, parser=lxml.html.HTMLParser(encoding='utf-8'))
+        page_title = (root.findtext('.//title') or '').strip()
+        etree.strip_elements(root, *PageExtractor.REMOVE_TAGS, etree.Comment, with_tail=False)
+        for element in root.iter(*_PARAGRAPH_TAGS):
+            element.text = _PARAGRAPH_MARK + (element.text or '')
+            element.tail = _PARAGRAPH_MARK + (element.tail or '')
+        for element in root.iter(*_LINE_TAGS):
+            element.text = _LINE_MARK + (element.text or '')
+            element.tail = _LINE_MARK + (element.tail or '')
+        for element in root.iter(*_CELL_TAGS):
+            element.tail = ' ' + (element.tail or '')
+        body = root.find('body')
+        body = root if body is None else body
+        if main_content:
+            text = PageExtractor._text(PageExtractor._main_content(body))
+            if len(text) >= _MIN_MAIN_LENGTH:
+                return text, page_title
+            logger.debug(f"Main content too short ({len(text)} chars), using the whole page")
+        return PageExtractor._text([body]), page_title
+    
+    @staticmethod
+    def _main_content(body) -> list:
+        """Elements holding the main content, readability-style.
+
+        Boilerplate is dropped, then paragraph text is scored onto parents and
+        grandparents and discounted by link density. The best container is
+        kept along with siblings that score close to it.
+        """
+        etree.strip_elements(body, *_BOILERPLATE_TAGS, with_tail=False)
+        unlikely = [
+            element for element in body.iter(etree.Element)
+            if element.tag not in ('html', 'body', 'article', 'main')
+            and _UNLIKELY_RE.search(f"{element.get('class', '')} {element.get('id', '')}")
+            and not _MAYBE_RE.search(f"{element.get('class', '')} {element.get('id', '')}")
+        ]
+        for element in unlikely:
+            if element.getparent() is not None:
+                element.drop_tree()
+    
+        scores = {}
+        for paragraph in body.iter(*_SCORED_TAGS):
+            text = paragraph.text_content()
+            if len(text) < _MIN_SCORED_LENGTH:
+                continue
+            score = 1 + text.count(',') + min(len(text) // 100, 3)
+            parent = paragraph.getparent()
+            if parent is None:
+                continue
+            scores[parent] = scores.get(parent, 0) + score
+            grandparent = parent.getparent()
+            if grandparent is not None:
+                scores[grandparent] = scores.get(grandparent, 0) + score / 2
+        if not scores:
+            return [body]
+        for element in scores:
+            scores[element] *= 1 - PageExtractor._link_density(element)
+        top = max(scores, key=scores.get)
+        parent = top.getparent()
+        if parent is None:
+            return [top]
+        threshold = max(10, scores[top] * 0.2)
+        kept = []
+        for sibling in parent:
+            if sibling is top or scores.get(sibling, 0) >= threshold:
+                kept.append(sibling)
+            elif sibling.tag == 'p':
+                text = sibling.text_content()
+                if len(text) > 80 and PageExtractor._link_density(sibling) < 0.25:
+                    kept.append(sibling)
+        return kept
+    
+    @staticmethod
+    def _link_density(element) -> float:
+        """Share of an element's text inside links."""
+        length = len(element.text_content())
+        if not length:
+            return 1.0
+        return sum(len(link.text_content()) for link in element.iter('a')) / length
+    
+    @staticmethod
+    def _text(elements: List) -> str:
+        """Text of elements with source whitespace collapsed and block breaks kept as line breaks."""
+        text = _SPACE_RE.sub(' ', ''.join(fragment for element in elements for fragment in element.itertext()))
+        text = _BREAK_RE.sub(lambda m: '\n\n' if _PARAGRAPH_MARK in m.group() else '\n', text)
+        return text.strip()
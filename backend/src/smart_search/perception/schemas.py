@@ -1,8 +1,15 @@
 """Perception schemas."""
 from typing import Optional
 from datetime import datetime
+from enum import Enum
 from pydantic import BaseModel, Field
 
+class ChunkStrategy(str, Enum):
+    FIXED = "fixed"
+    SENTENCE = "sentence"
+    TOKEN = "token"
+    PARAGRAPH = "paragraph"
+
 class PageData(BaseModel):
     url: str
     title: str
@@ -10,13 +17,32 @@ class PageData(BaseModel):
     timestamp: datetime = Field(default_factory=datetime.now)
     metadata: dict = Field(default_factory=dict)
 
-class ProcessedContent(BaseModel):
-    url: str
-    title: str
-    content: str
-    original_length: int
-    processed_length: int
-    extraction_quality: float
-    metadata: dict = Field(default_factory=dict)
-    timestamp: datetime = Field(default_factory=datetime.now)
-    timestamp: datetime = Field(default_factory=datetime.now) 
+class Chunk:
+    """One chunk of a processed page; quality is computed on access."""
+    
+    __slots__ = ("url", "title", "content", "original_length", "metadata", "timestamp")
+    
+    def __init__(self, url: str, title: str, content: str, original_length: int,
+                 metadata: dict, timestamp: datetime):
+        self.url = url
+        self.title = title
+        self.content = content
+        self.original_length = original_length
+        self.metadata = metadata
+        self.timestamp = timestamp
+    
+    @property
+    def processed_length(self) -> int:
+        return len(self.content)
+    
+    @property
+    def extraction_quality(self) -> float:
+        """Share of the page kept in this chunk, plus bonuses for prose-like text."""
+        if not self.original_length:
+            return 0.0
+        score = min(len(self.content) / self.original_length, 1.0) * 0.7
+        if len(self.content.split(None, 10)) > 10:
+            score += 0.15
+        if '.' in self.content:
+            score += 0.15
+        return min(score, 1.0)
@@ -8,10 +8,21 @@ class OllamaException(SmartSearchException):
     """Ollama error."""
     pass
 
+class OllamaEndpointNotFoundException(OllamaException):
+    """Ollama does not serve the requested API route."""
+    pass
+
 class IndexingException(SmartSearchException):
     """Indexing error."""
     pass
 
+class QueueFullException(IndexingException):
+    """Indexing queue is full."""
+    
+    def __init__(self, message: str, retry_after: int):
+        super().__init__(message)
+        self.retry_after = retry_after
+
 class SearchException(SmartSearchException):
     """Search error."""
     pass
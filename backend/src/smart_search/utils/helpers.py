@@ -1,7 +1,10 @@
 """Helper functions."""
-from urllib.parse import urlparse
+from urllib.parse import parse_qsl, urlencode, urlparse, urlunparse
 import hashlib
 
+# Query parameters that only track where a visit came from
+TRACKING_PARAMS = {"fbclid", "gclid", "dclid", "msclkid", "mc_cid", "mc_eid", "igshid", "ref_src", "_ga", "_hsenc", "_hsmi"}
+
 def extract_domain(url: str) -> str:
     """Extract domain."""
     try:
@@ -10,6 +13,28 @@ def extract_domain(url: str) -> str:
     except:
         return ""
 
+def canonicalize_url(url: str) -> str:
+    """Canonical form of a URL for deduplication.
+
+    Lowercases scheme and host, drops default ports, fragments and tracking
+    parameters (utm_* and TRACKING_PARAMS), and sorts the remaining query.
+    """
+    try:
+        parsed = urlparse(url.strip())
+    except ValueError:
+        return url
+    if not parsed.scheme or not parsed.netloc:
+        return url
+    scheme = parsed.scheme.lower()
+    netloc = parsed.netloc.lower()
+    if (scheme, netloc.rsplit(":", 1)[-1]) in (("http", "80"), ("https", "443")):
+        netloc = netloc.rsplit(":", 1)[0]
+    query = sorted(
+        (key, value) for key, value in parse_qsl(parsed.query, keep_blank_values=True)
+        if not key.lower().startswith("utm_") and key.lower() not in TRACKING_PARAMS
+    )
+    return urlunparse((scheme, netloc, parsed.path or "/", parsed.params, urlencode(query), ""))
+
 def is_valid_url(url: str) -> bool:
     """Check if URL valid."""
     try:
@@ -27,3 +52,7 @@ def truncate_text(text: str, length: int = 100) -> str:
 def generate_hash(data: str) -> str:
     """Generate hash."""
     return hashlib.sha256(data.encode()).hexdigest()
+
+def content_fingerprint(title: str, content: str) -> str:
+    """Hash of a page's title and whitespace-normalized text."""
+    return generate_hash(title.strip() + "\n" + " ".join(content.split()))
@@ -0,0 +1,74 @@
+"""Shared test setup.
+
+Settings are read once, at import, and the config module creates its
+data directories straight away, so point them at a temporary directory
+and at a fake Ollama server before anything imports smart_search. Each
+test gets its own data_dir through the settings fixture.
+"""
+import os
+import shutil
+import sys
+import tempfile
+from datetime import datetime
+
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "benchmarks"))
+
+from corpus import Corpus  # noqa: E402
+from fake_ollama import FakeOllama  # noqa: E402
+
+DIMENSION = 64
+
+_DATA_ROOT = tempfile.mkdtemp(prefix="smart-search-tests-")
+_OLLAMA = FakeOllama(DIMENSION).start()
+os.environ["DATA_DIR"] = os.path.join(_DATA_ROOT, "data")
+os.environ["CACHE_DIR"] = os.path.join(_DATA_ROOT, "cache")
+os.environ["OLLAMA_BASE_URL"] = _OLLAMA.url
+
+def pytest_sessionfinish(session, exitstatus):
+    _OLLAMA.stop()
+    shutil.rmtree(_DATA_ROOT, ignore_errors=True)
+
+@pytest.fixture
+def settings(tmp_path, monkeypatch):
+    """Process settings with data_dir moved to a fresh directory."""
+    from smart_search.core.config import get_settings
+    settings = get_settings()
+    monkeypatch.setattr(settings, "data_dir", str(tmp_path))
+    return settings
+
+@pytest.fixture
+def executor(settings):
+    """AgentExecutor over an empty store."""
+    from smart_search.agent.executor import AgentExecutor
+    executor = AgentExecutor()
+    yield executor
+    executor.vector_store.close()
+
+@pytest.fixture
+def chunks():
+    """Factory of (vectors, pages): count unit vectors and one-chunk pages to store them with.
+
+    Pages are spread over sites and over months from January 2025; page i
+    has URL https://site<i % sites>.example.com/page/<i> and corpus text.
+    """
+    from smart_search.memory.schemas import StoredPage
+    corpus = Corpus(seed=7)
+
+    def make(count: int, start: int = 0, sites: int = 7, months: int = 1):
+        numbers = range(start, start + count)
+        pages = [
+            StoredPage(
+                url=f"https://site{i % sites}.example.com/page/{i}",
+                title=f"Page {i}",
+                content=corpus.chunk_text(i),
+                timestamp=datetime(2025, 1 + i % months, 15),
+                embedding_dimension=DIMENSION,
+                metadata={"chunk_index": 0},
+            )
+            for i in numbers
+        ]
+        return corpus.vectors(count, DIMENSION, start=start), pages
+
+    return make
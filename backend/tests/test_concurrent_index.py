@@ -0,0 +1,67 @@
+"""Concurrent writers of the same page."""
+import asyncio
+
+from corpus import Corpus
+
+URL = "https://a.example.com/page"
+
+def _page(chunks: int, seed: int) -> str:
+    return next(Corpus(seed=seed).pages(1, chunks_per_page=chunks))["content"]
+
+def _slow_first_embedding(executor, monkeypatch) -> None:
+    """Delay the first embedding call so another writer runs in the middle of it."""
+    generate_batch = executor.embedding_gen.generate_batch
+    calls = []
+
+    async def slow(texts):
+        calls.append(texts)
+        if len(calls) == 1:
+            await asyncio.sleep(0.2)
+        return await generate_batch(texts)
+
+    monkeypatch.setattr(executor.embedding_gen, "generate_batch", slow)
+
+def _stored(executor):
+    ids = executor.vector_store.metadata_store.ids_for_url(URL)
+    pages = executor.vector_store.metadata_store.get_many(ids)
+    return sorted((page.metadata["chunk_index"], page.content) for page in pages.values())
+
+def test_single_and_bulk_index_of_same_page_do_not_interleave(executor, monkeypatch):
+    long_content, short_content = _page(8, seed=1), _page(1, seed=2)
+    _slow_first_embedding(executor, monkeypatch)
+
+    async def bulk():
+        await asyncio.sleep(0.05)
+
+        async def items():
+            yield {"url": URL, "title": "Page", "content": short_content}
+
+        return [result async for result in executor.handle_bulk_index_request(items())]
+
+    async def scenario():
+        return await asyncio.gather(executor.handle_index_request(URL, "Page", long_content), bulk())
+
+    single, bulk_results = asyncio.run(scenario())
+
+    assert single[0] and bulk_results[0]["success"]
+    stored = _stored(executor)
+    # The bulk write waits for the single one and replaces it as a whole
+    assert [content for _, content in stored] == [short_content]
+    assert executor.vector_store.live_count == 1
+
+def test_delete_waits_for_running_index(executor, monkeypatch):
+    content = _page(3, seed=3)
+    _slow_first_embedding(executor, monkeypatch)
+
+    async def delete():
+        await asyncio.sleep(0.05)
+        async with executor.url_locks.hold([URL]):
+            return executor.vector_store.delete_url(URL)
+
+    async def scenario():
+        return await asyncio.gather(executor.handle_index_request(URL, "Page", content), delete())
+
+    (success, _, data), deleted = asyncio.run(scenario())
+
+    assert success and deleted == data["total_chunks"]
+    assert _stored(executor) == []
@@ -0,0 +1,73 @@
+"""Near-duplicate chunks across pages."""
+import asyncio
+
+from corpus import Corpus
+
+from smart_search.perception.content_processor import ContentProcessor
+from smart_search.utils.helpers import canonicalize_url
+
+def _content(chunks: int = 2) -> str:
+    return next(Corpus(seed=16).pages(1, chunks_per_page=chunks))["content"]
+
+def _chunks(executor, url: str) -> int:
+    return len(executor.vector_store.metadata_store.ids_for_url(url))
+
+def test_duplicate_page_is_stored_once_its_source_is_deleted(executor):
+    a, b = "https://a.example.com/post", "https://b.example.com/mirror"
+    content = _content()
+
+    async def scenario():
+        assert (await executor.handle_index_request(a, "Post", content))[0]
+        success, _, data = await executor.handle_index_request(b, "Post", content)
+        assert success and data["duplicate_chunks"] == 2
+        assert _chunks(executor, b) == 0
+
+        executor.vector_store.delete_url(a)
+        success, message, data = await executor.handle_index_request(b, "Post", content)
+        assert success and not message.startswith("Unchanged")
+        assert data["duplicate_chunks"] == 0
+        assert _chunks(executor, b) == 2
+
+        # Fully stored now, so the next identical visit is skipped
+        _, message, _ = await executor.handle_index_request(b, "Post", content)
+        assert message.startswith("Unchanged")
+
+    asyncio.run(scenario())
+
+def test_bulk_duplicate_page_is_not_fingerprinted(executor):
+    content = _content()
+    items = [{"url": f"https://{host}.example.com/post", "title": "Post", "content": content}
+             for host in ("a", "b")]
+
+    async def pages():
+        for item in items:
+            yield dict(item)
+
+    async def scenario():
+        return [result async for result in executor.handle_bulk_index_request(pages())]
+
+    results = asyncio.run(scenario())
+
+    assert [result["duplicate_chunks"] for result in results] == [0, 2]
+    store = executor.vector_store.metadata_store
+    assert store.get_fingerprint(items[0]["url"]) is not None
+    assert store.get_fingerprint(items[1]["url"]) is None
+
+def test_repeated_chunk_within_a_page_keeps_fingerprint(executor, settings, monkeypatch):
+    monkeypatch.setattr(settings, "chunk_strategy", "paragraph")
+    executor.content_processor = ContentProcessor()
+    url = "https://a.example.com/repeats"
+    paragraph = _content(1)
+
+    async def scenario():
+        _, _, data = await executor.handle_index_request(url, "Repeats", f"{paragraph}\n\n{paragraph}")
+        assert data["duplicate_chunks"] >= 1
+        _, message, _ = await executor.handle_index_request(url, "Repeats", f"{paragraph}\n\n{paragraph}")
+        assert message.startswith("Unchanged")
+
+    asyncio.run(scenario())
+
+def test_ref_parameter_is_kept():
+    url = "https://gitlab.example.com/group/project/-/blob/main/README.md?ref=feature"
+    assert canonicalize_url(url) == url
+    assert canonicalize_url("https://example.com/a?utm_source=x&fbclid=1") == "https://example.com/a"
@@ -0,0 +1,80 @@
+"""Embedding caches: crash safety of the persistent cache, keys and failures of the query cache."""
+import asyncio
+import gc
+
+import numpy as np
+import pytest
+
+from smart_search.memory.cache import EmbeddingCache, QueryEmbeddingCache
+
+def _vector(value: float) -> np.ndarray:
+    return np.full((1, 4), value, dtype=np.float32)
+
+def test_evicted_row_is_not_served_for_old_key_after_crash(tmp_path):
+    cache = EmbeddingCache("model", 4, capacity=2, cache_dir=str(tmp_path))
+    cache.put_many(["alpha"], _vector(1))
+    cache.put_many(["beta"], _vector(2))
+    cache.flush()
+    # Evicts alpha and reuses its row; the process dies before the next flush
+    cache.put_many(["gamma"], _vector(9))
+
+    reopened = EmbeddingCache("model", 4, capacity=2, cache_dir=str(tmp_path))
+    vectors, hit = reopened.get_many(["alpha", "beta", "gamma"])
+
+    assert hit.tolist() == [False, True, False]
+    np.testing.assert_array_equal(vectors[1], _vector(2)[0])
+
+def test_stale_row_is_reused_when_key_is_stored_again(tmp_path):
+    cache = EmbeddingCache("model", 4, capacity=2, cache_dir=str(tmp_path))
+    cache.put_many(["alpha", "beta"], np.vstack([_vector(1), _vector(2)]))
+    cache.flush()
+    cache.put_many(["gamma"], _vector(9))
+
+    reopened = EmbeddingCache("model", 4, capacity=2, cache_dir=str(tmp_path))
+    reopened.put_many(["alpha"], _vector(3))
+    vectors, hit = reopened.get_many(["alpha", "beta"])
+
+    assert hit.tolist() == [True, True]
+    np.testing.assert_array_equal(vectors, np.vstack([_vector(3), _vector(2)]))
+
+def test_flushed_entries_survive_reopen(tmp_path):
+    cache = EmbeddingCache("model", 4, capacity=4, cache_dir=str(tmp_path))
+    cache.put_many(["alpha", "beta"], np.vstack([_vector(1), _vector(2)]))
+    cache.flush()
+
+    vectors, hit = EmbeddingCache("model", 4, capacity=4, cache_dir=str(tmp_path)).get_many(["beta"])
+
+    assert hit.tolist() == [True]
+    np.testing.assert_array_equal(vectors[0], _vector(2)[0])
+
+def test_query_cache_keeps_case():
+    calls = []
+
+    async def create_many(queries):
+        calls.append(queries)
+        return np.arange(len(queries), dtype=np.float32)[:, None] * np.ones((1, 4), dtype=np.float32)
+
+    cache = QueryEmbeddingCache(max_entries=10, max_bytes=1 << 20)
+    vectors = asyncio.run(cache.get_or_create_many(["US", "us", " US  "], create_many))
+
+    assert calls == [["US", "us"]]
+    assert vectors[0] is vectors[2]
+    assert not np.array_equal(vectors[0], vectors[1])
+
+def test_failed_query_batch_leaves_no_unretrieved_errors():
+    errors = []
+    cache = QueryEmbeddingCache(max_entries=10, max_bytes=1 << 20)
+
+    async def create_many(queries):
+        raise RuntimeError("embedding failed")
+
+    async def main():
+        asyncio.get_running_loop().set_exception_handler(lambda loop, context: errors.append(context))
+        with pytest.raises(RuntimeError):
+            await cache.get_or_create_many(["alpha", "beta", "gamma"], create_many)
+        await asyncio.sleep(0)
+        gc.collect()
+
+    asyncio.run(main())
+    assert errors == []
+    assert not cache._inflight
@@ -0,0 +1,58 @@
+"""Index training thresholds."""
+import pytest
+
+from conftest import DIMENSION
+from smart_search.memory.index_factory import index_type_of, storage_of
+from smart_search.memory.vector_store import VectorStore
+
+@pytest.fixture
+def ivf_pq(settings, monkeypatch):
+    """ivf_pq with a training threshold below what product codes need."""
+    monkeypatch.setattr(settings, "index_type", "ivf_pq")
+    monkeypatch.setattr(settings, "index_train_min_vectors", 50)
+    # Each subquantizer is trained separately, which is slow
+    monkeypatch.setattr(settings, "pq_m", 1)
+    return settings
+
+def test_product_codes_wait_for_enough_training_vectors(ivf_pq, chunks):
+    vectors, pages = chunks(300)
+    store = VectorStore(DIMENSION)
+    store.add_batch(vectors[:100], pages[:100])
+    assert store._compaction_thread is None
+    assert index_type_of(store.index) == "flat"
+
+    store.add_batch(vectors[100:], pages[100:])
+    store._compaction_thread.join()
+    assert (index_type_of(store.index), storage_of(store.index)) == ("ivf_pq", "pq")
+    assert store.trained_on == 300
+    ids, scores = store.search_ids(vectors[7], 1)
+    assert store.fetch(ids, scores)[0].url == pages[7].url
+    store.close()
+
+@pytest.mark.parametrize("index_type", ["flat", "hnsw"])
+def test_pq_storage_waits_for_enough_training_vectors(settings, chunks, monkeypatch, index_type):
+    monkeypatch.setattr(settings, "index_type", index_type)
+    monkeypatch.setattr(settings, "vector_storage", "pq")
+    monkeypatch.setattr(settings, "index_train_min_vectors", 50)
+    monkeypatch.setattr(settings, "pq_m", 1)
+    vectors, pages = chunks(100)
+    store = VectorStore(DIMENSION)
+    store.add_batch(vectors, pages)
+    assert store._compaction_thread is None
+    assert (index_type_of(store.index), storage_of(store.index)) == ("flat", "full")
+    ids, scores = store.search_ids(vectors[7], 1)
+    assert store.fetch(ids, scores)[0].url == pages[7].url
+    store.close()
+
+def test_startup_keeps_a_small_index_flat(settings, chunks, monkeypatch):
+    vectors, pages = chunks(100)
+    store = VectorStore(DIMENSION)
+    store.add_batch(vectors, pages)
+    store.close()
+
+    monkeypatch.setattr(settings, "index_type", "ivf_pq")
+    monkeypatch.setattr(settings, "index_train_min_vectors", 50)
+    store = VectorStore(DIMENSION)
+    assert index_type_of(store.index) == "flat"
+    assert store.live_count == 100
+    store.close()
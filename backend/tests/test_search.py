@@ -0,0 +1,59 @@
+"""Search modes and ranking."""
+import asyncio
+
+import numpy as np
+from corpus import Corpus
+
+from smart_search.decision.ranker import Ranker
+
+QUERY = "zephyr quokka narwhal axolotl"
+
+async def _index_pages(executor) -> list:
+    """Index four pages; the first holds every query word, the others one each."""
+    pages = list(Corpus(seed=21).pages(4, chunks_per_page=1))
+    extra = [QUERY] + QUERY.split()[:3]
+    urls = [f"https://site{i}.example.com/page" for i in range(len(pages))]
+    for url, page, words in zip(urls, pages, extra):
+        assert (await executor.handle_index_request(url, page["title"], f"{page['content']} {words}"))[0]
+    return urls
+
+async def _search(executor, query: str, mode: str, top_k: int = 5) -> list:
+    success, _, data, results = await executor.handle_search_request(query, top_k, mode)
+    assert success and data["mode"] == mode
+    return [result["url"] for result in results]
+
+def test_lexical_results_are_not_cut_by_the_vector_score_threshold(executor):
+    async def scenario():
+        urls = await _index_pages(executor)
+        found = await _search(executor, QUERY, "lexical")
+        assert found[0] == urls[0]
+        assert sorted(found) == sorted(urls)
+
+    asyncio.run(scenario())
+
+def test_vector_results_below_the_score_threshold_are_dropped(executor):
+    async def scenario():
+        await _index_pages(executor)
+        # Shares no words with the corpus pages
+        url, content = "https://other.example.com/page", " ".join(f"term{i}" for i in range(60))
+        assert (await executor.handle_index_request(url, "Other", content))[0]
+        assert await _search(executor, content, "vector") == [url]
+
+    asyncio.run(scenario())
+
+def test_rank_fusion_favours_ids_found_by_both_searches():
+    ids, scores = Ranker.reciprocal_rank_fusion([np.array([1, 2, 3]), np.array([4, 2, 5])], top_k=3)
+
+    assert ids.tolist() == [2, 1, 4]
+    assert np.all(scores <= 1.0)
+    top, top_scores = Ranker.reciprocal_rank_fusion([np.array([7, 8]), np.array([7])], top_k=2)
+    assert top.tolist() == [7, 8] and top_scores[0] == 1.0
+
+def test_hybrid_search_fuses_vector_and_lexical_hits(executor):
+    async def scenario():
+        urls = await _index_pages(executor)
+        found = await _search(executor, QUERY, "hybrid")
+        assert found[0] == urls[0]
+        assert sorted(found) == sorted(urls)
+
+    asyncio.run(scenario())
@@ -0,0 +1,74 @@
+"""Sharded vector store."""
+import os
+
+import pytest
+
+from conftest import DIMENSION
+from smart_search.memory.sharded_store import ShardedVectorStore
+
+@pytest.fixture
+def time_sharded(settings, monkeypatch):
+    monkeypatch.setattr(settings, "shard_by", "time")
+    monkeypatch.setattr(settings, "shard_max_loaded", 1)
+    return settings
+
+def _file_states(directory: str) -> dict:
+    """(mtime, size) of every file, leaving out SQLite's per-connection -wal/-shm files."""
+    states = {}
+    for root, _, files in os.walk(directory):
+        for name in files:
+            if not name.endswith(("-wal", "-shm")):
+                stat = os.stat(os.path.join(root, name))
+                states[os.path.join(root, name)] = (stat.st_mtime_ns, stat.st_size)
+    return states
+
+def test_searches_do_not_rewrite_shard_files(time_sharded, chunks):
+    vectors, pages = chunks(300, months=3)
+    store = ShardedVectorStore(DIMENSION)
+    store.add_batch(vectors, pages)
+    store.save()
+    store.close()
+
+    store = ShardedVectorStore(DIMENSION)
+    before = _file_states(store.pages_dir)
+    for row in (0, 101, 202):
+        ids, _ = store.search_ids(vectors[row], 5)
+        assert store.fetch(ids[:1], _[:1])[0].url == pages[row].url
+        store.lexical_search_ids(pages[row].content, 5)
+
+    assert _file_states(store.pages_dir) == before
+    # Every shard is in the searches' working set, so none is unloaded between queries
+    assert sorted(store.loaded_shards()) == ["2025-01", "2025-02", "2025-03"]
+    store.close()
+
+def test_unloaded_shards_keep_their_changes(time_sharded, chunks):
+    vectors, pages = chunks(60, months=3)
+    store = ShardedVectorStore(DIMENSION)
+    store.add_batch(vectors, pages)
+    store.save()
+    store.delete_url(pages[1].url)
+    # A write to one shard unloads the others beyond shard_max_loaded
+    store.add_batch(vectors[:1], pages[:1])
+    assert store.loaded_shards() == ["2025-01"]
+    store.close()
+
+    store = ShardedVectorStore(DIMENSION)
+    assert store.live_count == 59
+    assert store.metadata_store.ids_for_url(pages[1].url) == []
+    assert len(store.metadata_store.ids_for_url(pages[0].url)) == 1
+    store.close()
+
+def test_fingerprint_goes_to_the_shard_holding_the_page(time_sharded, chunks):
+    vectors, pages = chunks(2, months=2)
+    store = ShardedVectorStore(DIMENSION)
+    store.add_batch(vectors, pages)
+
+    store.metadata_store.set_fingerprint(pages[1].url, "abc")
+    store.metadata_store.set_fingerprint("https://elsewhere.example.com/", "def")
+
+    assert store.metadata_store.get_fingerprint(pages[1].url) == "abc"
+    assert store.metadata_store.get_fingerprint("https://elsewhere.example.com/") is None
+    with store.using(["2025-02"]) as (shard,):
+        assert shard.metadata_store.get_fingerprint(pages[1].url) == "abc"
+    assert sorted(store.shards) == ["2025-01", "2025-02"]
+    store.close()
@@ -0,0 +1,92 @@
+"""Vector store: crash recovery, quantized re-ranking and filtered search."""
+from datetime import datetime
+
+import numpy as np
+import pytest
+
+from conftest import DIMENSION
+from smart_search.memory.index_factory import storage_of
+from smart_search.memory.schemas import SearchFilter
+from smart_search.memory.vector_store import VectorStore
+
+def _crash(store: VectorStore) -> None:
+    """Release the files of a store as a dying process would, without checkpointing."""
+    store.wal.close()
+    store.metadata_store.close()
+
+def test_logged_changes_are_replayed_after_a_crash(settings, chunks):
+    vectors, pages = chunks(20)
+    store = VectorStore(DIMENSION)
+    store.add_batch(vectors[:10], pages[:10])
+    store.checkpoint()
+    store.add_batch(vectors[10:], pages[10:])
+    store.delete_url(pages[0].url)
+    store.save()
+    _crash(store)
+
+    store = VectorStore(DIMENSION)
+    assert store.live_count == 19
+    assert store.metadata_store.ids_for_url(pages[0].url) == []
+    ids, scores = store.search_ids(vectors[15], 1)
+    assert store.fetch(ids, scores)[0].url == pages[15].url
+    store.close()
+
+def test_torn_log_tail_is_dropped(settings, chunks):
+    vectors, pages = chunks(10)
+    store = VectorStore(DIMENSION)
+    store.add_batch(vectors[:5], pages[:5])
+    store.save()
+    _crash(store)
+    # A record cut short by the crash
+    with open(store.wal_file, "ab") as f:
+        f.write(b"\x40\x00\x00\x00torn")
+
+    store = VectorStore(DIMENSION)
+    assert store.live_count == 5
+    store.add_batch(vectors[5:], pages[5:])
+    store.save()
+    _crash(store)
+
+    store = VectorStore(DIMENSION)
+    assert store.live_count == 10
+    store.close()
+
+@pytest.mark.parametrize("storage", ["sq8", "pq"])
+def test_quantized_results_are_scored_exactly(settings, chunks, monkeypatch, storage):
+    monkeypatch.setattr(settings, "vector_storage", storage)
+    monkeypatch.setattr(settings, "index_train_min_vectors", 50)
+    # One subquantizer keeps PQ training quick; re-ranking makes up for the coarse codes
+    monkeypatch.setattr(settings, "pq_m", 1)
+    vectors, pages = chunks(300)
+    store = VectorStore(DIMENSION)
+    store.add_batch(vectors, pages)
+    store._compaction_thread.join()
+    assert storage_of(store.index) == storage
+
+    for row in (0, 123, 299):
+        ids, scores = store.search_ids(vectors[row], 5)
+        # chunks are stored with ids 0..n-1 in order
+        np.testing.assert_allclose(scores, vectors[ids] @ vectors[row], rtol=1e-5)
+        assert ids[0] == row
+        assert np.all(np.diff(scores) <= 0)
+    store.close()
+
+@pytest.mark.parametrize("exact_max", [5000, 0])
+def test_filtered_search_returns_only_matching_chunks(settings, chunks, monkeypatch, exact_max):
+    # 0 searches the index through an id selector instead of scoring the matches exactly
+    monkeypatch.setattr(settings, "filter_exact_max", exact_max)
+    vectors, pages = chunks(140, sites=7, months=2)
+    store = VectorStore(DIMENSION)
+    store.add_batch(vectors, pages)
+    store.delete_url(pages[2].url)
+    search_filter = SearchFilter(domain="site2.example.com", since=datetime(2025, 2, 1))
+
+    allowed = store.filter_mask(search_filter)
+    ids, scores = store.search_ids(vectors[2], 50, allowed=allowed)
+    results = store.fetch(ids, scores)
+
+    expected = {page.url for i, page in enumerate(pages)
+                if i != 2 and i % 7 == 2 and page.timestamp >= search_filter.since}
+    assert {result.url for result in results} == expected
+    assert store.filter_mask(SearchFilter()) is None
+    store.close()
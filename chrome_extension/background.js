@@ -100,8 +100,10 @@ function extractPageContent(tabId) {
                 const metaDescription = document.querySelector('meta[name="description"]');
                 const description = metaDescription ? metaDescription.getAttribute('content') : '';
                 // Do not strip or truncate content, keep it as full as possible
-                let content = `${title} ${description} ${bodyText}`;
-                content = content.replace(/\s+/g, ' ').trim();
+                // Keep line breaks so the backend can chunk by paragraph;
+                // content.js rebuilds this text to map chunk offsets back
+                let content = `${title}\n${description}\n${bodyText}`;
+                content = content.replace(/[^\S\n]+/g, ' ').replace(/ *\n */g, '\n').replace(/\n{3,}/g, '\n\n').trim();
                 const originalLength = content.length;
                 // No truncation here; backend will handle chunking/limits
                 console.log(`${frameInfo} [ContentScript] Content extracted: ${content.length}/${originalLength} chars`);
@@ -161,7 +163,7 @@ function extractPageContent(tabId) {
 
 // ============ BACKEND INDEXING ============
 
-async function indexPageToBackend(pageData) {
+async function indexPageToBackend(pageData, retries = 3) {
   try {
     console.log(`📤 Sending to backend: ${pageData.title}`);
     console.log(`   URL: ${pageData.url}`);
@@ -175,6 +177,14 @@ async function indexPageToBackend(pageData) {
       credentials: 'omit'
     });
     
+    if (response.status === 429 && retries > 0) {
+      // Indexing queue is full; retry after the delay the backend asks for
+      const retryAfter = parseInt(response.headers.get('Retry-After') || '5', 10);
+      console.warn(`⏳ Backend busy, retrying in ${retryAfter}s`);
+      setTimeout(() => indexPageToBackend(pageData, retries - 1), retryAfter * 1000);
+      return;
+    }
+    
     if (!response.ok) {
       console.error(`✗ Backend error: ${response.status} ${response.statusText}`);
       const text = await response.text();
@@ -183,7 +193,12 @@ async function indexPageToBackend(pageData) {
     }
     
     const result = await response.json();
-    console.log('✓ INDEXED:', result.message);
+    if (result.status === 'unchanged') {
+      console.log('✓ UNCHANGED:', result.message);
+      return;
+    }
+    console.log('✓ QUEUED:', result.message);
+    console.log('  Job:', result.job_id);
     console.log('  Total pages:', result.total_pages);
     
   } catch (error) {
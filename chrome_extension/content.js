@@ -9,19 +9,45 @@ console.log('✓ Smart Page Search content script loaded');
  */
 chrome.runtime.onMessage.addListener((request, sender, sendResponse) => {
   if (request.action === 'highlightText') {
-    highlightTextOnPage(request.text);
+    if (!highlightTextOnPage(textAtOffsets(request.start, request.end))) {
+      highlightTextOnPage(request.text);
+    }
     sendResponse({ success: true });
   }
 });
 
 /**
- * Highlight text on page
+ * Page text as indexed by background.js, which must build it the same way
+ */
+function indexedPageText() {
+  const bodyText = document.body ? document.body.innerText || '' : '';
+  const metaDescription = document.querySelector('meta[name="description"]');
+  const description = metaDescription ? metaDescription.getAttribute('content') : '';
+  const content = `${document.title || 'Untitled'}\n${description}\n${bodyText}`;
+  return content.replace(/[^\S\n]+/g, ' ').replace(/ *\n */g, '\n').replace(/\n{3,}/g, '\n\n').trim();
+}
+
+/**
+ * Text of a search result's chunk, from its offsets into the indexed page text
+ */
+function textAtOffsets(start, end) {
+  if (typeof start !== 'number' || typeof end !== 'number') {
+    return '';
+  }
+  // Matches are found within single text nodes, which rarely span lines,
+  // so use the longest line of the chunk
+  const lines = indexedPageText().slice(start, end).split('\n').map(line => line.trim());
+  return lines.reduce((longest, line) => (line.length > longest.length ? line : longest), '');
+}
+
+/**
+ * Highlight text on page; returns whether it was found
  */
 function highlightTextOnPage(searchText) {
   removeHighlights();
   
   if (!searchText || searchText.trim() === '') {
-    return;
+    return false;
   }
   
   const walker = document.createTreeWalker(
@@ -72,6 +98,7 @@ function highlightTextOnPage(searchText) {
   if (firstMatch) {
     firstMatch.scrollIntoView({ behavior: 'smooth', block: 'center' });
   }
+  return firstMatch !== null;
 }
 
 /**
@@ -113,7 +113,7 @@ document.addEventListener('DOMContentLoaded', function() {
     item.querySelector('.result-url').addEventListener('click', function(e) {
       e.preventDefault();
       // Use the snippet for highlighting if available, else fallback to query
-      openAndHighlight(result.url, result.snippet || currentQuery);
+      openAndHighlight(result.url, result.snippet || currentQuery, result.char_start, result.char_end);
     });
     
     return item;
@@ -122,7 +122,7 @@ document.addEventListener('DOMContentLoaded', function() {
   /**
    * Open URL and highlight text
    */
-  async function openAndHighlight(url, searchText) {
+  async function openAndHighlight(url, searchText, start, end) {
     chrome.tabs.create({ url: url }, function(tab) {
       chrome.tabs.onUpdated.addListener(function listener(tabId, changeInfo) {
         if (tabId === tab.id && changeInfo.status === 'complete') {
@@ -132,7 +132,9 @@ document.addEventListener('DOMContentLoaded', function() {
           setTimeout(() => {
             chrome.tabs.sendMessage(tabId, {
               action: 'highlightText',
-              text: searchText
+              text: searchText,
+              start: start,
+              end: end
             });
           }, 100);
         }